@@ -0,0 +1,227 @@
+#! /usr/bin/env python
+import os
+import sys
+import time
+import shlex
+import signal
+import asyncio
+import subprocess
+
+# Runs the commands of the run plan for interactive and batch, without a
+# shell, and supervises any number of them at the same time from one
+# Python process (see nodepack.py). For a command with job output x.txt:
+#
+#   x.txt   The lines written by the command to stdout, unchanged, so the
+#           job output is parsed as before
+#   x.log   Every line written to stdout or stderr, as it arrives, with the
+#           time in seconds since the command started (monotonic clock)
+#           and the stream, e.g. "   12.345 err Warning: ..."
+#
+# Each line of stdout can also be given as it arrives to a function, e.g.
+# to parse the results at once (see liveresults.py). If the function
+# returns True (e.g. the times have reached a steady state, see
+# steadystate.py), the command is stopped, a line "Stopped after N secs"
+# is added to its output, and its status is 0.
+#
+# The command's exit status and resource usage are taken straight from
+# wait4. A command killed by a signal has a negative status, as in
+# subprocess. A command still running after its timeout (see watchdog.py)
+# has its process group killed, a line "Timed out after N secs" is added
+# to its output, and its status is timeout_status. A command can also exit
+# with that status itself, so whether it timed out is returned as well.
+#
+# This has to work with the python/3.6.1 module (see run-benchmarks.py),
+# so it does not use asyncio.run or other newer parts of asyncio, and with
+# the newest Pythons, so it does not use the deprecated parts either.
+
+# Time between checks for the end of a command
+poll_secs = 0.1
+
+# Time to wait for the rest of the output after the command ended, in
+# case something it started still holds stdout or stderr open
+drain_secs = 5.0
+
+read_size = 65536
+
+# Exit status of a command that cannot be started, as in the shell
+not_found_status = 127
+
+# Exit status of a command that timed out, as for timeout(1), and time
+# between SIGTERM and SIGKILL
+timeout_status = 124
+kill_grace_secs = 10
+timed_out_prefix = 'Timed out after '
+stopped_prefix = 'Stopped after '
+
+def log_name(output):
+	return os.path.splitext(output)[0] + '.log'
+
+def rusage_dict(ru):
+	return {'utime': round(ru.ru_utime, 3), 'stime': round(ru.ru_stime, 3), 'maxrss_kb': ru.ru_maxrss,
+			'minflt': ru.ru_minflt, 'majflt': ru.ru_majflt, 'inblock': ru.ru_inblock, 'oublock': ru.ru_oublock,
+			'nvcsw': ru.ru_nvcsw, 'nivcsw': ru.ru_nivcsw}
+
+class Logger:
+	def __init__(self, output, start, echo, on_line):
+		self.out = open(output, 'ab')
+		self.log = open(log_name(output), 'ab')
+		self.start = start
+		self.echo = echo
+		self.on_line = on_line
+		self.stop = asyncio.Event()
+
+	def lines(self, stream, lines):
+		t = time.monotonic() - self.start
+		for line in lines:
+			if stream == 'out':
+				self.out.write(line + b'\n')
+				if not self.on_line is None and self.on_line(line, t):
+					self.stop.set()
+			self.log.write(b'%9.3f %s %s\n' % (t, stream.encode(), line))
+			if self.echo:
+				target = sys.stdout if stream == 'out' else sys.stderr
+				target.buffer.write(line + b'\n')
+		self.out.flush()
+		self.log.flush()
+		if self.echo:
+			sys.stdout.flush()
+			sys.stderr.flush()
+
+	def close(self):
+		self.out.close()
+		self.log.close()
+
+# Copy one pipe of the command to the logger, a line at a time
+async def pump(pipe, stream, logger):
+	loop = asyncio.get_event_loop()
+	reader = asyncio.StreamReader(limit=read_size)
+	transport, protocol = await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), pipe)
+	try:
+		pending = b''
+		while True:
+			data = await reader.read(read_size)
+			if len(data) == 0:
+				break
+			lines = (pending + data).split(b'\n')
+			pending = lines.pop()
+			logger.lines(stream, lines)
+		if len(pending) > 0:
+			logger.lines(stream, [pending])
+	finally:
+		transport.close()
+
+# Exit status from the status given by wait: negative if killed by a
+# signal, as in subprocess
+def exit_status(wstatus):
+	if os.WIFSIGNALED(wstatus):
+		return -os.WTERMSIG(wstatus)
+	return os.WEXITSTATUS(wstatus)
+
+# Wait for the command to end, with its resource usage
+async def reap(proc):
+	while True:
+		pid, wstatus, ru = os.wait4(proc.pid, os.WNOHANG)
+		if pid != 0:
+			break
+		await asyncio.sleep(poll_secs)
+	proc.returncode = exit_status(wstatus)
+	return proc.returncode, rusage_dict(ru)
+
+def kill(proc, sig=signal.SIGTERM):
+	try:
+		os.killpg(proc.pid, sig)
+	except ProcessLookupError:
+		pass
+
+# Kill the command and everything it started: SIGTERM, then SIGKILL if
+# it has not ended after kill_grace_secs
+async def terminate(proc):
+	kill(proc)
+	try:
+		return await asyncio.wait_for(reap(proc), kill_grace_secs)
+	except asyncio.TimeoutError:
+		kill(proc, signal.SIGKILL)
+		return await reap(proc)
+
+# Run the command with its output added to the job output file, bound to
+# the given CPUs if any, for at most timeout seconds if given. If given,
+# on_line(line, secs) is called for each line of stdout. Returns the exit
+# status, the wall time, the resource usage (None if it could not be
+# started) and whether it timed out. If cancelled, the command and everything it started are
+# terminated.
+async def run_command(cmd, output, env=None, cpus=None, echo=False, timeout=None, on_line=None):
+	def bind():
+		if not cpus is None and len(cpus) > 0:
+			os.sched_setaffinity(0, cpus)
+	start = time.monotonic()
+	logger = Logger(output, start, echo, on_line)
+	try:
+		try:
+			# New session, so the whole command can be killed if interrupted
+			proc = subprocess.Popen(shlex.split(cmd), stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+									stderr=subprocess.PIPE, env=env, preexec_fn=bind, start_new_session=True)
+		except OSError as e:
+			logger.lines('err', [f'Cannot run {cmd}: {e}'.encode()])
+			return not_found_status, time.monotonic() - start, None, False
+		pumps = asyncio.gather(pump(proc.stdout, 'out', logger), pump(proc.stderr, 'err', logger))
+		reaper = asyncio.ensure_future(reap(proc))
+		stopper = asyncio.ensure_future(logger.stop.wait())
+		try:
+			await asyncio.wait([reaper, stopper], timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+		except asyncio.CancelledError:
+			reaper.cancel()
+			stopper.cancel()
+			await terminate(proc)
+			pumps.cancel()
+			# Let the cancelled tasks end before the loop is closed
+			await asyncio.gather(pumps, reaper, stopper, return_exceptions=True)
+			raise
+		stopper.cancel()
+		stopped = False
+		timed_out = False
+		if reaper.done():
+			status, rusage = reaper.result()
+		else:
+			reaper.cancel()
+			if logger.stop.is_set():
+				stopped = True
+			else:
+				timed_out = True
+			status, rusage = await terminate(proc)
+		secs = time.monotonic() - start
+		try:
+			await asyncio.wait_for(pumps, drain_secs)
+		except asyncio.TimeoutError:
+			logger.lines('err', [b'Output still open after the command ended: not read'])
+		if timed_out:
+			logger.lines('out', [f'{timed_out_prefix}{round(secs)} secs'.encode()])
+			status = timeout_status
+		elif stopped:
+			logger.on_line = None
+			logger.lines('out', [f'{stopped_prefix}{round(secs)} secs'.encode()])
+			status = 0
+		return status, secs, rusage, timed_out
+	finally:
+		logger.close()
+
+# Run the coroutine on a new event loop until it is done. If interrupted,
+# it is cancelled (which terminates its commands) before going on.
+# get_event_loop outside a running loop is deprecated in newer Pythons.
+def run_until_complete(coro):
+	loop = asyncio.new_event_loop()
+	asyncio.set_event_loop(loop)
+	try:
+		task = loop.create_task(coro)
+		try:
+			return loop.run_until_complete(task)
+		except KeyboardInterrupt:
+			task.cancel()
+			loop.run_until_complete(asyncio.gather(task, return_exceptions=True))
+			raise
+	finally:
+		asyncio.set_event_loop(None)
+		loop.close()
+
+# Run one command, waiting for it to end
+def run(cmd, output, env=None, echo=False, timeout=None, on_line=None):
+	return run_until_complete(run_command(cmd, output, env=env, echo=echo, timeout=timeout, on_line=on_line))
@@ -0,0 +1,71 @@
+#! /usr/bin/env python
+import importlib
+
+# Registry of the benchmarks run by run-benchmarks.py. Each benchmark is a
+# package whose __init__.py declares:
+#
+#   name          Name on the command line (--name, --no-name)
+#   description   For the help
+#   module        Module in the package with the functions below
+#   needs_cmake   Whether its binary is built by cmake
+#   slow_node     (optional) Runs with an extra slow node, on its own
+#
+# The module is only imported when the benchmark is used, and provides
+# make(), commands(num_nodes, hybrid_params) (generating each command with
+# the parameters of its template, for the manifest), num_nodes(),
+# get_est_time_secs() (optional, valid after commands()) and
+# generate_plots(results, output_prefix_str). To add a benchmark, add its
+# package to the list below.
+
+# Benchmark packages, in the order they are listed, run and plotted
+packages = ['synthetic', 'micropp', 'syntheticscatter', 'syntheticslow', 'nbody',
+			'syntheticconvergence', 'bestdegree', 'syntheticslownord', 'nbodyslownord']
+
+class Benchmark:
+	def __init__(self, package):
+		decl = importlib.import_module(package)
+		self.name = decl.name
+		self.description = decl.description
+		self.needs_cmake = decl.needs_cmake
+		self.slow_node = getattr(decl, 'slow_node', False)
+		self.module_name = package + '.' + decl.module
+
+	# Import the module on first use
+	def module(self):
+		return importlib.import_module(self.module_name)
+
+	def make(self):
+		return self.module().make()
+
+	def commands(self, num_nodes, hybrid_params):
+		return self.module().commands(num_nodes, hybrid_params)
+
+	# The commands and their parameters, each with its estimated time: the
+	# increase in est_time_secs(), which commands() resets to zero when it
+	# starts
+	def timed_commands(self, num_nodes, hybrid_params):
+		prev_secs = 0
+		for cmd, params in self.commands(num_nodes, hybrid_params):
+			secs = self.est_time_secs()
+			yield cmd, params, secs - prev_secs
+			prev_secs = secs
+
+	def num_nodes(self):
+		return self.module().num_nodes()
+
+	# Estimated time for the commands last generated by commands()
+	def est_time_secs(self):
+		module = self.module()
+		if not hasattr(module, 'get_est_time_secs'):
+			return 0
+		return module.get_est_time_secs()
+
+	# Whether the plots need every time (e.g. scatter plots), rather than
+	# just the statistics kept by --stream
+	def needs_raw_times(self):
+		return getattr(self.module(), 'needs_raw_times', False)
+
+	def generate_plots(self, results, output_prefix_str):
+		self.module().generate_plots(results, output_prefix_str)
+
+registry = dict([(b.name, b) for b in [Benchmark(package) for package in packages]])
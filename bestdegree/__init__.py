@@ -0,0 +1,5 @@
+# Declaration of this benchmark for run-benchmarks.py (see benchmarks.py)
+name = 'bestdegree'
+description = 'bestdegree benchmark'
+module = 'bestdegree'
+needs_cmake = True
@@ -3,20 +3,19 @@ import sys
 import os
 from string import Template
 import re
+import plotpool
 import copy
 
 
-# Workaround for python/3.6.6_gdb doesn't support numpy
-# See run-benchmarks.py
-try:
+# NumPy and matplotlib are slow to import, so they are only imported when
+# plotting. See run-benchmarks.py for the python/3.6.6_gdb workaround.
+def import_plotting():
+	global np, PdfPages, plt, matplotlib
 	import numpy as np
 	from matplotlib.backends.backend_pdf import PdfPages
-	from matplotlib import rcParams
 	import matplotlib.pyplot as plt
 	import matplotlib.colors
-	rcParams.update({'figure.autolayout': True})
-except ImportError:
-	pass
+	plotpool.setup_matplotlib()
 
 
 def split_by_times(xx, yy):
@@ -50,7 +49,7 @@ def make():
 	
 est_time_secs = 0
 
-# Return the list of all commands to run
+# Generate all commands to run, each with the parameters of its template
 def commands(num_nodes, hybrid_params):
 	global est_time_secs
 	est_time_secs = 0
@@ -66,9 +65,10 @@ def commands(num_nodes, hybrid_params):
 		for policy in policies:
 			for drom in ['true']: # ['true','false'] if degree != 1
 				for lewi in ['true']: # ['true','false'] if degree != 1
-					cmd = t.substitute(vranks=vranks, degree=degree, drom=drom, lewi=lewi, policy=policy, hybrid_params=hybrid_params)
+					params = dict(vranks=vranks, degree=degree, drom=drom, lewi=lewi, policy=policy, hybrid_params=hybrid_params)
+					cmd = t.substitute(params)
 					est_time_secs += 4 * 60 * 60 # 4 hours each
-					yield cmd
+					yield cmd, params
 
 def get_est_time_secs():
 	global est_time_secs
@@ -76,10 +76,7 @@ def get_est_time_secs():
 
 # Get all values of a field 
 def get_values(results, field):
-	values = set([])
-	for r, times in results:
-		values.add(r[field])
-	return sorted(values)
+	return results.values(field)
 
 def average(l):
 	return 1.0 * sum(l) / len(l)
@@ -87,10 +84,31 @@ def average(l):
 noflush_str = ['flush', 'noflush']
 
 
+# Colour map of the best degree for each number of appranks and imbalance
+def plot_bestdegree(filename, x, y, z, max_bestdeg, figsize):
+	import_plotting()
+	with PdfPages(filename) as pdf:
+		if not figsize is None:
+			plt.figure(figsize=figsize)
+		cmap = plt.cm.get_cmap("rainbow", max_bestdeg)
+		im = plt.pcolormesh(x, y, z, cmap=cmap)
+
+		norm= matplotlib.colors.BoundaryNorm(np.arange(0,max_bestdeg+1)+0.5, max_bestdeg)
+		sm = plt.cm.ScalarMappable(cmap=cmap, norm=norm)
+		sm.set_array([])
+		plt.colorbar(sm, ticks=np.arange(1,max_bestdeg+1))
+
+		plt.xlabel('Imbalance')
+		plt.ylabel('Number of appranks')
+		pdf.savefig()
+		plt.close()
+
 def generate_plots(results, output_prefix_str):
+	import_plotting()
 
 	# Keep only results for correct executable
-	results = [ (r,times) for (r,times) in results if r['executable'] == 'build/bestdegree']
+	results = results.select(executable='build/bestdegree')
+	results = results.derive('iter_num', 'iter', int)
 	# print(results)
 
 	policies = get_values(results, 'policy')
@@ -100,7 +118,7 @@ def generate_plots(results, output_prefix_str):
 	print(f'degrees {degrees}')
 	print(f'apprankss {apprankss}')
 
-	all_iters = [int(x) for x in get_values(results, 'iter')]
+	all_iters = get_values(results, 'iter_num')
 	if len(all_iters) == 0:
 		# No synthetic results collected
 		return
@@ -118,106 +136,81 @@ def generate_plots(results, output_prefix_str):
 	# Array of raw times
 	raw_times = {}
 
-	with PdfPages('output/%sbestdegree.pdf' % (output_prefix_str)) as pdf:
-		for appranks in apprankss:
-			lewi = 'true'
-			drom = 'true'
-			
-			curr = [(r,times) for (r,times) in results \
-						if r['appranks'] == appranks \
-						and r['lewi'] == lewi \
-						and r['drom'] == drom \
-						and int(r['iter']) == niters-1]
-			imbs = get_values(curr, 'imb')
-			#print(f'appranks {appranks} imbs {imbs}')
-			for imb in imbs:
-				curr2 = [(r,times) for (r,times) in curr if r['imb'] == imb]
-				degrees = get_values(curr2, 'degree')
-				# print(f'imb: {imb} degs: {degrees}')
-				bestdeg = None
-				bestval = None
-				colnum = int(0.5+(float(imb)-1)/imb_delta)
-				for degree in degrees:
-					curr3 = [(r,times) for (r,times) in curr2 if r['degree'] == degree]
-					ys = [times for (r,times) in curr3]
-					raw_times[ (appranks, colnum, degree) ] = ys
-					yval = average([average(yy) for yy in ys])
-					#print(f'appranks {appranks} imb {imb} deg {degree}, times {ys} => {yval}')
-					if bestval is None or yval < bestval:
-						bestval = yval
-						bestdeg = degree
-				#print(f'appranks {appranks} imb {imb} bestdeg {bestdeg}')
-				max_bestdeg = max(max_bestdeg, bestdeg)
-
-				z[appranks-1][colnum] = bestdeg - 0.5
-				#xx.append(appranks)
-				#yy.append(imb)
-				#zz.append(bestdeg)
-
-		cmap = plt.cm.get_cmap("rainbow", max_bestdeg)
-		im = plt.pcolormesh(x, y, z, cmap=cmap)
-
-		norm= matplotlib.colors.BoundaryNorm(np.arange(0,max_bestdeg+1)+0.5, max_bestdeg)
-		sm = plt.cm.ScalarMappable(cmap=cmap, norm=norm)
-		sm.set_array([])
-		plt.colorbar(sm, ticks=np.arange(1,max_bestdeg+1))
-
-		plt.xlabel('Imbalance')
-		plt.ylabel('Number of appranks')
-		pdf.savefig()
-		plt.close()
+	last_iter_index = results.index(['appranks', 'lewi', 'drom', 'iter_num'])
+
+	for appranks in apprankss:
+		lewi = 'true'
+		drom = 'true'
+		
+		curr = last_iter_index.get(appranks=appranks, lewi=lewi, drom=drom, iter_num=niters-1)
+		by_imb = curr.index(['imb'])
+		by_imb_degree = curr.index(['imb', 'degree'])
+		imbs = get_values(curr, 'imb')
+		#print(f'appranks {appranks} imbs {imbs}')
+		for imb in imbs:
+			curr2 = by_imb.get(imb=imb)
+			degrees = get_values(curr2, 'degree')
+			# print(f'imb: {imb} degs: {degrees}')
+			bestdeg = None
+			bestval = None
+			colnum = int(0.5+(float(imb)-1)/imb_delta)
+			for degree in degrees:
+				curr3 = by_imb_degree.get(imb=imb, degree=degree)
+				ys = curr3.means().tolist() # Average time of each result
+				raw_times[ (appranks, colnum, degree) ] = ys
+				yval = average(ys)
+				#print(f'appranks {appranks} imb {imb} deg {degree}, times {ys} => {yval}')
+				if bestval is None or yval < bestval:
+					bestval = yval
+					bestdeg = degree
+			#print(f'appranks {appranks} imb {imb} bestdeg {bestdeg}')
+			max_bestdeg = max(max_bestdeg, bestdeg)
+
+			z[appranks-1][colnum] = bestdeg - 0.5
+			#xx.append(appranks)
+			#yy.append(imb)
+			#zz.append(bestdeg)
+
+	plotpool.figure('output/%sbestdegree.pdf' % (output_prefix_str), plot_bestdegree, x, y, z, max_bestdeg, None)
 
 	# Now smooth the raw times
 	smoothed_times = []
 	max_bestdeg = 0
 	y, x = np.mgrid[slice(0.5, 32.5,1), slice(1-imb_delta/2,imb_max-imb_delta/2,imb_delta)]
 	z = 0*x + np.NaN
-	with PdfPages('output/%ssmoothed-bestdegree.pdf' % (output_prefix_str)) as pdf:
-		plt.figure(figsize=(6,3.5))
-		for appranks in apprankss:
-			lewi = 'true'
-			drom = 'true'
-			
-			for colnum in range(0, int(0.5+(imb_max-1.0) / imb_delta)):
-				bestdeg = None
-				bestval = None
-				imb = 1.0 + colnum * imb_delta
-				for degree in range(1,10):
-					if (appranks, colnum, degree) in raw_times:
-						#print(f'Raw {appranks} {colnum} {degree}\n')
-						ys = copy.deepcopy(raw_times[(appranks, colnum, degree)])
-						if (appranks, colnum-1, degree) in raw_times:
-							ys.extend( raw_times[(appranks,colnum-1,degree)])
-						if (appranks, colnum+1, degree) in raw_times:
-							ys.extend( raw_times[(appranks,colnum+1,degree)])
-						if (appranks-1, colnum, degree) in raw_times:
-							ys.extend( raw_times[(appranks-1,colnum,degree)])
-						if (appranks+1, colnum, degree) in raw_times:
-							ys.extend( raw_times[(appranks+1,colnum,degree)])
-						yval = average([average(yy) for yy in ys])
-						#print(f'Smoothed: appranks {appranks} imb {imb} deg {degree}, times {ys} => {yval}')
-						if bestval is None or yval < bestval:
-							bestval = yval
-							bestdeg = degree
-				#print(f'Smoothed: appranks {appranks} imb {imb} bestdeg {bestdeg}')
-
-				if not bestdeg is None:
-					max_bestdeg = max(max_bestdeg, bestdeg)
-					z[appranks-1][colnum] = bestdeg - 0.5
-
-		z[0][0] = 0.5
-		cmap = plt.cm.get_cmap("rainbow", max_bestdeg)
-		im = plt.pcolormesh(x, y, z, cmap=cmap)
+	for appranks in apprankss:
+		lewi = 'true'
+		drom = 'true'
+		
+		for colnum in range(0, int(0.5+(imb_max-1.0) / imb_delta)):
+			bestdeg = None
+			bestval = None
+			imb = 1.0 + colnum * imb_delta
+			for degree in range(1,10):
+				if (appranks, colnum, degree) in raw_times:
+					#print(f'Raw {appranks} {colnum} {degree}\n')
+					ys = copy.deepcopy(raw_times[(appranks, colnum, degree)])
+					if (appranks, colnum-1, degree) in raw_times:
+						ys.extend( raw_times[(appranks,colnum-1,degree)])
+					if (appranks, colnum+1, degree) in raw_times:
+						ys.extend( raw_times[(appranks,colnum+1,degree)])
+					if (appranks-1, colnum, degree) in raw_times:
+						ys.extend( raw_times[(appranks-1,colnum,degree)])
+					if (appranks+1, colnum, degree) in raw_times:
+						ys.extend( raw_times[(appranks+1,colnum,degree)])
+					yval = average(ys)
+					#print(f'Smoothed: appranks {appranks} imb {imb} deg {degree}, times {ys} => {yval}')
+					if bestval is None or yval < bestval:
+						bestval = yval
+						bestdeg = degree
+			#print(f'Smoothed: appranks {appranks} imb {imb} bestdeg {bestdeg}')
 
-		norm= matplotlib.colors.BoundaryNorm(np.arange(0,max_bestdeg+1)+0.5, max_bestdeg)
-		sm = plt.cm.ScalarMappable(cmap=cmap, norm=norm)
-		sm.set_array([])
-		plt.colorbar(sm, ticks=np.arange(1,max_bestdeg+1))
+			if not bestdeg is None:
+				max_bestdeg = max(max_bestdeg, bestdeg)
+				z[appranks-1][colnum] = bestdeg - 0.5
 
-		plt.xlabel('Imbalance')
-		plt.ylabel('Number of appranks')
-		pdf.savefig()
-		plt.close()
+	z[0][0] = 0.5
+	plotpool.figure('output/%ssmoothed-bestdegree.pdf' % (output_prefix_str), plot_bestdegree, x, y, z, max_bestdeg, (6,3.5))
 
 
 
@@ -4,6 +4,7 @@ import sys
 import getopt
 
 varname = 'SLURM_JOB_NUM_NODES'
+nodelist_varname = 'SLURM_JOB_NODELIST'
 
 def Usage():
 	print('check_num_nodes.py <options>')
@@ -20,6 +21,11 @@ def get_num_nodes():
 	assert get_on_compute_node()
 	return int(os.environ[varname])
 
+# Compressed list of the nodes, e.g. s01r1b[01-04]
+def get_node_list():
+	assert get_on_compute_node()
+	return os.environ[nodelist_varname]
+
 def main(argv):
 	expected_num_nodes = None
 	try:
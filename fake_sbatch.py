@@ -0,0 +1,91 @@
+#! /usr/bin/env python
+# Stand-in for sbatch, to test submit on one machine:
+#
+#   ./run-benchmarks.py --sbatch ./fake_sbatch.py --array --then-process submit
+#
+# The job runs straight away, from the current directory, with the Slurm
+# variables that run-benchmarks.py uses. The tasks of a job array run at
+# the same time, as subprocesses, and sbatch returns when they have all
+# finished, so any --dependency is already satisfied.
+import os
+import sys
+import re
+import getopt
+import subprocess
+
+def Usage():
+	print('fake_sbatch.py <options> job_script')
+	print('where:')
+	print(' -h                      Show this help')
+	print(' --parsable              Only print the job ID')
+	print(' --array=a-b             Run array tasks a to b')
+	print(' --dependency=...        Ignored (earlier jobs have finished)')
+	return 1
+
+# The #SBATCH options of the job script; only the first component of a
+# heterogeneous job
+def script_options(job_script):
+	options = {}
+	with open(job_script) as fp:
+		for line in fp:
+			if line.startswith('#SBATCH hetjob'):
+				break
+			if line.startswith('#SBATCH '):
+				for m in re.finditer(r'--([a-z-]+)=(\S+)', line):
+					options[m.group(1)] = m.group(2)
+	return options
+
+def output_name(pattern, jobid, task):
+	return pattern.replace('%A', jobid).replace('%a', str(task)).replace('%j', jobid)
+
+def main(argv):
+	parsable = False
+	tasks = None
+	try:
+		opts, args = getopt.getopt( argv[1:], 'h', ['help', 'parsable', 'array=', 'dependency='])
+	except getopt.error as msg:
+		print(msg)
+		print("for help use --help")
+		sys.exit(2)
+	for o, a in opts:
+		if o in ('-h', '--help'):
+			return Usage()
+		elif o == '--parsable':
+			parsable = True
+		elif o == '--array':
+			first, last = a.split('-')
+			tasks = list(range(int(first), int(last)+1))
+		elif o == '--dependency':
+			pass
+
+	if len(args) != 1:
+		return Usage()
+	job_script = args[0]
+	options = script_options(job_script)
+	num_nodes = options.get('nodes', '1')
+	jobid = str(os.getpid())
+
+	procs = []
+	for task in ([None] if tasks is None else tasks):
+		env = dict(os.environ)
+		env['SLURM_JOBID'] = jobid
+		env['SLURM_JOB_ID'] = jobid
+		env['SLURM_JOB_NUM_NODES'] = num_nodes
+		if not task is None:
+			env['SLURM_ARRAY_JOB_ID'] = jobid
+			env['SLURM_ARRAY_TASK_ID'] = str(task)
+		out = open(output_name(options.get('output', 'slurm-%j.out'), jobid, task), 'w')
+		err = open(output_name(options.get('error', 'slurm-%j.out'), jobid, task), 'w')
+		procs.append(subprocess.Popen(['bash', job_script], env=env, stdout=out, stderr=err))
+	for proc in procs:
+		proc.wait()
+
+	if parsable:
+		print(jobid)
+	else:
+		print(f'Submitted batch job {jobid}')
+	return 0
+
+
+if __name__ == '__main__':
+	sys.exit(main(sys.argv))
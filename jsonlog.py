@@ -0,0 +1,39 @@
+#! /usr/bin/env python
+import os
+import json
+
+# Files of JSON records, one per line, that several jobs add to at the
+# same time: the run index (runindex.py), the runtime history
+# (runtimes.py) and the live results (liveresults.py). The records are
+# added with a single write in append mode, so lines from different jobs
+# do not mix, and readers skip a line that is still being written.
+
+# Add the records to the end of the file, creating it if needed. With
+# exclusive, only if the file does not exist yet: returns False if it does.
+def append(filename, entries, exclusive=False):
+	flags = os.O_WRONLY | os.O_CREAT | os.O_APPEND
+	if exclusive:
+		flags |= os.O_EXCL
+	try:
+		fd = os.open(filename, flags, 0o644)
+	except FileExistsError:
+		return False
+	try:
+		os.write(fd, ''.join([json.dumps(entry) + '\n' for entry in entries]).encode())
+	finally:
+		os.close(fd)
+	return True
+
+# The records in the file, or none if it does not exist
+def read(filename):
+	entries = []
+	if not os.path.exists(filename):
+		return entries
+	with open(filename) as fp:
+		for line in fp:
+			try:
+				entries.append(json.loads(line))
+			except ValueError:
+				# Partly written line
+				continue
+	return entries
@@ -0,0 +1,113 @@
+#! /usr/bin/env python
+import os
+import time
+import jsonlog
+import logscan
+import runindex
+
+# Live results for interactive and batch with --live: each result line
+# ("# <exe> appranks=... time=...") is parsed as soon as the command
+# writes it, and a typed record is appended to jobs/live_results.jsonl:
+#
+#   {"run_id": ..., "hash": ..., "benchmark": ..., "num_nodes": ..., "executable": ...,
+#    "appranks": 4, "degree": 1, "policy": ..., "drom": ..., "lewi": ...,
+#    "args": {"iter": "0", ...}, "time": 0.54, "unit": "sec", "elapsed": 12.345,
+#    "date": ...}
+#
+# where args are the name=value parameters on the result line and elapsed
+# is the time since the command started. The records are appended as
+# JSON lines rather than kept in a resulttable.ResultTable, so that
+# several jobs can add to them at the same time, and status needs no
+# NumPy. The status command shows the progress of the run plan from the
+# run index and manifests (without reading any job output) and the latest
+# of these records.
+
+results_name = 'live_results.jsonl'
+results_file = os.path.join(runindex.index_dir, results_name)
+
+# Number of latest results shown for each benchmark by status
+status_results = 3
+
+# Parses the stdout of one command (see asyncrunner.run_command), given
+# its job output and its manifest data
+class Ingester:
+	def __init__(self, output, data):
+		self.run = {'run_id': runindex.run_id(output), 'hash': data['hash'], 'benchmark': data['benchmark'],
+					'num_nodes': data['num_nodes']}
+		params = data.get('params') or {}
+		for name in ['policy', 'drom', 'lewi']:
+			self.run[name] = params.get(name)
+
+	def line(self, line, elapsed):
+		if not line.startswith(b'# '):
+			return
+		m = logscan.re_result.match(logscan.decode_line(line))
+		if not m:
+			return
+		r = logscan.result_fields(m)
+		entry = dict(self.run)
+		entry.update({'executable': r['executable'], 'appranks': r['appranks'], 'degree': r['degree'],
+					  'args': dict([p.split('=', 1) for p in r['params'] if '=' in p]),
+					  'time': float(m.group(5)), 'unit': m.group(6), 'elapsed': round(elapsed, 3),
+					  'date': time.strftime('%Y-%m-%d %H:%M:%S')})
+		jsonlog.append(results_file, [entry])
+
+def read_results():
+	return jsonlog.read(results_file)
+
+# State of each command of the plan from the run index: done (completed,
+# according to its manifest), running (started but not ended: it may also
+# have been killed with its job), failed (or ended without results) or to
+# run. Only --resume reads the job outputs, to check that none has lost
+# results since.
+def plan_states(plan):
+	index = runindex.read_index()
+	done = runindex.completed_hashes(index, check_outputs=False)
+	last_status = {}   # hash -> status of the last run, None if not ended
+	for entry in index:
+		if entry.get('event') == 'start':
+			last_status[entry['hash']] = None
+		elif entry.get('event') == 'end':
+			last_status[entry['hash']] = entry.get('status')
+	states = {}
+	for plan_entry in plan:
+		h = plan_entry.hash
+		if h in done:
+			states[h] = 'done'
+		elif not h in last_status:
+			states[h] = 'to run'
+		elif last_status[h] is None:
+			states[h] = 'running'
+		else:
+			states[h] = 'failed'
+	return states
+
+def result_str(r):
+	args = ' '.join([f'{k}={v}' for k, v in r['args'].items()])
+	return (f"[{r['hash']}] {r['num_nodes']} nodes appranks={r['appranks']} deg={r['degree']} {r['policy']}"
+			f" {args}: {r['time']} {r['unit']} (at {r['date']})")
+
+# Progress of each benchmark in the plan, with its latest results
+def print_status(plan):
+	states = plan_states(plan)
+	latest = {}
+	for r in read_results():
+		latest.setdefault(r['benchmark'], []).append(r)
+	benchmarks = []
+	for plan_entry in plan:
+		if not plan_entry.benchmark in benchmarks:
+			benchmarks.append(plan_entry.benchmark)
+	counts_total = {}
+	for benchmark in benchmarks:
+		counts = {'done': 0, 'running': 0, 'failed': 0, 'to run': 0}
+		entries = [plan_entry for plan_entry in plan if plan_entry.benchmark == benchmark]
+		for plan_entry in entries:
+			counts[states[plan_entry.hash]] += 1
+		for state, n in counts.items():
+			counts_total[state] = counts_total.get(state, 0) + n
+		print(f'{benchmark}: {counts["done"]}/{len(entries)} done, {counts["running"]} running, '
+			  f'{counts["failed"]} failed, {counts["to run"]} to run')
+		for r in latest.get(benchmark, [])[-status_results:]:
+			print('    ' + result_str(r))
+	done = counts_total.get('done', 0)
+	print(f'Total: {done}/{len(plan)} done ({100.0 * done / max(1, len(plan)):.0f}%)')
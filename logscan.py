@@ -0,0 +1,183 @@
+#! /usr/bin/env python
+import os
+import sys
+import re
+import mmap
+import manifest
+
+# Parser for the job outputs in jobs/ (one per command run by
+# run-benchmarks.py). The first line is the command; after that almost
+# every line is output from the runtime or the benchmark ("Rank r gets
+# ...", "Work per rank", "target_imbalance", ...). Only three kinds of line
+# matter, and each starts with a fixed prefix, so lines are filtered on the
+# prefix before running any regex:
+#
+#   Experiment vranks: 4 nodes: 2 deg: 1
+#   # build/synthetic_unbalanced appranks=4 deg=1 10 480 1k 0 48.6 16.0 2.5 2.0 : iter=0 time=0.54 sec
+#   mv TRACE.mpits <trace>
+
+re_result = re.compile('# ([-a-zA-Z0-9./_]*) appranks=([1-9][0-9]*) deg=([1-9][0-9]*) (.*) time=([0-9.]*) (sec|ms)')
+re_trace = re.compile('mv TRACE.mpits (.*)')
+re_experiment = re.compile('Experiment vranks: ([1-9][0-9]*) nodes: ([1-9][0-9]*) deg: ([1-9][0-9]*)')
+
+line_prefixes = (b'# ', b'Experiment', b'mv TRACE')
+
+# Files at least this big are memory mapped and split in chunks of
+# chunk_size, rather than read into memory at once
+mmap_threshold = 64 * 1024 * 1024
+chunk_size = 16 * 1024 * 1024
+
+def decode_line(line):
+	if line.endswith(b'\r'):
+		line = line[:-1]
+	return line.decode()
+
+# Lines that start with one of line_prefixes, out of a list of lines
+def matching_lines(lines):
+	for line in lines:
+		if line.startswith(line_prefixes):
+			yield decode_line(line)
+
+# Generate the first line (the command, including its newline), then only
+# the lines starting with one of line_prefixes
+def scan_lines(fullname):
+	with open(fullname, 'rb') as fp:
+		command = fp.readline()
+		yield command.decode()
+		start = len(command)
+		size = os.fstat(fp.fileno()).st_size
+		if size < mmap_threshold:
+			for line in matching_lines(fp.read().split(b'\n')):
+				yield line
+			return
+		with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+			partial = b''
+			pos = start
+			while pos < size:
+				end = min(pos + chunk_size, size)
+				lines = mm[pos:end].split(b'\n')
+				lines[0] = partial + lines[0]
+				# The last line may continue in the next chunk
+				partial = lines.pop()
+				for line in matching_lines(lines):
+					yield line
+				pos = end
+			for line in matching_lines([partial]):
+				yield line
+
+def get_from_command(regex, desc, command, fullname):
+	m = re.search(regex, command)
+	if not m:
+		print('%s not defined in the command for %s' % (desc, fullname))
+		print(f'Command is {command}')
+		sys.exit(1)
+	return m.group(1)
+
+# The executable, appranks, degree and parameters of a result line
+def result_fields(m):
+	r = {}
+	r['executable'] = m.group(1)
+	r['appranks'] = int(m.group(2))
+	r['degree'] = int(m.group(3))
+	params = tuple(m.group(4).split())
+	for p in params:
+		if '=' in p:
+			p2 = p.split('=')
+			r[p2[0]] = p2[1]
+	r['params'] = params
+	return r
+
+# Parameters on result lines that count the iterations
+iteration_params = ['iter', 'step']
+
+# The iteration of a result (see result_fields), or None if it has none
+def result_iteration(r):
+	for name in iteration_params:
+		if name in r and r[name].isdigit():
+			return int(r[name])
+	return None
+
+# The series of a result: the results with the same executable, appranks,
+# degree and parameters other than the iteration
+def series_key(r):
+	params = tuple([p for p in r['params'] if not p.split('=')[0] in iteration_params])
+	return (r['executable'], r['appranks'], r['degree'], params)
+
+# The number of results written by a command, the iteration of the last
+# and the series, counted from its lines of stdout as they are written
+# (see asyncrunner.run_command) or from its job output
+class Progress:
+	def __init__(self):
+		self.results = 0
+		self.last_iteration = None
+		self.series = set([])
+
+	def line(self, line, elapsed=None):
+		if isinstance(line, bytes):
+			if not line.startswith(b'# '):
+				return False
+			line = decode_line(line)
+		elif not line.startswith('# '):
+			return False
+		m = re_result.match(line)
+		if m:
+			r = result_fields(m)
+			self.results += 1
+			self.last_iteration = result_iteration(r)
+			self.series.add(series_key(r))
+		return False
+
+def file_progress(fullname):
+	progress = Progress()
+	lines = scan_lines(fullname)
+	next(lines, '')
+	for line in lines:
+		progress.line(line)
+	return progress
+
+# Generate the (r, time) results in a job output, one at a time. The
+# parameters of the run come from its manifest, or for older job outputs
+# without one, from the command line and the "Experiment" line.
+def iter_file_results(fullname):
+	lines = scan_lines(fullname)
+	keys = set()
+	command = next(lines, '')
+	run = manifest.read(fullname)
+	if not run is None:
+		drom = run['params']['drom']
+		lewi = run['params']['lewi']
+		policy = run['params']['policy']
+		numnodes = run['num_nodes']
+	else:
+		drom = get_from_command('dlb.enable_drom=(true|false)', 'dlb.enable_drom', command, fullname)
+		lewi = get_from_command('dlb.enable_lewi=(true|false)', 'dlb.enable_lewi', command, fullname)
+		policy = get_from_command(' --(local|global)', 'policy', command, fullname)
+		numnodes = None
+
+	for line in lines:
+		if line.startswith('# '):
+			m = re_result.match(line)
+			if m:
+				r = result_fields(m)
+				r['lewi'] = lewi
+				r['drom'] = drom
+				r['policy'] = policy
+				r['fullname'] = fullname
+				assert(not numnodes is None)
+				r['numnodes'] = numnodes
+				time = float(m.group(5))
+				#print(f"{fullname} numnodes: {numnodes} appranks: {r['appranks']}")
+				key = f"executable: {r['executable']} numnodes: {r['numnodes']} appranks: {r['appranks']} degree: {r['degree']} policy: {r['policy']} lewi: {r['lewi']} drom: {r['drom']}"
+				#print(key)
+				if not key in keys:
+					print(fullname + ':', key)
+				keys.add(key)
+				yield r, time
+		elif line.startswith('Experiment'):
+			m = re_experiment.match(line)
+			if m and run is None:
+				numnodes = int(m.group(2))
+		else:
+			m = re_trace.match(line)
+			if m:
+				print(' --> trace: ', m.group(1))
@@ -0,0 +1,80 @@
+#! /usr/bin/env python
+import os
+import time
+import json
+
+# Manifest of each command run by interactive and batch: a JSON file next
+# to its job output (x.txt has x.json), so the parser and the plots do not
+# need to work out anything from the command line. It is written when the
+# command starts, and again when it ends:
+#
+#   benchmark          Benchmark name
+#   hash               Hash of the command in the run plan
+#   command            Command run, with its hybrid directory
+#   params             Parameters of the benchmark's command template
+#                      (vranks, degree, policy, drom, lewi, ...)
+#   num_nodes          Number of nodes
+#   nodelist           Nodes it ran on (Slurm node list)
+#   jobid              Slurm job ID
+#   hybrid_directory   Hybrid directory (runtime output)
+#   attempt            0, or the number of times the command timed out
+#                      before this run (see watchdog.py)
+#   start, end         Start and end time
+#   exit_status        Exit status (missing if the command did not end)
+#   timed_out          True if the command was killed by the watchdog
+#   steady_stop        True if the command was stopped once its times
+#                      reached a steady state (see steadystate.py)
+#   results            Number of result lines the command wrote
+#   last_iteration     Iteration (iter= or step=) of its last result line
+#   series             Number of series of results (see logscan.series_key)
+#   complete           True if the command ran to its end (exit status 0)
+#                      or to a steady state, and wrote results. With
+#                      results and last_iteration, this is how --resume
+#                      tells that the output has every iteration.
+#   rusage             Resource usage of the command and its children:
+#                      user and system time, max RSS, page faults, I/O
+#                      blocks and context switches (from wait4)
+#
+# Job outputs written before there were manifests have none.
+
+date_format = '%Y-%m-%d %H:%M:%S'
+
+def manifest_name(output):
+	return os.path.splitext(output)[0] + '.json'
+
+def write(output, data):
+	filename = manifest_name(output)
+	with open(filename + '.tmp', 'w') as fp:
+		json.dump(data, fp, indent=1)
+	os.replace(filename + '.tmp', filename)
+
+# The manifest of a job output, or None if it has none
+def read(output):
+	filename = manifest_name(output)
+	if not os.path.exists(filename):
+		return None
+	with open(filename) as fp:
+		return json.load(fp)
+
+def started(output, plan_entry, command, nodelist, hybrid_directory, attempt=0):
+	data = {'benchmark': plan_entry.benchmark, 'hash': plan_entry.hash, 'command': command,
+			'params': plan_entry.params, 'num_nodes': plan_entry.num_nodes, 'nodelist': nodelist,
+			'jobid': os.environ.get('SLURM_JOBID'), 'hybrid_directory': hybrid_directory,
+			'attempt': attempt, 'start': time.strftime(date_format)}
+	write(output, data)
+	return data
+
+# progress is the logscan.Progress of the command's stdout
+def finished(output, data, exit_status, rusage=None, steady_stop=False, timed_out=False, progress=None):
+	data['end'] = time.strftime(date_format)
+	data['exit_status'] = exit_status
+	data['timed_out'] = timed_out
+	data['steady_stop'] = steady_stop
+	if not progress is None:
+		data['results'] = progress.results
+		data['last_iteration'] = progress.last_iteration
+		data['series'] = len(progress.series)
+		data['complete'] = exit_status == 0 and not timed_out and progress.results > 0
+	if not rusage is None:
+		data['rusage'] = rusage
+	write(output, data)
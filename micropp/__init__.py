@@ -0,0 +1,5 @@
+# Declaration of this benchmark for run-benchmarks.py (see benchmarks.py)
+name = 'micropp'
+description = 'micropp benchmarks'
+module = 'micropp'
+needs_cmake = False
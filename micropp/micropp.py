@@ -3,15 +3,17 @@ import sys
 import os
 from string import Template
 import re
+import plotpool
+import steadystate
 
-# Workaround for python/3.6.6_gdb doesn't support numpy
-# See run-benchmarks.py
-try:
+# NumPy and matplotlib are slow to import, so they are only imported when
+# plotting. See run-benchmarks.py for the python/3.6.6_gdb workaround.
+def import_plotting():
+	global np, PdfPages, plt
 	import numpy as np
 	from matplotlib.backends.backend_pdf import PdfPages
 	import matplotlib.pyplot as plt
-except ImportError:
-	pass
+	plotpool.setup_matplotlib()
 
 # Template to create the command to run the benchmark
 command_template = ' '.join(['runhybrid.py --hybrid-directory $$hybrid_directory $hybrid_params --debug false --vranks $vranks --$policy --degree $degree --monitor 20',
@@ -45,7 +47,7 @@ est_time_secs = 0
 
 all_degrees = [1,2,3,4,6,8,10,16]
 
-# Return the list of all commands to run
+# Generate all commands to run, each with the parameters of its template
 def commands(num_nodes, hybrid_params):
 	global est_time_secs
 	est_time_secs = 0
@@ -69,9 +71,10 @@ def commands(num_nodes, hybrid_params):
 			for policy in policies:
 				drom = 'true' if degreecode != 0 else 'false'
 				lewi = 'true' if degreecode != 0 else 'false'
-				cmd = t.substitute(vranks=vranks, degree=degree, drom=drom, lewi=lewi, policy=policy, hybrid_params=hybrid_params, ngp=ngp)
+				params = dict(vranks=vranks, degree=degree, drom=drom, lewi=lewi, policy=policy, hybrid_params=hybrid_params, ngp=ngp)
+				cmd = t.substitute(params)
 				est_time_secs += 12 * 60 # a guess!
-				yield cmd
+				yield cmd, params
 
 def get_est_time_secs():
 	global est_time_secs
@@ -80,26 +83,40 @@ def get_est_time_secs():
 
 # Get all values of a field 
 def get_values(results, field):
-	values = set([])
-	for r, times in results:
-		values.add(r[field])
-		if field =='appranks' and r[field] == '':
-			print(r)
-	#print(f'values for {field} is {values}')
-	return sorted(values)
+	return results.values(field)
 
 def average(l):
 	return 1.0 * sum(l) / len(l)
 
+def plot_barchart(filename, texts, bars, width, xticksx, xtickslabels):
+	import_plotting()
+	with PdfPages(filename) as pdf:
+		fig = plt.figure(figsize=(8.0,3.2*0.9))
+		ax = fig.add_subplot(111)
+		for xmid, ypos, label in texts:
+			plt.text(xmid, ypos, label, ha ='center')
+		for xx, avgs, stdevs, legend in bars:
+			plt.bar(xx, avgs, width, yerr=stdevs, label=legend)
+		plt.xticks(xticksx, xtickslabels)
+		plt.ylim(0,37)
+		plt.legend(loc='lower right', ncol=5)
+		plt.ylabel('Exec. time per timestep (secs)')
+		#ax.xaxis.labelpad = 50
+		pdf.savefig()
+		plt.close()
+
 def generate_plots(results, output_prefix_str):
+	import_plotting()
 	# Keep only results for correct executable
-	results = [ (r,times) for (r,times) in results if r['executable'] == 'build/mpi-load-balance']
+	results = results.select(executable='build/mpi-load-balance')
+	results = results.derive('step_num', 'step', int)
 	#print(f'results={results}')
 
 	policies = get_values(results, 'policy')
 	degrees = get_values(results, 'degree')
 	apprankss = get_values(results, 'appranks')
 	numnodess = get_values(results, 'numnodes')
+	index = results.index(['appranks', 'degree', 'lewi', 'drom', 'numnodes', 'policy'])
 
 	# # Generate time series plots
 	# for appranks in apprankss:
@@ -158,96 +175,86 @@ def generate_plots(results, output_prefix_str):
 	for policy in ['local', 'global']:
 		filename = f'output/{output_prefix_str}micropp-barcharts-{policy}.pdf'
 		print(f'Generating {filename}')
-		with PdfPages(filename) as pdf:
-			ind = None
-			width = 0.06
-
-			fig = plt.figure(figsize=(8.0,3.2*0.9))
-			ax = fig.add_subplot(111)
-
-			# All xticks: x positions
-			xticksx = []
-			# All xticks: labels
-			xtickslabels = []
-
-			for kd, degreecode in enumerate([0] + all_degrees):
-
-				xx = []
-				avgs = []
-				stdevs = []
-				degree = degreecode if degreecode != 0 else 1
-				for j, appranks_per_node in enumerate([1,2]):
-					xcurr = 6.0 * j
-					# Centre for each number of nodes
-					xnodes = np.arange(len(numnodess)) + xcurr
-					xx.extend(xnodes + (kd-1)*width*1.5)
-					xticksx.extend(xnodes)
-					xtickslabels.extend(numnodess)
-
-					if appranks_per_node == 1 and degreecode == 0:
-						# No DLB, but one apprank per node => use results with DLB anyway
-						# (not executed as DLB pointless)
-						drom = 'true'
-						lewi = 'true'
+		width = 0.06
+
+		# Labels under each group of bars
+		texts = []
+		# (xx, avgs, stdevs, legend) for each degree
+		bars = []
+
+		# All xticks: x positions
+		xticksx = []
+		# All xticks: labels
+		xtickslabels = []
+
+		for kd, degreecode in enumerate([0] + all_degrees):
+
+			xx = []
+			avgs = []
+			stdevs = []
+			degree = degreecode if degreecode != 0 else 1
+			for j, appranks_per_node in enumerate([1,2]):
+				xcurr = 6.0 * j
+				# Centre for each number of nodes
+				xnodes = np.arange(len(numnodess)) + xcurr
+				xx.extend(xnodes + (kd-1)*width*1.5)
+				xticksx.extend(xnodes)
+				xtickslabels.extend(numnodess)
+
+				if appranks_per_node == 1 and degreecode == 0:
+					# No DLB, but one apprank per node => use results with DLB anyway
+					# (not executed as DLB pointless)
+					drom = 'true'
+					lewi = 'true'
+				else:
+					drom = 'true' if degreecode != 0 else 'false'
+					lewi = 'true' if degreecode != 0 else 'false'
+
+
+				for kn, numnodes in enumerate(numnodess):
+					numappranks = appranks_per_node * numnodes
+					print(f'{policy} appranks: {numappranks} vranks: {numnodes} {degree}')
+					curr1 = index.get(appranks=numappranks, degree=degree, lewi=lewi, drom=drom, numnodes=numnodes,
+									  policy=policy if int(degree) != 1 else policies)
+
+					avg = 0
+					stdev = 0
+					if len(curr1) > 0:
+						nsteps = 1+max(get_values(curr1, 'step_num'))
+						by_step = curr1.index(['step_num'])
+						vals = []
+						for step in range(0,nsteps):
+							curr2 = by_step.get(step_num=step).means().tolist()
+							if len(curr2) > 0:
+								vals.append(max(curr2))
+
+						# Leave out the warm-up steps (see steadystate.py)
+						vals = steadystate.steady_values(vals)
+						if len(vals) > 0:
+							avg = average(vals)
+							stdev = np.std(vals)
+					avgs.append(avg / 1000.0)  # Convert ms to seconds
+					stdevs.append(stdev / 1000.0)
+
+				if kd == 0:
+					xmid = average(xnodes)
+					#if policy == 'global':
+					ypos = -6
+					#else:
+					#	ypos = -9
+					if appranks_per_node > 1:
+						label = f'MicroPP ({appranks_per_node} appranks per node)'
 					else:
-						drom = 'true' if degreecode != 0 else 'false'
-						lewi = 'true' if degreecode != 0 else 'false'
-
-
-					for kn, numnodes in enumerate(numnodess):
-						numappranks = appranks_per_node * numnodes
-						print(f'{policy} appranks: {numappranks} vranks: {numnodes} {degree}')
-						curr1 = [ (r,times) for (r,times) in results \
-									if r['appranks'] == numappranks \
-									   and r['degree'] == degree \
-									   and r['lewi'] == lewi \
-									   and r['drom'] == drom \
-									   and r['numnodes'] == numnodes \
-									   and (r['policy'] == policy or int(degree) == 1) ]
-
-						avg = 0
-						stdev = 0
-						if len(curr1) > 0:
-							nsteps = 1+max([int(r['step']) for (r,times) in curr1])
-							curr = [ (r,times) for (r,times) in curr1 \
-										   if int(r['step']) >= nsteps*0.67  ] 
-							vals = []
-							for step in range(0,nsteps):
-								curr2 = [average(times) for r,times in curr if int(r['step']) == step]
-								if len(curr2) > 0:
-									vals.append(max(curr2))
-
-							if len(vals) > 0:
-								avg = average(vals)
-								stdev = np.std(vals)
-						avgs.append(avg / 1000.0)  # Convert ms to seconds
-						stdevs.append(stdev / 1000.0)
-
-					if kd == 0:
-						xmid = average(xnodes)
-						#if policy == 'global':
-						ypos = -6
-						#else:
-						#	ypos = -9
-						if appranks_per_node > 1:
-							label = f'MicroPP ({appranks_per_node} appranks per node)'
-						else:
-							label = f'MicroPP (1 apprank per node)'
-
-						plt.text(xmid, ypos, label, ha ='center')
-
-				print(f'Plot {xx} {avgs} {stdevs}')
-				print(len(xx), len(avgs), len(stdevs))
-				legend = f'degree {degree}' if degreecode > 0 else 'No DLB'
-				plt.bar(xx, avgs, width, yerr=stdevs, label=legend)
-
-			plt.xticks(xticksx, xtickslabels)
-			plt.ylim(0,37)
-			plt.legend(loc='lower right', ncol=5)
-			plt.ylabel('Exec. time per timestep (secs)')
-			#ax.xaxis.labelpad = 50
-			pdf.savefig()
-			plt.close()
+						label = f'MicroPP (1 apprank per node)'
+
+					texts.append((xmid, ypos, label))
+
+			print(f'Plot {xx} {avgs} {stdevs}')
+			print(len(xx), len(avgs), len(stdevs))
+			legend = f'degree {degree}' if degreecode > 0 else 'No DLB'
+			bars.append((xx, avgs, stdevs, legend))
+
+		plotpool.figure(filename, plot_barchart, texts, bars, width, xticksx, xtickslabels)
 
 	
 
@@ -0,0 +1,5 @@
+# Declaration of this benchmark for run-benchmarks.py (see benchmarks.py)
+name = 'nbody'
+description = 'n-body benchmark'
+module = 'nbody'
+needs_cmake = False
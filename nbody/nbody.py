@@ -3,15 +3,17 @@ import sys
 import os
 from string import Template
 import re
+import plotpool
+import steadystate
 
-# Workaround for python/3.6.6_gdb doesn't support numpy
-# See run-benchmarks.py
-try:
+# NumPy and matplotlib are slow to import, so they are only imported when
+# plotting. See run-benchmarks.py for the python/3.6.6_gdb workaround.
+def import_plotting():
+	global np, PdfPages, plt
 	import numpy as np
 	from matplotlib.backends.backend_pdf import PdfPages
 	import matplotlib.pyplot as plt
-except ImportError:
-	pass
+	plotpool.setup_matplotlib()
 
 # Template to create the command to run the benchmark
 command_template = ' '.join(['runhybrid.py --hybrid-directory $$hybrid_directory $hybrid_params --debug false --vranks $vranks --$policy --degree $degree --monitor 10 --local-period 10 --config-override dlb.enable_drom=$drom,dlb.enable_lewi=$lewi',
@@ -39,7 +41,7 @@ def make():
 	
 est_time_secs = 0
 
-# Return the list of all commands to run
+# Generate all commands to run, each with the parameters of its template
 def commands(num_nodes, hybrid_params):
 	global est_time_secs
 	est_time_secs = 0
@@ -54,9 +56,10 @@ def commands(num_nodes, hybrid_params):
 		for policy in policies:
 			for drom in ['true']: # ['true','false'] if degree != 1
 				for lewi in ['true']: # ['true','false'] if degree != 1
-					cmd = t.substitute(vranks=vranks, degree=degree, drom=drom, lewi=lewi, policy=policy, hybrid_params=hybrid_params)
+					params = dict(vranks=vranks, degree=degree, drom=drom, lewi=lewi, policy=policy, hybrid_params=hybrid_params)
+					cmd = t.substitute(params)
 					est_time_secs += 60 # Approx. 6 seconds per iteration
-					yield cmd
+					yield cmd, params
 
 def get_est_time_secs():
 	global est_time_secs
@@ -65,25 +68,53 @@ def get_est_time_secs():
 
 # Get all values of a field 
 def get_values(results, field):
-	values = set([])
-	for r, times in results:
-		values.add(r[field])
-		if field =='appranks' and r[field] == '':
-			print(r)
-	#print(f'values for {field} is {values}')
-	return sorted(values)
+	return results.values(field)
 
 def average(l):
 	return 1.0 * sum(l) / len(l)
 
+# Execution time per timestep, one line per apprank
+def plot_time_series(filename, lines, policy, degree):
+	import_plotting()
+	with PdfPages(filename) as pdf:
+		maxy = 0
+		for xx, yy, label in lines:
+			plt.plot(xx, yy, label = label)
+			maxy = max(maxy,max(yy))
+		plt.title('%s degree %d: Execution time per timestep' % (policy, degree))
+		plt.xlabel('Iteration number')
+		plt.ylabel('Execution time (s)')
+		plt.ylim(0,maxy)
+		plt.legend()
+		pdf.savefig()
+		plt.close()
+
+def plot_barchart(filename, bars, labels):
+	import_plotting()
+	with PdfPages(filename) as pdf:
+		if len(bars) == 0:
+			return
+		width = 0.1
+		for k, avgs, stdev, label in bars:
+			ind = np.arange(len(avgs))
+			plt.bar(ind + k * width, avgs, width, yerr=stdev, label=label)
+		plt.xticks(ind + 2*width, labels)
+		plt.legend(loc='best')
+		pdf.savefig()
+		plt.close()
+
 def generate_plots(results, output_prefix_str):
+	import_plotting()
 	# Keep only results for correct executable
-	results = [ (r,times) for (r,times) in results if r['executable'] == 'build/n_body']
+	results = results.select(executable='build/n_body')
+	results = results.derive('rank_num', 'rank', int)
+	results = results.derive('step_num', 'step', int)
 	#print(f'results={results}')
 
 	policies = get_values(results, 'policy')
 	degrees = get_values(results, 'degree')
 	apprankss = get_values(results, 'appranks')
+	index = results.index(['appranks', 'degree', 'lewi', 'drom', 'policy'])
 
 	# Generate time series plots
 	for appranks in apprankss:
@@ -103,80 +134,57 @@ def generate_plots(results, output_prefix_str):
 								dlb_str = 'nodlb'
 						title = 'nbody-appranks%d-%s-deg%d-%s.pdf' % (appranks, policy, degree, dlb_str)
 
-						res = [ (r,times) for (r,times) in results \
-									if r['appranks'] == appranks \
-									   and r['degree'] == degree \
-									   and r['lewi'] == lewi \
-									   and r['drom'] == drom \
-									   and (r['policy'] == policy or degree == 1)]
+						res = index.get(appranks=appranks, degree=degree, lewi=lewi, drom=drom,
+										policy=policy if degree != 1 else policies)
 						if len(res) > 0:
-							nsteps = 1+max([int(r['step']) for (r,times) in results])
-
-							with PdfPages('output/%s%s' % (output_prefix_str,title)) as pdf:
-								maxy = 0
-								for rank in range(0, appranks):
-									xx = []
-									yy = []
-									for step in range(0,nsteps):
-										t = [times for r,times in res \
-											if int(r['rank']) == rank and int(r['step']) == step]
-										#print(f'degree={degree} rank={rank} step={step} t={t}')
-										if len(t) == 1:
-											xx.append(step)
-											yy.append(average(t[0]) / 1000.0)
-										else:
-											assert len(t) == 0
-									plt.plot(xx, yy, label = f'Apprank {rank}')
-									maxy = max(maxy,max(yy))
-								plt.title('%s degree %d: Execution time per timestep' % (policy, degree))
-								plt.xlabel('Iteration number')
-								plt.ylabel('Execution time (s)')
-								plt.ylim(0,maxy)
-								plt.legend()
-								pdf.savefig()
-								plt.close()
+							nsteps = 1+max(get_values(results, 'step_num'))
+							res_index = res.index(['rank_num', 'step_num'])
+
+							lines = []
+							for rank in range(0, appranks):
+								xx = []
+								yy = []
+								for step in range(0,nsteps):
+									t = res_index.get(rank_num=rank, step_num=step)
+									#print(f'degree={degree} rank={rank} step={step} t={t}')
+									if len(t) == 1:
+										xx.append(step)
+										yy.append(t.means()[0] / 1000.0)
+									else:
+										assert len(t) == 0
+								lines.append((xx, yy, f'Apprank {rank}'))
+							plotpool.figure('output/%s%s' % (output_prefix_str,title), plot_time_series, lines, policy, degree)
 	
 	# Generate barcharts
-	with PdfPages('output/%snbody-barcharts.pdf' % output_prefix_str) as pdf:
-		lewi = 'true'
-		drom = 'true'
-		groups = [(4, 'local'), (4, 'global'), (8, 'local'), (8, 'global'), (16, 'local'), (16, 'global')]
-		ind = None
-		for k,degree in enumerate(degrees):
-			avgs = []
-			stdevs = []
-			for (appranks, policy) in groups:
-				curr = [ (r,times) for (r,times) in results \
-							if r['appranks'] == appranks \
-							   and r['degree'] == degree \
-							   and r['lewi'] == lewi \
-							   and r['drom'] == drom \
-							   and (r['policy'] == policy or int(degree) == 1)\
-							   and int(r['step']) >= nsteps*0.67  ] 
-				vals = []
-				for step in range(0,nsteps):
-					curr2 = [average(times) for r,times in curr if int(r['step']) == step]
-					if len(curr2) > 0:
-						vals.append(max(curr2))
-
-				if len(vals) > 0:
-					avg = average(vals)
-					stdev = np.std(vals)
-				else:
-					avg = 0
-					stdev = 0
-				avgs.append(avg)
-				stdevs.append(stdev)
-			ind = np.arange(len(avgs))
-			width = 0.1
-			plt.bar(ind + k * width, avgs, width, yerr=stdev, label='degree %d' % degree)
-		if not ind is None:
-			plt.xticks(ind + 2*width, ['%d %s' % g for g in groups])
-			plt.legend(loc='best')
-			pdf.savefig()
-			plt.close()
-	sys.exit(1)
-
+	lewi = 'true'
+	drom = 'true'
+	groups = [(4, 'local'), (4, 'global'), (8, 'local'), (8, 'global'), (16, 'local'), (16, 'global')]
+	bars = []
+	for k,degree in enumerate(degrees):
+		avgs = []
+		stdevs = []
+		for (appranks, policy) in groups:
+			curr = index.get(appranks=appranks, degree=degree, lewi=lewi, drom=drom,
+							 policy=policy if int(degree) != 1 else policies)
+			by_step = curr.index(['step_num'])
+			vals = []
+			for step in range(0,nsteps):
+				curr2 = by_step.get(step_num=step).means().tolist()
+				if len(curr2) > 0:
+					vals.append(max(curr2))
+
+			# Leave out the warm-up steps (see steadystate.py)
+			vals = steadystate.steady_values(vals)
+			if len(vals) > 0:
+				avg = average(vals)
+				stdev = np.std(vals)
+			else:
+				avg = 0
+				stdev = 0
+			avgs.append(avg)
+			stdevs.append(stdev)
+		bars.append((k, avgs, stdev, 'degree %d' % degree))
+	plotpool.figure('output/%snbody-barcharts.pdf' % output_prefix_str, plot_barchart, bars, ['%d %s' % g for g in groups])
 
 	
 
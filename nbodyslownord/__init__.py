@@ -0,0 +1,9 @@
+# Declaration of this benchmark for run-benchmarks.py (see benchmarks.py)
+name = 'nbodyslownord'
+description = 'nbody with a slow node on Nord3'
+module = 'nbodyslownord'
+needs_cmake = True
+
+# Runs on one more node than its node counts, the extra one slowed down,
+# using a heterogeneous job. Cannot be combined with other benchmarks.
+slow_node = True
@@ -0,0 +1,131 @@
+#! /usr/bin/env python
+import os
+import sys
+import time
+import asyncio
+import subprocess
+import asyncrunner
+
+# Node packing for interactive and batch with --pack: the nodes of the
+# allocation are split into disjoint subsets, and commands of the run plan
+# that need fewer nodes than the allocation run at the same time, each on
+# its own subset. The commands are started largest first, and whenever
+# nodes are freed the first waiting command that fits is started.
+#
+# On Slurm the subset is given to runhybrid.py through the usual
+# SLURM_JOB_NODELIST, SLURM_NODELIST, SLURM_JOB_NUM_NODES and SLURM_NNODES
+# variables. In local mode (to test on one machine) each "node" is a
+# disjoint set of the CPUs of this process, and each command is bound to
+# the CPUs of its nodes. The commands are run by asyncrunner.py.
+
+class Node:
+	def __init__(self, name, cpus=None):
+		self.name = name
+		self.cpus = cpus
+
+# The nodes of the Slurm allocation
+def slurm_nodes(nodelist):
+	s = subprocess.run(['scontrol', 'show', 'hostnames', nodelist], stdout=subprocess.PIPE, universal_newlines=True)
+	if s.returncode != 0:
+		print(f'Error: cannot expand node list {nodelist}')
+		sys.exit(1)
+	return [Node(name) for name in s.stdout.split()]
+
+# num_nodes "nodes" on this machine, each with an equal share of the CPUs
+def local_nodes(num_nodes):
+	cpus = sorted(os.sched_getaffinity(0))
+	per_node = len(cpus) // num_nodes
+	if per_node == 0:
+		print(f'Error: cannot split {len(cpus)} CPUs into {num_nodes} nodes')
+		sys.exit(1)
+	nodes = []
+	for k in range(num_nodes):
+		node_cpus = cpus[k*per_node : (k+1)*per_node]
+		nodes.append(Node(f'cpus{node_cpus[0]}-{node_cpus[-1]}', node_cpus))
+	return nodes
+
+def command_env(nodes):
+	env = dict(os.environ)
+	if nodes[0].cpus is None:
+		nodelist = ','.join([node.name for node in nodes])
+		env['SLURM_JOB_NODELIST'] = nodelist
+		env['SLURM_NODELIST'] = nodelist
+		env['SLURM_JOB_NUM_NODES'] = str(len(nodes))
+		env['SLURM_NNODES'] = str(len(nodes))
+	return env
+
+def node_cpus(nodes):
+	cpus = set([])
+	for node in nodes:
+		if not node.cpus is None:
+			cpus.update(node.cpus)
+	return cpus
+
+# Run the plan on the nodes. prepare(entry, nodes) returns the command for
+# the plan entry, its job output file and the function to call with each
+# line of its stdout (or None), and
+# finished(entry, returncode, secs, rusage, timed_out) is called when it
+# is done (see asyncrunner.run_command). If
+# finished returns a number, the entry is run again after that many
+# seconds. timeout(entry), if given, is the time limit of the entry (see
+# watchdog.py).
+def run(plan, nodes, prepare, finished=None, timeout=None):
+	for entry in plan:
+		if entry.num_nodes > len(nodes):
+			print(f'Error: [{entry.hash}] needs {entry.num_nodes} nodes but only {len(nodes)} available')
+			sys.exit(1)
+	asyncrunner.run_until_complete(run_async(plan, nodes, prepare, finished, timeout))
+
+async def run_async(plan, nodes, prepare, finished, timeout):
+	waiting = sorted(plan, key = lambda entry: -entry.num_nodes)
+	free = list(nodes)
+	running = {}   # task -> (entry, nodes)
+	delayed = []   # (time to run again, entry)
+	try:
+		while len(waiting) > 0 or len(running) > 0 or len(delayed) > 0:
+			# Entries to run again whose back-off is over
+			now = time.time()
+			for when, entry in [d for d in delayed if d[0] <= now]:
+				delayed.remove((when, entry))
+				waiting.append(entry)
+				waiting.sort(key = lambda entry: -entry.num_nodes)
+			# Start every waiting command that fits, in order
+			k = 0
+			while k < len(waiting):
+				entry = waiting[k]
+				if entry.num_nodes <= len(free):
+					my_nodes = free[:entry.num_nodes]
+					free = free[entry.num_nodes:]
+					cmd, output, on_line = prepare(entry, my_nodes)
+					names = ','.join([node.name for node in my_nodes])
+					print(f'Start [{entry.hash}] on {names}: {cmd}')
+					entry_timeout = timeout(entry) if not timeout is None else None
+					task = asyncio.ensure_future(asyncrunner.run_command(cmd, output, command_env(my_nodes), node_cpus(my_nodes),
+																		timeout=entry_timeout, on_line=on_line))
+					running[task] = (entry, my_nodes)
+					del waiting[k]
+				else:
+					k += 1
+			if len(running) == 0:
+				# Only waiting for a back-off
+				await asyncio.sleep(max(0, min([d[0] for d in delayed]) - time.time()))
+				continue
+			wait_secs = None
+			if len(delayed) > 0:
+				wait_secs = max(0, min([d[0] for d in delayed]) - time.time())
+			done, pending = await asyncio.wait(running.keys(), timeout=wait_secs, return_when=asyncio.FIRST_COMPLETED)
+			for task in done:
+				entry, my_nodes = running.pop(task)
+				returncode, secs, rusage, timed_out = task.result()
+				print(f'Finished [{entry.hash}] with status {returncode}; {len(waiting)} waiting')
+				free.extend(my_nodes)
+				if not finished is None:
+					again = finished(entry, returncode, secs, rusage, timed_out)
+					if not again is None:
+						delayed.append((time.time() + again, entry))
+	except asyncio.CancelledError:
+		# Interrupted: terminate the running commands
+		for task in running:
+			task.cancel()
+		await asyncio.gather(*running.keys(), return_exceptions=True)
+		raise
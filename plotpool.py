@@ -0,0 +1,156 @@
+#! /usr/bin/env python
+import os
+import sys
+import time
+import io
+import contextlib
+import multiprocessing
+import pickle
+import hashlib
+
+# Rendering of the PDF figures for the process command. The benchmark
+# modules work out what goes in each figure, then pass it to figure()
+# with a module-level function to draw it:
+#
+#   plotpool.figure(filename, plot_func, arg1, arg2, ...)
+#
+# runs plot_func(filename, arg1, arg2, ...), which writes the whole PDF.
+# Without a pool (the default) it runs straight away. After start(n) it is
+# queued on a pool of n processes using the Agg backend, and finish()
+# waits for all figures, printing their output in the order they were
+# queued. The arguments are pickled for the workers after figure()
+# returns, so they must not be modified afterwards.
+#
+# After load_cache(), a figure is skipped if its PDF was written from the
+# same arguments by the same plot function (see figure_hash), and the
+# output printed when it was rendered is shown again instead.
+
+pool = None
+pending = []
+
+# (filename, secs) for every figure rendered
+timings = []
+
+# Figures skipped because they were unchanged
+skipped = []
+
+# Plot cache: filename -> (figure_hash, output) for each PDF written
+cache_file = None
+cache = {}
+cache_version = 1
+
+def use_agg():
+	import matplotlib
+	matplotlib.use('Agg')
+
+# Settings for every plot, done by each module's import_plotting()
+def setup_matplotlib():
+	import matplotlib
+	matplotlib.rcParams.update({'figure.autolayout': True})
+
+def start(workers):
+	global pool
+	use_agg()
+	pool = multiprocessing.Pool(workers, initializer=use_agg)
+
+# Render one figure; run in the worker processes when there is a pool
+def render(filename, func, args):
+	output = io.StringIO()
+	status = None
+	start_time = time.time()
+	with contextlib.redirect_stdout(output):
+		try:
+			func(filename, *args)
+		except SystemExit as e:
+			# Do not let sys.exit() take down a worker process
+			status = e.code
+	return filename, time.time() - start_time, output.getvalue(), status
+
+def collect(result, key):
+	filename, secs, output, status = result
+	sys.stdout.write(output)
+	timings.append((filename, secs))
+	if status is not None:
+		sys.exit(status)
+	cache[filename] = (key, output)
+
+# Hash of everything the figure is built from: the data and styling in
+# the arguments, and the source of the plot function
+def figure_hash(func, args):
+	import inspect
+	h = hashlib.sha1()
+	h.update(f'{func.__module__}.{func.__qualname__}'.encode())
+	try:
+		h.update(inspect.getsource(func).encode())
+	except (OSError, TypeError):
+		h.update(func.__code__.co_code)
+	h.update(pickle.dumps(args, protocol=4))
+	return h.hexdigest()
+
+def figure(filename, func, *args):
+	key = None
+	if not cache_file is None:
+		key = figure_hash(func, args)
+		if filename in cache and cache[filename][0] == key and os.path.exists(filename):
+			sys.stdout.write(cache[filename][1])
+			skipped.append(filename)
+			return
+	if pool is None:
+		collect(render(filename, func, args), key)
+	else:
+		pending.append((pool.apply_async(render, (filename, func, args)), key))
+
+# Wait for all the queued figures
+def finish():
+	global pool
+	global pending
+	if pool is None:
+		save_cache()
+		return
+	try:
+		for p, key in pending:
+			collect(p.get(), key)
+	finally:
+		pool.close()
+		pool.join()
+		pool = None
+		pending = []
+		save_cache()
+
+def load_cache(filename, rebuild=False):
+	global cache_file
+	global cache
+	cache_file = filename
+	cache = {}
+	if rebuild or not os.path.exists(cache_file):
+		return
+	try:
+		with open(cache_file, 'rb') as fp:
+			version, c = pickle.load(fp)
+	except Exception as e:
+		print(f'Ignoring unreadable plot cache {cache_file}: {e}')
+		return
+	if version == cache_version:
+		cache = c
+
+def save_cache():
+	if cache_file is None:
+		return
+	tmp_file = cache_file + '.tmp'
+	try:
+		with open(tmp_file, 'wb') as fp:
+			pickle.dump((cache_version, cache), fp, protocol=pickle.HIGHEST_PROTOCOL)
+		os.replace(tmp_file, cache_file)
+	except OSError as e:
+		print(f'Cannot write plot cache {cache_file}: {e}')
+
+# Summary of the slowest figures, given the elapsed time for all of them
+def print_timings(elapsed, num=10):
+	if len(skipped) > 0:
+		print(f'Skipped {len(skipped)} unchanged figures')
+	if len(timings) == 0:
+		return
+	total = sum([secs for filename, secs in timings])
+	print('Rendered %d figures in %.2f secs (%.2f secs rendering); slowest:' % (len(timings), elapsed, total))
+	for filename, secs in sorted(timings, key=lambda t: -t[1])[:num]:
+		print('%8.2f secs  %s' % (secs, filename))
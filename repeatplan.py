@@ -0,0 +1,90 @@
+#! /usr/bin/env python
+import os
+import math
+import logscan
+import runindex
+import steadystate
+
+# Adaptive number of repeats for interactive and batch with --adaptive.
+# Each completed run of a command of the plan (a configuration) gives one
+# sample: the mean of its steady-state times (see steadystate.py), over
+# its series (e.g. ranks). After each round, the configurations whose
+# samples have a 95% confidence interval wider than target_rel_halfwidth
+# of their mean (or that have fewer than min_repeats samples) are run once
+# more, up to max_repeats runs. The repeats of a round are in random
+# order, so a drift in the performance of the nodes does not fall on any
+# one policy or degree.
+
+target_rel_halfwidth = 0.05
+min_repeats = 3
+max_repeats = 10
+
+# Samples of job outputs already read: output -> sample (or None)
+samples_cache = {}
+
+# Mean of the steady-state times of a job output, or None if it has none
+def output_sample(output):
+	if not output in samples_cache:
+		series = {}
+		lines = logscan.scan_lines(output)
+		next(lines, '')
+		for line in lines:
+			if line.startswith('# '):
+				m = logscan.re_result.match(line)
+				if m:
+					key = logscan.series_key(logscan.result_fields(m))
+					series.setdefault(key, []).append(float(m.group(5)))
+		means = [steadystate.steady_mean(values)[0] for values in series.values()]
+		samples_cache[output] = sum(means) / len(means) if len(means) > 0 else None
+	return samples_cache[output]
+
+# For each hash, the samples of its completed runs and the number of
+# times it has been run (including failed runs)
+def read_samples():
+	samples = {}
+	num_runs = {}
+	for entry in runindex.read_index():
+		if entry.get('event') != 'end':
+			continue
+		num_runs[entry['hash']] = num_runs.get(entry['hash'], 0) + 1
+		if entry.get('status') == 0:
+			sample = output_sample(os.path.join(runindex.index_dir, entry['output']))
+			if not sample is None:
+				samples.setdefault(entry['hash'], []).append(sample)
+	return samples, num_runs
+
+# Half-width of the 95% confidence interval of the mean of the samples,
+# relative to the mean (None if fewer than two)
+def rel_halfwidth(samples):
+	n = len(samples)
+	if n < 2:
+		return None
+	mean = sum(samples) / n
+	if mean <= 0:
+		return None
+	var = sum([(v - mean) ** 2 for v in samples]) / (n - 1)
+	return steadystate.t_quantile(n - 1) * math.sqrt(var / n) / mean
+
+def needs_repeat(samples, num_runs):
+	if num_runs >= max_repeats:
+		return False
+	if len(samples) < min_repeats:
+		return True
+	halfwidth = rel_halfwidth(samples)
+	return halfwidth is None or halfwidth > target_rel_halfwidth
+
+# The entries of the plan to run again in the next round, in random order
+def next_round(plan, rng):
+	samples, num_runs = read_samples()
+	repeats = [entry for entry in plan if needs_repeat(samples.get(entry.hash, []), num_runs.get(entry.hash, 0))]
+	rng.shuffle(repeats)
+	return repeats
+
+# Relative half-width of each entry of the plan, for the summary
+def print_summary(plan):
+	samples, num_runs = read_samples()
+	for entry in plan:
+		s = samples.get(entry.hash, [])
+		halfwidth = rel_halfwidth(s)
+		hw_str = f'{100.0 * halfwidth:.1f}%' if not halfwidth is None else '-'
+		print(f'[{entry.hash}] {entry.benchmark} on {entry.num_nodes} nodes: {len(s)} samples, CI half-width {hw_str}')
@@ -0,0 +1,443 @@
+#! /usr/bin/env python
+import sys
+import itertools
+from array import array
+import numpy as np
+
+# Table of results held as one array per field, rather than as a list of
+# dicts. Each row is one result, as produced by get_file_results, with
+# one or more times (one for the raw results, a list after averaging).
+#
+# The fields in int_fields are stored as int64 arrays. All other fields
+# (executable, policy, lewi, drom, params, fullname and the key=value
+# parameters such as iter or imb) are categorical: an int32 array of
+# codes into a list of the distinct values, with -1 for a missing value.
+#
+# A table built by StreamingAggregator keeps no times at all, only the
+# count, mean, M2, min and max of the times of each row (see stats_fields).
+
+int_fields = ('appranks', 'degree', 'numnodes')
+
+stats_fields = ('count', 'mean', 'm2', 'min', 'max')
+
+# Accumulate rows one at a time, then build the ResultTable
+class ResultTableBuilder:
+	def __init__(self):
+		self.num_rows = 0
+		self.ints = {}          # name -> array('q')
+		self.codes = {}         # name -> array('i')
+		self.categories = {}    # name -> list of distinct values
+		self.lookup = {}        # name -> dict value -> code
+		self.times = array('d')
+		self.counts = array('q')
+
+	def add_field(self, name):
+		if name in int_fields:
+			if self.num_rows > 0:
+				print(f'Integer field {name} missing from earlier results')
+				sys.exit(1)
+			self.ints[name] = array('q')
+		else:
+			self.codes[name] = array('i', [-1]) * self.num_rows
+			self.categories[name] = []
+			self.lookup[name] = {}
+
+	def intern(self, name, value):
+		lookup = self.lookup[name]
+		code = lookup.get(value)
+		if code is None:
+			code = len(self.categories[name])
+			lookup[value] = code
+			self.categories[name].append(value)
+		return code
+
+	# Add one row: r is the dict of fields and times is a single time or a list
+	def append(self, r, times):
+		for name in r:
+			if not name in self.ints and not name in self.codes:
+				self.add_field(name)
+		for name, col in self.ints.items():
+			col.append(r[name])
+		for name, col in self.codes.items():
+			if name in r:
+				col.append(self.intern(name, r[name]))
+			else:
+				col.append(-1)
+		if isinstance(times, (list, tuple)):
+			self.times.extend(times)
+			self.counts.append(len(times))
+		else:
+			self.times.append(times)
+			self.counts.append(1)
+		self.num_rows += 1
+
+	def extend(self, results):
+		for r, times in results:
+			self.append(r, times)
+
+	def table(self):
+		columns = {}
+		for name, col in self.ints.items():
+			columns[name] = np.frombuffer(col, dtype=np.int64).copy() if len(col) > 0 else np.zeros(0, dtype=np.int64)
+		for name, col in self.codes.items():
+			columns[name] = np.frombuffer(col, dtype=np.int32).copy() if len(col) > 0 else np.zeros(0, dtype=np.int32)
+		offsets = np.zeros(self.num_rows + 1, dtype=np.int64)
+		if self.num_rows > 0:
+			np.cumsum(np.frombuffer(self.counts, dtype=np.int64), out=offsets[1:])
+		times = np.frombuffer(self.times, dtype=np.float64).copy() if len(self.times) > 0 else np.zeros(0)
+		return ResultTable(columns, dict(self.categories), times, offsets)
+
+
+class ResultTable:
+	def __init__(self, columns, categories, times, offsets, lookups=None, stats=None):
+		self.columns = columns          # name -> array, int64 values or int32 codes
+		self.categories = categories    # name -> list of values, for categorical fields
+		self.times = times              # all times, row by row
+		self.offsets = offsets          # times of row i are times[offsets[i]:offsets[i+1]]
+		self.stats = stats              # None, or stats field -> array, if the times were not kept
+		# name -> dict value -> code, built when needed and shared with the
+		# tables taken from this one, as they share the categories
+		self.lookups = lookups if not lookups is None else {}
+
+	@staticmethod
+	def from_records(results):
+		builder = ResultTableBuilder()
+		builder.extend(results)
+		return builder.table()
+
+	@staticmethod
+	def empty():
+		return ResultTableBuilder().table()
+
+	def __len__(self):
+		return len(self.offsets) - 1
+
+	def fields(self):
+		return list(self.columns.keys())
+
+	def is_categorical(self, name):
+		return name in self.categories
+
+	def has_times(self):
+		return self.stats is None
+
+	# The result in row i as a dict, like those built by get_file_results
+	def row(self, i):
+		r = {}
+		for name, col in self.columns.items():
+			if name in self.categories:
+				code = col[i]
+				if code >= 0:
+					r[name] = self.categories[name][code]
+			else:
+				r[name] = int(col[i])
+		return r
+
+	def times_of(self, i):
+		if not self.stats is None:
+			print('Individual times are not kept by the streaming results')
+			sys.exit(1)
+		return self.times[self.offsets[i]:self.offsets[i+1]].tolist()
+
+	# The times of every row, as a list of lists
+	def time_lists(self):
+		return [self.times_of(i) for i in range(len(self))]
+
+	# Number, average, maximum and standard deviation of the times in each row
+	def counts(self):
+		if not self.stats is None:
+			return self.stats['count']
+		return self.offsets[1:] - self.offsets[:-1]
+
+	def means(self):
+		if not self.stats is None:
+			return self.stats['mean']
+		if len(self) == 0:
+			return np.zeros(0)
+		return np.add.reduceat(self.times, self.offsets[:-1]) / self.counts()
+
+	def maxes(self):
+		if not self.stats is None:
+			return self.stats['max']
+		if len(self) == 0:
+			return np.zeros(0)
+		return np.maximum.reduceat(self.times, self.offsets[:-1])
+
+	def stdevs(self):
+		if not self.stats is None:
+			return np.sqrt(self.stats['m2'] / self.stats['count'])
+		return np.array([np.std(self.times_of(i)) for i in range(len(self))])
+
+	# Iterate over the results in each row, without their times
+	def rows(self):
+		for i in range(len(self)):
+			yield self.row(i)
+
+	# Iterate as (r, times) pairs, so that the table can be used wherever
+	# a list of results was used before
+	def __iter__(self):
+		for i in range(len(self)):
+			yield self.row(i), self.times_of(i)
+
+	# Decoded values of a field as an array (object array for categorical
+	# fields, with None where the field is missing)
+	def column(self, name):
+		if not name in self.categories:
+			return self.columns[name]
+		values = np.empty(len(self.categories[name]) + 1, dtype=object)
+		values[:-1] = self.categories[name]
+		values[-1] = None
+		return values[self.columns[name]]
+
+	# Sorted distinct values of a field
+	def values(self, name):
+		if not name in self.columns:
+			return []
+		present = np.unique(self.columns[name])
+		if name in self.categories:
+			cats = self.categories[name]
+			return sorted([cats[code] for code in present if code >= 0])
+		return [int(v) for v in present]
+
+	def lookup(self, name):
+		if not name in self.lookups:
+			self.lookups[name] = dict((v, code) for code, v in enumerate(self.categories[name]))
+		return self.lookups[name]
+
+	# Codes (or integer values) matching a value or list of values
+	def codes_of(self, name, values):
+		if not isinstance(values, (list, tuple, set, frozenset)):
+			values = [values]
+		if name in self.categories:
+			lookup = self.lookup(name)
+			return [lookup[v] for v in values if v in lookup]
+		return list(values)
+
+	# Boolean mask of the rows whose fields have the given values, where a
+	# list of values matches any of them
+	def mask(self, **criteria):
+		mask = np.ones(len(self), dtype=bool)
+		for name, values in criteria.items():
+			if not name in self.columns:
+				mask[:] = False
+				continue
+			codes = self.codes_of(name, values)
+			if len(codes) == 1:
+				mask &= self.columns[name] == codes[0]
+			else:
+				mask &= np.isin(self.columns[name], codes)
+		return mask
+
+	def select(self, **criteria):
+		return self.take(self.mask(**criteria))
+
+	# New table with the given rows (index array or boolean mask). The
+	# categories are shared with this table
+	def take(self, rows):
+		rows = np.asarray(rows)
+		if rows.dtype == bool:
+			rows = np.nonzero(rows)[0]
+		columns = dict((name, col[rows]) for name, col in self.columns.items())
+		starts = self.offsets[rows]
+		counts = self.offsets[rows + 1] - starts
+		offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+		np.cumsum(counts, out=offsets[1:])
+		positions = np.repeat(starts - offsets[:-1], counts) + np.arange(offsets[-1])
+		stats = None
+		if not self.stats is None:
+			stats = dict((name, col[rows]) for name, col in self.stats.items())
+		return ResultTable(columns, self.categories, self.times[positions], offsets, self.lookups, stats)
+
+	# New table with an extra categorical field, whose value is func applied
+	# to the value of field source (e.g. the iteration number as an integer
+	# from the iter string). func is only called once per distinct value
+	# present in this table
+	def derive(self, name, source, func):
+		cats = []
+		lookup = {}
+		source_cats = self.categories.get(source, [])
+		source_codes = self.columns.get(source, np.full(len(self), -1, dtype=np.int32))
+		recode = np.full(len(source_cats) + 1, -1, dtype=np.int32)
+		for code in np.unique(source_codes).tolist():
+			if code < 0:
+				continue
+			value = func(source_cats[code])
+			new_code = lookup.get(value)
+			if new_code is None:
+				new_code = len(cats)
+				lookup[value] = new_code
+				cats.append(value)
+			recode[code] = new_code
+		columns = dict(self.columns)
+		columns[name] = recode[source_codes]
+		categories = dict(self.categories)
+		categories[name] = cats
+		lookups = dict(self.lookups)
+		lookups[name] = lookup
+		return ResultTable(columns, categories, self.times, self.offsets, lookups, self.stats)
+
+	def index(self, fields):
+		return ResultIndex(self, fields)
+
+	# Concatenate tables, merging the categories of each field
+	@staticmethod
+	def concat(tables):
+		tables = [t for t in tables if len(t) > 0]
+		assert all([t.stats is None for t in tables])
+		if len(tables) == 0:
+			return ResultTable.empty()
+		if len(tables) == 1:
+			return tables[0]
+		names = []
+		for t in tables:
+			for name in t.columns:
+				if not name in names:
+					names.append(name)
+		columns = {}
+		categories = {}
+		for name in names:
+			if name in int_fields:
+				for t in tables:
+					if not name in t.columns:
+						print(f'Integer field {name} missing from some results')
+						sys.exit(1)
+				columns[name] = np.concatenate([t.columns[name] for t in tables])
+				continue
+			cats = []
+			lookup = {}
+			parts = []
+			for t in tables:
+				if not name in t.columns:
+					parts.append(np.full(len(t), -1, dtype=np.int32))
+					continue
+				# Old code -> new code, with the extra last entry mapping -1 to -1
+				recode = np.empty(len(t.categories[name]) + 1, dtype=np.int32)
+				recode[-1] = -1
+				for code, v in enumerate(t.categories[name]):
+					new_code = lookup.get(v)
+					if new_code is None:
+						new_code = len(cats)
+						lookup[v] = new_code
+						cats.append(v)
+					recode[code] = new_code
+				parts.append(recode[t.columns[name]])
+			columns[name] = np.concatenate(parts)
+			categories[name] = cats
+		times = np.concatenate([t.times for t in tables])
+		offsets = [np.zeros(1, dtype=np.int64)]
+		base = 0
+		for t in tables:
+			offsets.append(t.offsets[1:] + base)
+			base += t.offsets[-1]
+		return ResultTable(columns, categories, times, np.concatenate(offsets))
+
+# Number the distinct combinations of the fields other than those in
+# exclude (or of the fields in names), in order of first appearance.
+# Returns (group, first), where group[i] is the group of row i and first[g]
+# is the first row in group g. The key of each row is built once from the
+# integer values and category codes, so no dicts are built or compared
+def group_rows(table, exclude=(), names=None):
+	if names is None:
+		names = [name for name in table.columns if not name in exclude]
+	n = len(table)
+	if n == 0:
+		return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+	if len(names) == 0:
+		return np.zeros(n, dtype=np.int64), np.zeros(1, dtype=np.int64)
+	keys = np.stack([table.columns[name].astype(np.int64) for name in names], axis=1)
+	_, first, inverse = np.unique(keys, axis=0, return_index=True, return_inverse=True)
+	inverse = inverse.reshape(-1)
+	# np.unique numbers the groups in sorted order: renumber by first row
+	order = np.argsort(first, kind='stable')
+	renumber = np.empty(len(order), dtype=np.int64)
+	renumber[order] = np.arange(len(order))
+	return renumber[inverse], first[order]
+
+# One row per group of rows that match on all fields except those in
+# exclude, holding the times of all rows in the group (in their original
+# order). The excluded fields, such as fullname, come from the first row
+# seen in the group
+def group_by(table, exclude=('fullname',)):
+	assert table.stats is None
+	group, first = group_rows(table, exclude)
+	grouped = table.take(np.argsort(group, kind='stable'))
+	counts = table.offsets[1:] - table.offsets[:-1]
+	offsets = np.zeros(len(first) + 1, dtype=np.int64)
+	np.cumsum(np.bincount(group, weights=counts, minlength=len(first)).astype(np.int64), out=offsets[1:])
+	columns = dict((name, col[first]) for name, col in table.columns.items())
+	return ResultTable(columns, table.categories, grouped.times, offsets)
+
+# Running statistics of the times of each group of results that match on
+# all fields except those in exclude, updated one result at a time with
+# Welford's algorithm. Only the statistics are kept, so the memory needed
+# depends on the number of distinct results, not on the number of times
+# (e.g. repeated runs or several archives). As for group_by, the excluded
+# fields come from the first result seen in each group
+class StreamingAggregator:
+	def __init__(self, exclude=('fullname',)):
+		self.exclude = exclude
+		self.groups = {}    # key -> [r, count, mean, m2, min, max]
+
+	def add(self, r, time):
+		key = tuple(sorted([(name, value) for name, value in r.items() if not name in self.exclude]))
+		g = self.groups.get(key)
+		if g is None:
+			self.groups[key] = [r, 1, time, 0.0, time, time]
+			return
+		g[1] += 1
+		delta = time - g[2]
+		g[2] += delta / g[1]
+		g[3] += delta * (time - g[2])
+		g[4] = min(g[4], time)
+		g[5] = max(g[5], time)
+
+	def extend(self, results):
+		for r, time in results:
+			self.add(r, time)
+
+	def table(self):
+		builder = ResultTableBuilder()
+		stats = dict((name, []) for name in stats_fields)
+		for r, count, mean, m2, tmin, tmax in self.groups.values():
+			builder.append(r, [])
+			for name, value in zip(stats_fields, (count, mean, m2, tmin, tmax)):
+				stats[name].append(value)
+		table = builder.table()
+		table.stats = dict((name, np.array(values, dtype=np.int64 if name == 'count' else np.float64))
+						   for name, values in stats.items())
+		return table
+
+# Hash index on some fields of a table, mapping each combination of values
+# to its rows. A lookup costs time proportional to the number of matching
+# rows, rather than a scan of the whole table
+class ResultIndex:
+	def __init__(self, table, fields):
+		self.table = table
+		self.fields = list(fields)
+		self.buckets = {}
+		for name in self.fields:
+			if not name in table.columns:
+				# No result has this field, so nothing can match
+				return
+		group, first = group_rows(table, names=self.fields)
+		order = np.argsort(group, kind='stable')
+		bounds = np.zeros(len(first) + 1, dtype=np.int64)
+		np.cumsum(np.bincount(group, minlength=len(first)), out=bounds[1:])
+		keys = zip(*[table.columns[name][first].tolist() for name in self.fields])
+		for g, key in enumerate(keys):
+			self.buckets[key] = order[bounds[g]:bounds[g+1]]
+
+	# Rows, in table order, with the given value for each indexed field,
+	# where a list of values matches any of them
+	def rows(self, **criteria):
+		assert set(criteria.keys()) == set(self.fields)
+		codes = [self.table.codes_of(name, criteria[name]) for name in self.fields]
+		parts = [self.buckets[key] for key in itertools.product(*codes) if key in self.buckets]
+		if len(parts) == 0:
+			return np.zeros(0, dtype=np.int64)
+		elif len(parts) == 1:
+			return parts[0]
+		return np.sort(np.concatenate(parts))
+
+	def get(self, **criteria):
+		return self.table.take(self.rows(**criteria))
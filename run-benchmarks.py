@@ -5,42 +5,40 @@ import os.path
 import sys
 import time
 import getopt
+import random
 import re
 import time
 import subprocess
-import copy
-from synthetic import unbalanced_sweep
-from syntheticscatter import syntheticscatter
-from syntheticslow import syntheticslow
-from syntheticconvergence import syntheticconvergence
-from bestdegree import bestdegree
-from syntheticslownord import syntheticslownord
-from micropp import micropp
-from nbody import nbody
-from nbodyslownord import nbodyslownord
+import io
+import contextlib
+import multiprocessing
+import pickle
+import importlib.util
 import check_num_nodes
+import benchmarks
+import runplan
+import nodepack
+import asyncrunner
+import watchdog
+import liveresults
+import steadystate
+import repeatplan
+import runtimes
+import runindex
+import manifest
+import logscan
+import plotpool
+from logscan import iter_file_results
 from string import Template
-import copy
 
-try:
-	import numpy as np
-	canImportNumpy = True
-except ImportError:
-	canImportNumpy = False
+# NumPy (and matplotlib, in the benchmark modules) are only imported by
+# the process command, as importing them is slow. Just check that NumPy
+# is available here.
+canImportNumpy = importlib.util.find_spec('numpy') is not None
 
 # Default parameters
-apps = ['synthetic', 'micropp', 'scatter', 'slow', 'nbody', 'convergence', 'bestdegree', 'slownord', 'nbodyslownord']
-needs_cmake = {'synthetic' : True, 'micropp' : False, 'scatter' : True, 'slow' : True, 'nbody' : False, 'convergence' : True, 'bestdegree' : True, 'slownord' : True, 'nbodyslownord' : True}
-include_apps = {'synthetic' : True, 'micropp' : True, 'scatter' : True, 'slow' : True, 'nbody' : True, 'convergence' : True, 'bestdegree' : True, 'slownord' : True, 'nbodyslownord' : True}
-apps_desc = {'synthetic' : 'synthetic benchmarks',
-			'micropp' : 'micropp benchmarks',
-			'scatter' : 'synthetic scatter benchmark',
-			'slow' : 'test with slow node',
-			'nbody' : 'n-body benchmark',
-			'convergence' : 'convergence benchmark',
-			'bestdegree' : 'bestdegree benchmark',
-			'slownord' : 'broken: slow node on Nord3',
-			'nbodyslownord' : 'nbody with a slow node on Nord3'}
+apps = list(benchmarks.registry)
+include_apps = dict([(app, True) for app in apps])
 
 verbose = True
 dry_run = False
@@ -51,20 +49,47 @@ req_policies = None
 extrae = False
 output_prefix = None
 archived_subfolder = None
+num_workers = 1
+stream_results = False
+rebuild_cache = False
+replot = False
+resume = False
+pack = False
+pack_local_nodes = None
+bin_pack = False
+max_job_hours = 48
+shard_hours = None
+plan_file = None
+array_jobs = False
+then_process = False
+sbatch_command = 'sbatch'
+timeout_factor = None
+max_retries = None
+live = False
+steady_stop = False
+adaptive = False
+ci_target = None
 
 # Fixed working/output directories
 job_output_dir = 'jobs/'
 output_dir = 'output/'
 archive_output_dir = 'archive/'
 
+# Cache of parsed results, kept in each folder with job outputs
+parse_cache_name = '.parse_cache.pickle'
+parse_cache_version = 3
+
+# Cache of the data each plot was made from, to skip unchanged plots
+plot_cache_name = '.plot_cache.pickle'
+
 def Usage():
 	print('./run-benchmarks.py <options> command')
 	print('where:')
 	print(' -h                      Show this help')
-	for a,d in apps_desc.items():
-		print(' --no-%-10s         Do not include %s' % (a,d))
-	for a,d in apps_desc.items():
-		print(' --%-10s            Include %s' % (a,d))
+	for a,b in benchmarks.registry.items():
+		print(' --no-%-10s         Do not include %s' % (a,b.description))
+	for a,b in benchmarks.registry.items():
+		print(' --%-10s            Include %s' % (a,b.description))
 	print(' --quiet                 Less verbose output')
 	print(' --dry-run               Show commands to run but do not run them')
 	print(' --qos queue             Choose queue')
@@ -73,15 +98,41 @@ def Usage():
 	print(' --extrae                Generate extrae trace')
 	print(' --local, --global       Specify allocation policy')
 	print(' --output-prefix         Prefix for filenames in output plots')
-	print(' --archived <folder_name> Subfolder of archive/ with results')
+	print(' --archived <folder_name> Subfolder of archive/ with results (or comma-separated list)')
+	print(' --jobs n                Number of worker processes to parse and plot for process (0 = one per CPU)')
+	print(' --rebuild-cache         Parse all job outputs again, ignoring the parse cache')
+	print(' --replot                Render all plots again, even if unchanged')
+	print(' --stream                Keep only running statistics of the times, in bounded memory')
+	print(' --pack                  Also run the commands for fewer nodes, several at a time on the allocation')
+	print(' --pack-local n          Same as --pack on this machine, with its CPUs split into n nodes')
+	print(' --bin-pack              Submit the commands for each number of nodes in as few jobs as possible')
+	print(' --max-hours h           Maximum time of each job for --bin-pack (default 48)')
+	print(' --plan-file file        Only run the commands in this plan file')
+	print(' --array                 Submit one job array per number of nodes, with one command per task')
+	print(' --shard-hours h         With --array, put commands together in tasks of at most h hours')
+	print(' --then-process          Submit a job to run process after all the submitted jobs')
+	print(' --sbatch cmd            Command to submit jobs (e.g. ./fake_sbatch.py to test locally)')
+	print(' --resume                Skip the commands that already completed (see jobs/run_index.jsonl)')
+	print(' --timeout-factor f      Kill commands that take f times their estimated time (default 2, 0 for no limit)')
+	print(' --retries n             Run a command that timed out again up to n times (default 2)')
+	print(' --live                  Add results to jobs/live_results.jsonl as they are written (see status)')
+	print(' --steady-stop           Stop each command once its times reach a steady state (see steadystate.py)')
+	print(' --adaptive              Repeat the commands whose times are not yet precise enough (see repeatplan.py)')
+	print(' --ci-target f           Relative 95% confidence interval half-width for --adaptive (default 0.05)')
 	print('Commands:')
 	print('make                     Run make')
 	print('interactive              Run interactively')
 	print('submit                   Submit jobs')
 	print('process                  Generate plots')
+	print('status                   Show the progress of the run plan and the latest results')
 	print('archive <folder_name>    Archive data')
 	return 1
 
+# Import the result tables, for the process command
+def import_results():
+	global ResultTable, StreamingAggregator, group_by
+	from resulttable import ResultTable, StreamingAggregator, group_by
+
 def print_time(desc):
 	now = time.strftime('%d/%m/%Y %H:%M:%S')
 	print(f'{desc} {now}')
@@ -114,19 +165,34 @@ job_script_template_oneslow = """#! /bin/bash
 ./run-benchmarks.py $args batch
 """
 
-def unique_output_name(subdir, prefix="", suffix=""):
-	basename = time.strftime('%Y%m%d_%H-%M')
-	counter = ''
-	k = 1
-	while k<100:
+# Template for the job script to generate the plots after the other jobs
+process_job_script_template = """#! /bin/bash
+#SBATCH --nodes=1
+#SBATCH --cpus-per-task=48
+#SBATCH --time=02:00:00
+#SBATCH --qos=$qos
+#SBATCH --output=$job_name.out
+#SBATCH --error=$job_name.err
 
-		fullname = os.path.join(subdir, prefix+basename+counter+suffix)
-		if not os.path.exists(fullname):
+./run-benchmarks.py --jobs 0 $args process
+"""
+
+# Job IDs of the jobs submitted, for --then-process
+submitted_jobids = []
+
+# New name in subdir with a new run ID (see runindex.py). With create,
+# the file is created, so that it cannot be taken by another job.
+def unique_output_name(subdir, prefix="", suffix="", create=False):
+	while True:
+		fullname = os.path.join(subdir, prefix + runindex.new_run_id() + suffix)
+		if create:
+			try:
+				os.close(os.open(fullname, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+				return fullname
+			except FileExistsError:
+				pass
+		elif not os.path.exists(fullname):
 			return fullname
-		counter = '_%d' % k
-		k = k + 1
-	print('Something went wrong')
-	sys.exit(1)
 
 def filter_command(cmd):
 	global req_degree
@@ -148,36 +214,172 @@ def filter_command(cmd):
 	return True
 			
 
-def run_single_command(cmd, benchmark=None, command=None, keep_output=True, num_nodes=None):
-	global verbose
-	if keep_output:
-		if benchmark is None:
-			benchmark_str=''
-		else:
-			benchmark_str = '_' + benchmark + '_'
-		job_output_file = unique_output_name(job_output_dir, f'{command}{benchmark_str}{num_nodes}_', '.txt')
-		hybrid_directory = job_output_file[:-4] + '.hybrid'
-		cmd = Template(cmd).substitute(hybrid_directory = hybrid_directory)
-		if not dry_run:
-			with open(job_output_file, 'w') as fp:
-				print(cmd, file=fp)
-		if verbose:
-			full_cmd = cmd + ' | tee -a ' + job_output_file
-		else:
-			full_cmd = cmd + ' >> ' + job_output_file
+def hybrid_directory_name(job_output_file):
+	return job_output_file[:-4] + '.hybrid'
+
+# Create the job output file for a command, and fill in its hybrid directory
+def command_output_file(cmd, benchmark, command, num_nodes):
+	if benchmark is None:
+		benchmark_str=''
 	else:
-		full_cmd = cmd
-	print(full_cmd)
+		benchmark_str = '_' + benchmark + '_'
+	job_output_file = unique_output_name(job_output_dir, f'{command}{benchmark_str}{num_nodes}_', '.txt', create=not dry_run)
+	hybrid_directory = hybrid_directory_name(job_output_file)
+	cmd = Template(cmd).substitute(hybrid_directory = hybrid_directory)
+	if not dry_run:
+		with open(job_output_file, 'w') as fp:
+			print(cmd, file=fp)
+	return cmd, job_output_file
+
+# Run a shell command (not a benchmark: see run_plan_entry)
+def run_single_command(cmd):
+	print(cmd)
 	if not dry_run:
-		s = subprocess.run(full_cmd, shell=True)
+		s = subprocess.run(cmd, shell=True, executable='/bin/bash')
+		return s.returncode
+	return None
+
+# The function to call with each line of a command's output as it is
+# written: to count its results for the manifest, with --live to add them
+# to the live results, and with --steady-stop to stop it (by returning
+# True) once the monitor finds that its times have reached a steady state
+def line_handler(job_output_file, data, monitor, progress):
+	handlers = [progress.line]
+	if live:
+		handlers.append(liveresults.Ingester(job_output_file, data).line)
+	if steady_stop:
+		handlers.append(monitor.line)
+	def on_line(line, elapsed):
+		stop = False
+		for handler in handlers:
+			stop = handler(line, elapsed) or stop
+		return stop
+	return on_line
+
+# The steady-state monitor of a command (see steadystate.py)
+def new_monitor(entry):
+	if not steady_stop:
+		return steadystate.Monitor()
+	return steadystate.Monitor(runindex.expected_series(entry.hash))
+
+# Run a command of the plan, with its manifest, and add it to the run
+# index and its time to the runtime history. The command is run by
+# asyncrunner.py, which also keeps a log of all its output with times. If
+# it times out, it is run again after a back-off if there is time for it
+# and remaining_secs of other commands (see watchdog.py).
+def run_plan_entry(entry, command, remaining_secs=0):
+	attempt = 0
+	while True:
+		cmd, job_output_file = command_output_file(entry.command, entry.benchmark, command, entry.num_nodes)
+		print(cmd + ' >> ' + job_output_file)
+		nodelist = os.environ.get(check_num_nodes.nodelist_varname)
+		data = manifest.started(job_output_file, entry, cmd, nodelist, hybrid_directory_name(job_output_file), attempt)
+		runindex.started(entry, job_output_file)
+		monitor = new_monitor(entry)
+		progress = logscan.Progress()
+		returncode, secs, rusage, timed_out = asyncrunner.run(cmd, job_output_file, echo=verbose,
+															  timeout=watchdog.deadline_secs(entry),
+															  on_line=line_handler(job_output_file, data, monitor, progress))
+		manifest.finished(job_output_file, data, returncode, rusage, monitor.stopped, timed_out, progress)
+		runindex.finished(entry, job_output_file, returncode, secs)
+		# Commands stopped early would make the estimates too short
+		if not monitor.stopped:
+			runtimes.record(entry.num_nodes, entry.command, secs, returncode)
+		if not timed_out:
+			return
+		if not watchdog.can_retry(entry, attempt, remaining_secs):
+			print(f'[{entry.hash}] timed out after {round(secs)} secs')
+			return
+		wait_secs = watchdog.backoff(attempt)
+		print(f'[{entry.hash}] timed out after {round(secs)} secs: run again in {wait_secs} secs')
+		time.sleep(wait_secs)
+		attempt += 1
 	
-def create_job_script(num_nodes, hours, mins, benchmark):
+# Run the plan with node packing. Commands run at the same time, so their
+# output is not shown, only written to their own files.
+def run_packed(plan, command, nodes):
+	output_files = {}
+	manifests = {}
+	monitors = {}
+	progresses = {}
+	attempts = {}
+	unfinished = dict([(entry.hash, entry) for entry in plan])
+	def prepare(entry, entry_nodes):
+		cmd, job_output_file = command_output_file(entry.command, entry.benchmark, command, entry.num_nodes)
+		output_files[entry.hash] = job_output_file
+		nodelist = ','.join([node.name for node in entry_nodes])
+		manifests[entry.hash] = manifest.started(job_output_file, entry, cmd, nodelist, hybrid_directory_name(job_output_file),
+												 attempts.get(entry.hash, 0))
+		runindex.started(entry, job_output_file)
+		monitors[entry.hash] = new_monitor(entry)
+		progresses[entry.hash] = logscan.Progress()
+		return cmd, job_output_file, line_handler(job_output_file, manifests[entry.hash], monitors[entry.hash],
+												  progresses[entry.hash])
+	def finished(entry, returncode, secs, rusage, timed_out):
+		manifest.finished(output_files[entry.hash], manifests[entry.hash], returncode, rusage, monitors[entry.hash].stopped,
+						  timed_out, progresses[entry.hash])
+		runindex.finished(entry, output_files[entry.hash], returncode, secs)
+		if not monitors[entry.hash].stopped:
+			runtimes.record(entry.num_nodes, entry.command, secs, returncode)
+		del unfinished[entry.hash]
+		if not timed_out:
+			return None
+		# Time the other commands still need on the whole allocation
+		remaining_secs = sum([e.est_secs * e.num_nodes for e in unfinished.values()]) / len(nodes)
+		attempt = attempts.get(entry.hash, 0)
+		if not watchdog.can_retry(entry, attempt, remaining_secs):
+			return None
+		attempts[entry.hash] = attempt + 1
+		unfinished[entry.hash] = entry
+		print(f'[{entry.hash}] timed out: run again in {watchdog.backoff(attempt)} secs')
+		return watchdog.backoff(attempt)
+	nodepack.run(plan, nodes, prepare, finished, watchdog.deadline_secs)
+
+# Run the plan, on the nodes with node packing if given
+def run_plan(plan, command, nodes):
+	if not nodes is None:
+		run_packed(plan, command, nodes)
+	else:
+		for k, entry in enumerate(plan):
+			print_time('Current time')
+			run_plan_entry(entry, command, sum([e.est_secs for e in plan[k+1:]]))
+
+# Estimated time to run the plan, on the nodes with node packing if given
+def plan_secs(plan, nodes):
+	if not nodes is None:
+		return sum([entry.est_secs * entry.num_nodes for entry in plan]) / len(nodes)
+	return sum([entry.est_secs for entry in plan])
+
+# With --adaptive, after the plan has run, run rounds of repeats of the
+# configurations whose results are not yet precise enough, while there is
+# time left in the job
+def run_adaptive_rounds(configs, command, nodes):
+	rng = random.Random()
+	round_num = 1
+	while True:
+		repeats = repeatplan.next_round(configs, rng)
+		if len(repeats) == 0:
+			print('Adaptive: every configuration is within the target or has run the most times')
+			break
+		end = watchdog.job_end_time()
+		if not end is None and time.time() + plan_secs(repeats, nodes) > end:
+			print(f'Adaptive: no time left for round {round_num} ({len(repeats)} repeats)')
+			break
+		print(f'Adaptive round {round_num}: {len(repeats)} repeats')
+		run_plan(repeats, command, nodes)
+		round_num += 1
+	repeatplan.print_summary(configs)
+
+# Job script to run the benchmarks, or only the commands of the plan if
+# given. With shards (a list of plans), the script is for a job array, in
+# which each task runs the shard given by its SLURM_ARRAY_TASK_ID.
+def create_job_script(num_nodes, hours, mins, benchmarks_list, plan=None, shards=None):
 	if qos == 'debug' and num_nodes > 4:
 		print('Cannot run >4 nodes on debug queue')
 		return None
 	job_script_name = unique_output_name(job_output_dir, 'batch%d_' % num_nodes, '.job')
 
-	if benchmark == 'nbodyslownord':
+	if any([benchmarks.registry[benchmark].slow_node for benchmark in benchmarks_list]):
 		t = Template(job_script_template_oneslow)
 	else:
 		t = Template(job_script_template)
@@ -186,7 +388,31 @@ def create_job_script(num_nodes, hours, mins, benchmark):
 	args_list = []
 	if not verbose:
 		args_list.append('quiet')
-	args_list.append('--' + benchmark)
+	for benchmark in benchmarks_list:
+		args_list.append('--' + benchmark)
+	if resume:
+		args_list.append('--resume')
+	if not timeout_factor is None:
+		args_list.append(f'--timeout-factor {timeout_factor}')
+	if not max_retries is None:
+		args_list.append(f'--retries {max_retries}')
+	if live:
+		args_list.append('--live')
+	if steady_stop:
+		args_list.append('--steady-stop')
+	if adaptive:
+		args_list.append('--adaptive')
+	if not ci_target is None:
+		args_list.append(f'--ci-target {ci_target}')
+	if not plan is None:
+		job_plan_file = job_name + '.plan'
+		runplan.write_plan_file(job_plan_file, plan)
+		args_list.append('--plan-file ' + job_plan_file)
+	if not shards is None:
+		for k, shard in enumerate(shards):
+			runplan.write_plan_file(f'{job_name}_{k}.plan', shard)
+		args_list.append('--plan-file ' + job_name + '_$SLURM_ARRAY_TASK_ID.plan')
+		job_name = job_name + '_%a'
 	if dry_run:
 		args_list.append('--dry-run')
 	if extrae:
@@ -197,102 +423,250 @@ def create_job_script(num_nodes, hours, mins, benchmark):
 							num_nodes_fast = num_nodes-1, num_nodes_slow=1), file = fp)
 	return job_script_name
 
-def submit_job_script(job_script_name):
-	run_single_command(f'sbatch {job_script_name}', benchmark=None, command=None, keep_output=False)
+# Submit a job script and return its job ID
+def submit_job_script(job_script_name, options=''):
+	cmd = f'{sbatch_command} --parsable {options}{job_script_name}'
+	print(cmd)
+	s = subprocess.run(cmd, shell=True, stdout=subprocess.PIPE, universal_newlines=True)
+	if s.returncode != 0:
+		print(f'Error: cannot submit {job_script_name}')
+		return None
+	# --parsable gives jobid or jobid;cluster
+	jobid = s.stdout.strip().split(';')[0]
+	print(f'Submitted job {jobid}')
+	submitted_jobids.append(jobid)
+	return jobid
+
+# Submit the job to run process once all the jobs submitted so far end
+def submit_process_job():
+	if len(submitted_jobids) == 0:
+		return
+	job_script_name = unique_output_name(job_output_dir, 'process_', '.job')
+	job_name = job_script_name[:-4]
+	# Process only the benchmarks that were submitted
+	args_list = ['--' + benchmark for benchmark in selected_apps()]
+	if not output_prefix is None:
+		args_list.append('--output-prefix ' + output_prefix)
+	with open(job_script_name, 'w') as fp:
+		print(Template(process_job_script_template).substitute(qos=qos, job_name=job_name, args=' '.join(args_list)), file=fp)
+	submit_job_script(job_script_name, '--dependency=afterany:' + ':'.join(submitted_jobids) + ' ')
 
-def get_from_command(regex, desc, command, fullname):
-	m = re.search(regex, command)
-	if not m:
-		print('%s not defined in the command for %s' % (desc, fullname))
-		print(f'Command is {command}')
-		sys.exit(1)
-	return m.group(1)
+# The groups of benchmarks that can share a job: those with a slow node
+# need a different job script
+def job_groups():
+	for slow_node in [False, True]:
+		group = [benchmark for benchmark in selected_apps() if benchmarks.registry[benchmark].slow_node == slow_node]
+		if len(group) > 0:
+			yield group
 
+# Slack added to the estimated time of a job: an hour if the time of any
+# of its commands is a guess, otherwise a few minutes, as the times
+# predicted from the runtime history already have a margin
+def job_slack_secs(plan):
+	if all([entry.est_known for entry in plan]):
+		return 10 * 60
+	return 60 * 60
 
+# Submit with --array: for each number of nodes, one job array whose
+# tasks each run one shard of the run plan. For the most parallelism each
+# shard is one command, unless --shard-hours is given, and then commands
+# are put together in shards of at most shard_hours (and max_job_hours)
+# including the slack. Slurm has no arrays of heterogeneous jobs, so
+# benchmarks with a slow node get one job per shard instead.
+def submit_array(nums_nodes, hybrid_params):
+	max_secs = max_job_hours * 60 * 60 - 60 * 60
+	for n in nums_nodes:
+		for group in job_groups():
+			plan, duplicates = allocation_plan([n], hybrid_params, group)
+			plan = resume_plan(plan)
+			if len(plan) == 0:
+				continue
+			if shard_hours is None:
+				shards = [[entry] for entry in plan]
+			else:
+				shards = runplan.pack_bins(plan, min(shard_hours * 60 * 60 - 60 * 60, max_secs))
+			job_secs = max([job_slack_secs(shard) + sum([entry.est_secs for entry in shard]) for shard in shards])
+			hours, mins = decode_time_secs(job_secs)
+			print(f'{" ".join(group)} on {n} nodes: {len(plan)} commands in {len(shards)} shards, longest {hours} hours and {mins} mins ({known_str(plan)})')
+			if dry_run:
+				for k, shard in enumerate(shards):
+					print(f'=== Shard {k} ===')
+					runplan.print_plan(shard)
+			elif benchmarks.registry[group[0]].slow_node:
+				for shard in shards:
+					shard_benchmarks = [benchmark for benchmark in group if benchmark in [entry.benchmark for entry in shard]]
+					job_script_name = create_job_script(n, hours, mins, shard_benchmarks, shard)
+					if not job_script_name is None:
+						submit_job_script(job_script_name)
+			else:
+				job_script_name = create_job_script(n, hours, mins, group, shards=shards)
+				if not job_script_name is None:
+					submit_job_script(job_script_name, f'--array=0-{len(shards)-1} ')
+
+# Submit with --bin-pack: the commands for each number of nodes go in as
+# few jobs as possible, each of at most max_job_hours including the
+# slack, rather than one job per benchmark. Benchmarks with a slow node
+# need a different job script, so they are packed separately.
+def submit_packed(nums_nodes, hybrid_params):
+	max_secs = max_job_hours * 60 * 60 - 60 * 60
+	current_jobs = 0
+	current_node_secs = 0
+	packed_jobs = 0
+	packed_node_secs = 0
+	for n in nums_nodes:
+		for group in job_groups():
+			plan, duplicates = allocation_plan([n], hybrid_params, group)
+			plan = resume_plan(plan)
+			# Current layout: one job per benchmark
+			for benchmark in group:
+				current_jobs += 1
+				current_node_secs += n * get_est_time_secs(benchmark, n, hybrid_params)
+			for job_plan in runplan.pack_bins(plan, max_secs):
+				job_secs = job_slack_secs(job_plan) + sum([entry.est_secs for entry in job_plan])
+				job_benchmarks = [benchmark for benchmark in group if benchmark in [entry.benchmark for entry in job_plan]]
+				hours, mins = decode_time_secs(job_secs)
+				print(f'{" ".join(job_benchmarks)} on {n} nodes: {len(job_plan)} commands, estimated time {hours} hours and {mins} mins ({known_str(job_plan)})')
+				if job_secs > max_job_hours * 60 * 60:
+					print(f'Warning: longer than --max-hours {max_job_hours}')
+				packed_jobs += 1
+				packed_node_secs += n * job_secs
+				if dry_run:
+					runplan.print_plan(job_plan)
+				else:
+					job_script_name = create_job_script(n, hours, mins, job_benchmarks, job_plan)
+					print(job_script_name)
+					if not job_script_name is None:
+						submit_job_script(job_script_name)
+	print(f'One job per benchmark: {current_jobs} jobs, {current_node_secs / 3600:.1f} node-hours requested')
+	print(f'Packed: {packed_jobs} jobs, {packed_node_secs / 3600:.1f} node-hours requested')
+	print(f'Saved {(current_node_secs - packed_node_secs) / 3600:.1f} node-hours')
 
 def get_file_results(fullname, results):
-	re_result = re.compile('# ([-a-zA-Z0-9./_]*) appranks=([1-9][0-9]*) deg=([1-9][0-9]*) (.*) time=([0-9.]*) (sec|ms)')
-	re_trace = re.compile('mv TRACE.mpits (.*)')
-	re_experiment = re.compile('Experiment vranks: ([1-9][0-9]*) nodes: ([1-9][0-9]*) deg: ([1-9][0-9]*)')
-	with open(fullname) as fp:
-		keys = set()
-		command = fp.readline()
-		drom = get_from_command('dlb.enable_drom=(true|false)', 'dlb.enable_drom', command, fullname)
-		lewi = get_from_command('dlb.enable_lewi=(true|false)', 'dlb.enable_lewi', command, fullname)
-		policy = get_from_command(' --(local|global)', 'policy', command, fullname)
-		numnodes = None
-
-		for line in fp.readlines():
-			m = re_experiment.match(line)
-			if m:
-				numnodes = int(m.group(2))
-			m = re_result.match(line)
-			if m:
-				r = {}
-				r['executable'] = m.group(1)
-				r['appranks'] = int(m.group(2))
-				r['degree'] = int(m.group(3))
-				params = tuple(m.group(4).split())
-				for p in params:
-					if '=' in p:
-						p2 = p.split('=')
-						r[p2[0]] = p2[1]
-				r['params'] = params
-				r['lewi'] = lewi
-				r['drom'] = drom
-				r['policy'] = policy
-				r['fullname'] = fullname
-				assert(not numnodes is None)
-				r['numnodes'] = numnodes
-				time = float(m.group(5))
-				#print(f"{fullname} numnodes: {numnodes} appranks: {r['appranks']}")
-				results.append((r,time))
-				key = f"executable: {r['executable']} numnodes: {r['numnodes']} appranks: {r['appranks']} degree: {r['degree']} policy: {r['policy']} lewi: {r['lewi']} drom: {r['drom']}"
-				#print(key)
-				if not key in keys:
-					print(fullname + ':', key)
-				keys.add(key)
-			m = re_trace.match(line)
-			if m:
-				print(' --> trace: ', m.group(1))
+	results.extend(iter_file_results(fullname))
 
+# Parse one file, possibly inside a worker process, returning its results
+# as a ResultTable. The output is captured and returned so that the parent
+# can print it in the same order as the serial path; likewise an exit from
+# get_from_command is passed back
+def get_file_results_worker(fullname):
+	results = []
+	status = None
+	output = io.StringIO()
+	with contextlib.redirect_stdout(output):
+		try:
+			get_file_results(fullname, results)
+		except SystemExit as e:
+			status = e.code
+	return ResultTable.from_records(results), output.getvalue(), status
+
+# Parse the given files, serially or on a process pool, yielding
+# (results, output, status) for each file in the order given
+def parse_files(fullnames):
+	workers = num_workers if num_workers > 0 else os.cpu_count()
+	if workers == 1 or len(fullnames) <= 1:
+		for fullname in fullnames:
+			yield get_file_results_worker(fullname)
+	else:
+		# imap returns the per-file results in the order of fullnames,
+		# so the merged list is the same as for the serial path
+		chunksize = max(1, len(fullnames) // (4 * workers))
+		with multiprocessing.Pool(workers) as pool:
+			for parsed in pool.imap(get_file_results_worker, fullnames, chunksize):
+				yield parsed
+
+# The parse cache holds, for each file, (size, mtime) when it was parsed,
+# its ResultTable and the output printed while parsing it
+def load_parse_cache(cache_file):
+	if rebuild_cache or not os.path.exists(cache_file):
+		return {}
+	try:
+		with open(cache_file, 'rb') as fp:
+			version, cache = pickle.load(fp)
+	except Exception as e:
+		print(f'Ignoring unreadable parse cache {cache_file}: {e}')
+		return {}
+	if version != parse_cache_version:
+		return {}
+	return cache
+
+def save_parse_cache(cache_file, cache):
+	tmp_file = cache_file + '.tmp'
+	try:
+		with open(tmp_file, 'wb') as fp:
+			pickle.dump((parse_cache_version, cache), fp, protocol=pickle.HIGHEST_PROTOCOL)
+		os.replace(tmp_file, cache_file)
+	except OSError as e:
+		# E.g. read-only archive folder: just parse again next time
+		print(f'Cannot write parse cache {cache_file}: {e}')
+
+# Folders with the job outputs to process
+def results_dirs():
+	if archived_subfolder is None:
+		return [job_output_dir]
+	return [os.path.join(archive_output_dir, subfolder) for subfolder in archived_subfolder.split(',')]
+
+# All job outputs in a folder, from its run index, or for a folder with
+# no index, those with the name of a job output
+def results_filenames(output_dir):
+	fullnames = runindex.runs(output_dir)
+	if fullnames is None:
+		fullnames = [os.path.join(output_dir, filename) for filename in runindex.legacy_outputs(output_dir)]
+	return fullnames
 
 def get_all_results():
-	output_dir = job_output_dir
-	if not archived_subfolder is None:
-		output_dir = os.path.join(archive_output_dir, archived_subfolder)
-	filenames = os.listdir(output_dir)
-	re_filename = re.compile('(interactive|batch)([a-z_]*)[1-9][0-9]*_[0-9][0-9][0-9][0-9][0-9][0-9][0-9][0-9]_[0-9]*-[0-9]*.*\.txt$')
-	# build/synthetic_unbalanced appranks=4 deg=1 10 480 1k 0 48.6 16.0 2.5 2.0 : iter=0 time=0.54 sec
-	results = []
-	for filename in filenames:
-		if re_filename.match(filename):
-			get_file_results(os.path.join(output_dir, filename), results)
-	return results
+	return ResultTable.concat([get_dir_results(output_dir) for output_dir in results_dirs()])
+
+def get_dir_results(output_dir):
+	fullnames = results_filenames(output_dir)
+
+	# Only parse the files that are new or changed since the cache was written
+	cache_file = os.path.join(output_dir, parse_cache_name)
+	cache = load_parse_cache(cache_file)
+	stamps = {}
+	to_parse = []
+	for fullname in fullnames:
+		st = os.stat(fullname)
+		stamps[fullname] = (st.st_size, st.st_mtime_ns)
+		if not fullname in cache or cache[fullname][0] != stamps[fullname]:
+			to_parse.append(fullname)
+	parsed = dict(zip(to_parse, parse_files(to_parse)))
+
+	# Entries for files no longer present (deleted or archived) are dropped
+	new_cache = {}
+	tables = []
+	for fullname in fullnames:
+		if fullname in parsed:
+			file_results, output, status = parsed[fullname]
+		else:
+			stamp, file_results, output = cache[fullname]
+			status = None
+		sys.stdout.write(output)
+		if not status is None:
+			sys.exit(status)
+		new_cache[fullname] = (stamps[fullname], file_results, output)
+		tables.append(file_results)
+	if verbose:
+		num_evicted = len([fullname for fullname in cache if not fullname in new_cache])
+		print(f'Parse cache: {len(fullnames)-len(to_parse)} files cached, {len(to_parse)} parsed, {num_evicted} evicted')
+	save_parse_cache(cache_file, new_cache)
+	return ResultTable.concat(tables)
 	
+# Collect the times of all results that differ only in fullname (the same
+# experiment in several job outputs). Each averaged result keeps the
+# fullname of the first one seen
 def averaged_results(results):
-	times = {}
-	seen_excl_fullname = {}
-	for r,time in results:
-
-		# Check if already seen with perhaps different fullname (for averaging of results)
-		r2 = copy.deepcopy(r)
-		del r2['fullname']
-		key_seen = tuple(sorted(r2.items()))
-		if key_seen in seen_excl_fullname:
-			r2['fullname'] = seen_excl_fullname[key_seen]
-		else:
-			r2['fullname'] = r['fullname']
-			seen_excl_fullname[key_seen] = r['fullname']
-
-		key = tuple(sorted(r2.items()))
-		if not key in times:
-			times[key] = []
-		times[key].append(time)
-	avg = []
-	for key,timelist in times.items():
-		avg.append( (dict(key), timelist) )
-	return avg
+	return group_by(results, exclude=('fullname',))
+
+# Read the job outputs one line at a time, feeding every result straight
+# into running statistics, rather than keeping all the times. Gives the
+# same results as averaged_results(get_all_results()) but with only the
+# count, mean, M2, min and max of the times of each result
+def get_streamed_results():
+	aggregator = StreamingAggregator(exclude=('fullname',))
+	for output_dir in results_dirs():
+		for fullname in results_filenames(output_dir):
+			aggregator.extend(iter_file_results(fullname))
+	return aggregator.table()
 
 def cmake_make():
 	owd = os.getcwd()
@@ -318,128 +692,126 @@ def make():
 		return False
 	ok = True
 	do_cmake = False
-	for a,d in include_apps.items():
-		if d:
-			if needs_cmake[a]:
-				do_cmake = True
+	for a in selected_apps():
+		if benchmarks.registry[a].needs_cmake:
+			do_cmake = True
 	if do_cmake:
 		# Benchmarks using cmake
 		ok = ok and cmake_make()
-	if ok and include_apps['synthetic']:
-		ok = ok and unbalanced_sweep.make()
-	if ok and include_apps['scatter']:
-		ok = ok and syntheticscatter.make()
-	if ok and include_apps['slow']:
-		ok = ok and syntheticslow.make()
-	if ok and include_apps['convergence']:
-		ok = ok and syntheticconvergence.make()
-	if ok and include_apps['bestdegree']:
-		ok = ok and bestdegree.make()
-	if ok and include_apps['slownord']:
-		ok = ok and syntheticslownord.make()
-	if ok and include_apps['micropp']:
-		ok = ok and micropp.make()
-	if ok and include_apps['nbody']:
-		ok = ok and nbody.make()
-	if ok and include_apps['nbodyslownord']:
-		ok = ok and nbodyslownord.make()
+	for a in selected_apps():
+		ok = ok and benchmarks.registry[a].make()
 	return ok
 
-def all_commands(num_nodes, hybrid_params, benchmark):
-	if benchmark == 'synthetic':
-		for cmd in unbalanced_sweep.commands(num_nodes, hybrid_params):
-			yield cmd
-	if benchmark == 'scatter':
-		for cmd in syntheticscatter.commands(num_nodes, hybrid_params):
-			yield cmd
-	if benchmark == 'slow':
-		for cmd in syntheticslow.commands(num_nodes, hybrid_params):
-			yield cmd
-	if benchmark == 'convergence':
-		for cmd in syntheticconvergence.commands(num_nodes, hybrid_params):
-			yield cmd
-	if benchmark == 'bestdegree':
-		for cmd in bestdegree.commands(num_nodes, hybrid_params):
-			yield cmd
-	if include_apps['slownord']:
-		for cmd in syntheticslownord.commands(num_nodes, hybrid_params):
-			yield cmd
-	if include_apps['micropp']:
-		for cmd in micropp.commands(num_nodes, hybrid_params):
-			yield cmd
-	if benchmark == 'nbody':
-		for cmd in nbody.commands(num_nodes, hybrid_params):
-			yield cmd
-	if benchmark == 'nbodyslownord':
-		for cmd in nbodyslownord.commands(num_nodes, hybrid_params):
-			yield cmd
-
-def get_est_time_secs(benchmark):
-	my_est_time_secs = 60 * 60 # start with one hour slack
-	if benchmark == 'synthetic':
-		my_est_time_secs += unbalanced_sweep.get_est_time_secs()
-	if benchmark == 'scatter':
-		my_est_time_secs += syntheticscatter.get_est_time_secs()
-	if benchmark == 'slow':
-		my_est_time_secs += syntheticslow.get_est_time_secs()
-	if benchmark == 'convergence':
-		my_est_time_secs += syntheticconvergence.get_est_time_secs()
-	if benchmark == 'bestdegree':
-		my_est_time_secs += bestdegree.get_est_time_secs()
-	if benchmark == 'micropp':
-		my_est_time_secs += micropp.get_est_time_secs()
-	if benchmark == 'nbody':
-		my_est_time_secs += nbody.get_est_time_secs()
-	if benchmark == 'nbodyslownord':
-		my_est_time_secs += nbodyslownord.get_est_time_secs()
-	return my_est_time_secs
+# Selected benchmarks, in the order of the registry
+def selected_apps():
+	return [app for app in apps if include_apps[app]]
+
+# The run plan for the selected benchmarks on allocations of each of
+# nums_nodes nodes: the commands that pass the filters, each only once
+def allocation_plan(nums_nodes, hybrid_params, benchmarks_list=None):
+	if benchmarks_list is None:
+		benchmarks_list = selected_apps()
+	commands = []
+	for num_nodes in nums_nodes:
+		for benchmark in benchmarks_list:
+			commands.extend(timed_commands(benchmark, num_nodes, hybrid_params))
+	return runplan.make_plan(commands)
+
+# The commands of the benchmark (if filtered, those that pass the filters)
+# as (benchmark, num_nodes, cmd, est_secs, est_known, params) for the plan. The
+# time is predicted from the runtime history if the command has been run
+# before, or else it is the module's guess.
+def timed_commands(benchmark, num_nodes, hybrid_params, filtered=True):
+	for cmd, params, guess_secs in benchmarks.registry[benchmark].timed_commands(num_nodes, hybrid_params):
+		if filtered and not filter_command(cmd):
+			continue
+		est_secs = runtimes.predict(num_nodes, cmd)
+		if est_secs is None:
+			yield (benchmark, num_nodes, cmd, guess_secs, False, params)
+		else:
+			yield (benchmark, num_nodes, cmd, est_secs, True, params)
 
+# How many of the times in the plan come from the runtime history
+def known_str(plan):
+	known = len([entry for entry in plan if entry.est_known])
+	return f'{known} of {len(plan)} times from history'
 
+# The run plan for --pack on an allocation of max_nodes nodes: the
+# commands of the selected benchmarks for every number of nodes they
+# support up to max_nodes (and in --nodes, if given)
+def packed_plan(max_nodes, hybrid_params):
+	commands = []
+	for benchmark in selected_apps():
+		for num_nodes in benchmarks.registry[benchmark].num_nodes():
+			if num_nodes > max_nodes or (not req_nodes is None and not num_nodes in req_nodes):
+				continue
+			commands.extend(timed_commands(benchmark, num_nodes, hybrid_params))
+	return runplan.make_plan(commands)
+
+# With --resume, drop the commands of the plan that already completed
+def resume_plan(plan):
+	if not resume:
+		return plan
+	plan, num_done, num_rerun = runindex.remaining(plan)
+	if num_done > 0:
+		print(f'Resume: skipping {num_done} commands already completed')
+	if num_rerun > 0:
+		print(f'Resume: running again {num_rerun} commands that failed or did not finish')
+	return plan
+
+# The commands run by a job for the benchmark on num_nodes nodes: all of
+# them, as the job does not get the filters, except those already
+# completed if --resume
+def benchmark_job_plan(benchmark, num_nodes, hybrid_params):
+	plan, duplicates = runplan.make_plan(timed_commands(benchmark, num_nodes, hybrid_params, filtered=False))
+	if resume:
+		plan, num_done, num_rerun = runindex.remaining(plan)
+	return plan
+
+# Estimated time of a job for the benchmark on num_nodes nodes, including
+# the slack
+def get_est_time_secs(benchmark, num_nodes, hybrid_params):
+	plan = benchmark_job_plan(benchmark, num_nodes, hybrid_params)
+	return job_slack_secs(plan) + sum([entry.est_secs for entry in plan])
 
 def all_num_nodes():
 	num_nodes = set([])
-	if include_apps['synthetic']:
-		num_nodes.update(unbalanced_sweep.num_nodes())
-	if include_apps['scatter']:
-		num_nodes.update(syntheticscatter.num_nodes())
-	if include_apps['slow']:
-		num_nodes.update(syntheticslow.num_nodes())
-	if include_apps['convergence']:
-		num_nodes.update(syntheticconvergence.num_nodes())
-	if include_apps['bestdegree']:
-		num_nodes.update(bestdegree.num_nodes())
-	if include_apps['slownord']:
-		num_nodes.update(syntheticslownord.num_nodes())
-	if include_apps['micropp']:
-		num_nodes.update(micropp.num_nodes())
-	if include_apps['nbody']:
-		num_nodes.update(nbody.num_nodes())
-	if include_apps['nbodyslownord']:
-		num_nodes.update(nbodyslownord.num_nodes())
+	for app in selected_apps():
+		num_nodes.update(benchmarks.registry[app].num_nodes())
 	return sorted(num_nodes)
 
+# Plots that need every time (e.g. scatter plots) cannot be drawn from
+# the streamed results, which only keep statistics
+def plot_module(benchmark, results, output_prefix_str):
+	if benchmark.needs_raw_times() and not results.has_times():
+		print(f'Skipping plots for {benchmark.name}: they need all times, which are not kept by --stream')
+		return
+	benchmark.generate_plots(results, output_prefix_str)
+
+# Each module works out its figures in this process; with --jobs they are
+# rendered on a pool of worker processes while the next ones are prepared.
+# Figures made from the same data as the existing PDF are skipped.
 def generate_plots(results):
 	global output_prefix
 	output_prefix_str = output_prefix if not output_prefix is None else ''
-	if include_apps['synthetic']:
-		unbalanced_sweep.generate_plots(results, output_prefix_str)
-	if include_apps['scatter']:
-		syntheticscatter.generate_plots(results, output_prefix_str)
-	if include_apps['slow']:
-		syntheticslow.generate_plots(results, output_prefix_str)
-	if include_apps['convergence']:
-		syntheticconvergence.generate_plots(results, output_prefix_str)
-	if include_apps['bestdegree']:
-		bestdegree.generate_plots(results, output_prefix_str)
-	if include_apps['slownord']:
-		syntheticslownord.generate_plots(results, output_prefix_str)
-	if include_apps['micropp']:
-		micropp.generate_plots(results, output_prefix_str)
-	if include_apps['nbody']:
-		nbody.generate_plots(results, output_prefix_str)
-	if include_apps['nbodyslownord']:
-		nbodyslownord.generate_plots(results, output_prefix_str)
-		
+	workers = num_workers if num_workers > 0 else os.cpu_count()
+	start_time = time.time()
+	plotpool.timings.clear()
+	plotpool.skipped.clear()
+	plotpool.load_cache(os.path.join(output_dir, plot_cache_name), rebuild=replot)
+	if workers > 1:
+		plotpool.start(workers)
+	try:
+		generate_module_plots(results, output_prefix_str)
+	finally:
+		plotpool.finish()
+	if verbose:
+		plotpool.print_timings(time.time() - start_time)
+
+def generate_module_plots(results, output_prefix_str):
+	for app in selected_apps():
+		plot_module(benchmarks.registry[app], results, output_prefix_str)
+
 
 def main(argv):
 	global include_apps
@@ -452,6 +824,26 @@ def main(argv):
 	global extrae
 	global output_prefix
 	global archived_subfolder
+	global num_workers
+	global rebuild_cache
+	global replot
+	global resume
+	global stream_results
+	global pack
+	global pack_local_nodes
+	global bin_pack
+	global max_job_hours
+	global shard_hours
+	global plan_file
+	global array_jobs
+	global then_process
+	global sbatch_command
+	global timeout_factor
+	global max_retries
+	global live
+	global steady_stop
+	global adaptive
+	global ci_target
 	seen_app = None
 	seen_noapp = None
 
@@ -467,7 +859,9 @@ def main(argv):
 		opts, args = getopt.getopt( argv[1:],
 									'hf', ['help', 'recurse', 'no-synthetic', 'no-micropp', 'quiet',
 											'dry-run', 'qos=', 'nodes=', 'degree=', 'extrae',
-											'local', 'global', 'output-prefix=', 'archived='] + app_opts)
+											'local', 'global', 'output-prefix=', 'archived=', 'jobs=', 'rebuild-cache', 'replot', 'stream',
+											'pack', 'pack-local=', 'bin-pack', 'max-hours=', 'shard-hours=', 'plan-file=',
+											'array', 'then-process', 'sbatch=', 'resume', 'timeout-factor=', 'retries=', 'live', 'steady-stop', 'adaptive', 'ci-target='] + app_opts)
 
 	except getopt.error as msg:
 		print(msg)
@@ -499,6 +893,50 @@ def main(argv):
 			output_prefix = a
 		elif o == '--archived':
 			archived_subfolder = a
+		elif o == '--jobs':
+			num_workers = int(a)
+		elif o == '--rebuild-cache':
+			rebuild_cache = True
+		elif o == '--replot':
+			replot = True
+		elif o == '--stream':
+			stream_results = True
+		elif o == '--pack':
+			pack = True
+		elif o == '--pack-local':
+			pack = True
+			pack_local_nodes = int(a)
+		elif o == '--bin-pack':
+			bin_pack = True
+		elif o == '--max-hours':
+			max_job_hours = int(a)
+		elif o == '--shard-hours':
+			shard_hours = float(a)
+		elif o == '--plan-file':
+			plan_file = a
+		elif o == '--array':
+			array_jobs = True
+		elif o == '--then-process':
+			then_process = True
+		elif o == '--sbatch':
+			sbatch_command = a
+		elif o == '--resume':
+			resume = True
+		elif o == '--timeout-factor':
+			timeout_factor = float(a)
+			watchdog.timeout_factor = timeout_factor
+		elif o == '--retries':
+			max_retries = int(a)
+			watchdog.max_retries = max_retries
+		elif o == '--live':
+			live = True
+		elif o == '--steady-stop':
+			steady_stop = True
+		elif o == '--adaptive':
+			adaptive = True
+		elif o == '--ci-target':
+			ci_target = float(a)
+			repeatplan.target_rel_halfwidth = ci_target
 		else:
 			assert o.startswith('--')
 			if o[2:] in apps:
@@ -523,21 +961,70 @@ def main(argv):
 
 	command = args[0]
 	if not req_nodes is None:
-		if not (command == 'submit' or dry_run) :
-			print('--nodes n only valid for submit command or with --dry-run')
+		if not (command == 'submit' or command == 'status' or dry_run or pack) :
+			print('--nodes n only valid for submit or status command or with --dry-run or --pack')
 			return 1
 	if not req_degree is None:
 		if command != 'submit' and command != 'interactive' and command != 'batch':
 			print('--degree d only valid for submit, interactive or batch command')
 			return 1
 	if not output_prefix is None:
-		if command != 'process':
-			print('--output-prefix only valid for process command')
+		if command != 'process' and not (command == 'submit' and then_process):
+			print('--output-prefix only valid for process command or submit with --then-process')
 			return 1
 	if not archived_subfolder is None:
 		if command != 'process':
 			printf('--archived only valid for process command')
 			return 1
+	if num_workers != 1:
+		if command != 'process':
+			print('--jobs only valid for process command')
+			return 1
+	if rebuild_cache:
+		if command != 'process':
+			print('--rebuild-cache only valid for process command')
+			return 1
+	if replot:
+		if command != 'process':
+			print('--replot only valid for process command')
+			return 1
+	if pack:
+		if command != 'interactive' and command != 'batch':
+			print('--pack only valid for interactive or batch command')
+			return 1
+	if bin_pack:
+		if command != 'submit':
+			print('--bin-pack only valid for submit command')
+			return 1
+	if array_jobs or then_process:
+		if command != 'submit':
+			print('--array and --then-process only valid for submit command')
+			return 1
+		if array_jobs and bin_pack:
+			print('Cannot combine --array with --bin-pack')
+			return 1
+	if not shard_hours is None and not array_jobs:
+		print('--shard-hours only valid with --array')
+		return 1
+	if resume:
+		if command != 'interactive' and command != 'batch' and command != 'submit':
+			print('--resume only valid for submit, interactive or batch command')
+			return 1
+	if live or steady_stop or adaptive:
+		if command != 'interactive' and command != 'batch' and command != 'submit':
+			print('--live, --steady-stop and --adaptive only valid for submit, interactive or batch command')
+			return 1
+	if not plan_file is None:
+		if command != 'interactive' and command != 'batch':
+			print('--plan-file only valid for interactive or batch command')
+			return 1
+	if stream_results:
+		if command != 'process':
+			print('--stream only valid for process command')
+			return 1
+		if rebuild_cache:
+			print('--stream reads the job outputs directly: cannot combine with --rebuild-cache')
+			return 1
 	
 	hybrid_params_list = []
 	if extrae:
@@ -566,40 +1053,65 @@ def main(argv):
 		return 0
 	elif command == 'interactive' or command == 'batch':
 		
-		if include_apps['nbodyslownord']:
-			for benchmark in apps:
-				if benchmark != 'nbodyslownord':
-					if include_apps[benchmark]:
-						print('Cannot combine nbodyslownord with any other app')
-						return 2
-
-		if check_num_nodes.get_on_compute_node():
-			if include_apps['nbodyslownord']:
-				nums_nodes = [1+check_num_nodes.get_num_nodes()]
+		slow_node = [app for app in selected_apps() if benchmarks.registry[app].slow_node]
+		if len(slow_node) > 0 and len(selected_apps()) > 1:
+			print(f'Cannot combine {slow_node[0]} with any other app')
+			return 2
+
+		if pack:
+			if len(slow_node) > 0:
+				print(f'Cannot use --pack with {slow_node[0]}, which needs its own slow node')
+				return 2
+			if not pack_local_nodes is None:
+				max_nodes = pack_local_nodes
+			elif check_num_nodes.get_on_compute_node():
+				max_nodes = check_num_nodes.get_num_nodes()
+			elif dry_run:
+				max_nodes = 8
 			else:
-				nums_nodes = [check_num_nodes.get_num_nodes()]
-		else:
-			if not dry_run:
-				print('run-benchmarks.py interactive must be run on a compute node')
+				print('run-benchmarks.py --pack must be run on a compute node (or use --pack-local n)')
 				return 2
-			if req_nodes is None:
-				nums_nodes = [2,4,8]
+			plan, duplicates = packed_plan(max_nodes, hybrid_params)
+		else:
+			if check_num_nodes.get_on_compute_node():
+				if len(slow_node) > 0:
+					nums_nodes = [1+check_num_nodes.get_num_nodes()]
+				else:
+					nums_nodes = [check_num_nodes.get_num_nodes()]
 			else:
-				nums_nodes = req_nodes
+				if not dry_run:
+					print('run-benchmarks.py interactive must be run on a compute node')
+					return 2
+				if req_nodes is None:
+					nums_nodes = [2,4,8]
+				else:
+					nums_nodes = req_nodes
+			plan, duplicates = allocation_plan(nums_nodes, hybrid_params)
+		if not plan_file is None:
+			plan, missing = runplan.select_plan(plan, runplan.read_plan_file(plan_file))
+			if len(missing) > 0:
+				print(f'Warning: {len(missing)} commands in {plan_file} are not in the run plan: ' + ' '.join(missing))
+		configs = plan
+		plan = resume_plan(plan)
+
+		runplan.print_plan(plan, duplicates)
+		if dry_run:
+			return 0
 
 		print_time('Started at')
 		print_jobid()
 		os.makedirs(job_output_dir, exist_ok=True)
+		runindex.create()
+		nodes = None
+		if pack:
+			if pack_local_nodes is None:
+				nodes = nodepack.slurm_nodes(check_num_nodes.get_node_list())
+			else:
+				nodes = nodepack.local_nodes(pack_local_nodes)
 		try:
-			for num_nodes in nums_nodes:
-				for benchmark in apps:
-					if include_apps[benchmark]:
-						for cmd in all_commands(num_nodes, hybrid_params, benchmark):
-							if filter_command(cmd):
-								#print(cmd, benchmark, command)
-								if not dry_run:
-									print_time('Current time')
-								run_single_command(cmd, benchmark, command, keep_output=True, num_nodes=num_nodes)
+			run_plan(plan, command, nodes)
+			if adaptive:
+				run_adaptive_rounds(configs, command, nodes)
 		except KeyboardInterrupt:
 			print('Interrupted')
 		print_time('Finished at')
@@ -616,36 +1128,59 @@ def main(argv):
 					fail = True
 		if fail:
 			return 1
-		for n in num_nodes:
-			if dry_run:
-				for benchmark in apps:
-					if include_apps[benchmark]:
+		if bin_pack:
+			submit_packed(num_nodes, hybrid_params)
+		elif array_jobs:
+			submit_array(num_nodes, hybrid_params)
+		else:
+			for n in num_nodes:
+				if dry_run:
+					for benchmark in selected_apps():
 						print(f'=== {benchmark} on {n} nodes ===')
-						for cmd in all_commands(n, hybrid_params, benchmark):
-							if filter_command(cmd):
-								print(cmd)
-						hours, mins = decode_time_secs(get_est_time_secs(benchmark))
-						print(f'Estimated time {hours} hours and {mins} mins')
-			else:
-				# Go through all commands to get estimated time only
-				for benchmark in apps:
-					if include_apps[benchmark]:
-						for cmd in all_commands(n, hybrid_params, benchmark):
-							pass
-						hours, mins = decode_time_secs(get_est_time_secs(benchmark))
+						plan, duplicates = allocation_plan([n], hybrid_params, [benchmark])
+						runplan.print_plan(plan, duplicates)
+						hours, mins = decode_time_secs(get_est_time_secs(benchmark, n, hybrid_params))
+						print(f'Estimated time {hours} hours and {mins} mins ({known_str(plan)})')
+				else:
+					for benchmark in selected_apps():
+						if resume and len(benchmark_job_plan(benchmark, n, hybrid_params)) == 0:
+							print(f'{benchmark} on {n} nodes: already completed')
+							continue
+						hours, mins = decode_time_secs(get_est_time_secs(benchmark, n, hybrid_params))
 						print(f'{benchmark} on {n} nodes: Estimated time {hours} hours and {mins} mins')
-						job_script_name = create_job_script(n, hours, mins, benchmark)
+						job_script_name = create_job_script(n, hours, mins, [benchmark])
 						print(job_script_name)
 						if not job_script_name is None:
 							submit_job_script(job_script_name)
+		if then_process:
+			if dry_run:
+				print('Then run process after all the jobs')
+			else:
+				submit_process_job()
 		return 1
 	elif command == 'process':
+		import_results()
 		os.makedirs(output_dir, exist_ok=True)
-		results = get_all_results()
-		results = averaged_results(results)
+		if stream_results:
+			results = get_streamed_results()
+		else:
+			results = get_all_results()
+			results = averaged_results(results)
 		generate_plots(results)
 		return 1
 
+	elif command == 'status':
+		# Every command of the selected benchmarks, as submit would run
+		nums_nodes = all_num_nodes()
+		if not req_nodes is None:
+			nums_nodes = [n for n in nums_nodes if n in req_nodes]
+		if len(nums_nodes) == 0:
+			print('No experiment with the requested numbers of nodes')
+			return 1
+		plan, duplicates = packed_plan(max(nums_nodes), hybrid_params)
+		liveresults.print_status(plan)
+		return 0
+
 	elif command == 'archive':
 		os.makedirs(archive_output_dir, exist_ok=True)
 		if len(args) >= 2:
@@ -656,7 +1191,7 @@ def main(argv):
 		else:
 			archive_folder = unique_output_name(archive_output_dir, 'jobs_')
 		os.mkdir(archive_folder)
-		run_single_command('mv ' + job_output_dir + '/* ' + archive_folder, command=None, keep_output=False)
+		run_single_command('mv ' + job_output_dir + '/* ' + archive_folder)
 	else:
 		print('Unrecognized command %s\n' % command)
 		return Usage()
@@ -0,0 +1,173 @@
+#! /usr/bin/env python
+import os
+import re
+import time
+import uuid
+import jsonlog
+import logscan
+import manifest
+
+# Index of the commands run by interactive and batch, in
+# jobs/run_index.jsonl. It lists every run with its job output and
+# manifest, so that process finds the runs without scanning the folder,
+# and --resume can skip the commands of the run plan that already
+# completed. A line is appended when each command starts and another when
+# it ends:
+#
+#   {"event": "start", "run_id": ..., "hash": ..., "benchmark": ..., "num_nodes": ..., "output": ..., "manifest": ..., "jobid": ..., "date": ...}
+#   {"event": "end", "run_id": ..., "hash": ..., "output": ..., "status": ..., "secs": ..., "date": ...}
+#
+# The output and manifest are relative to the folder of the index, so the
+# index is still valid when the folder is archived. The run ID is the name
+# of the job output without .txt. The index is created (by create())
+# before the runner claims the name of any job output, and the job
+# outputs already in the folder then (from before there was an index) are
+# added to it as "legacy" lines. Outputs named with a run ID are never
+# legacy, in case another job claimed one while the index was created.
+#
+# A command has completed if it ended with status 0 and its output is
+# complete: it has at least one result line, and ends with the exit status
+# written by the runner after the command (which is missing if the job hit
+# its time limit or was killed).
+
+index_dir = 'jobs'
+index_name = 'run_index.jsonl'
+index_file = os.path.join(index_dir, index_name)
+
+exit_status_prefix = 'Exit status: '
+
+# Names of job outputs, including those from before the index, and the
+# end of the names of those with a run ID
+re_legacy_output = re.compile('(interactive|batch)([a-z_]*)[1-9][0-9]*_[0-9][0-9][0-9][0-9][0-9][0-9][0-9][0-9]_[0-9]*-[0-9]*.*\\.txt$')
+re_run_id_output = re.compile('_[0-9]{8}_[0-9]{2}-[0-9]{2}-[0-9]{2}_[0-9a-f]{8}\\.txt$')
+
+# New run ID: the date and time and a random part, so runs started at the
+# same time (e.g. the tasks of a job array) do not get the same one
+def new_run_id():
+	return time.strftime('%Y%m%d_%H-%M-%S') + '_' + uuid.uuid4().hex[:8]
+
+def run_id(output):
+	return os.path.splitext(os.path.basename(output))[0]
+
+def legacy_outputs(folder):
+	return sorted([filename for filename in os.listdir(folder) if re_legacy_output.match(filename)])
+
+# Create the index if there is none, with the job outputs from before it
+def create():
+	if os.path.exists(index_file):
+		return
+	entries = [{'event': 'legacy', 'run_id': run_id(filename), 'output': filename}
+			   for filename in legacy_outputs(index_dir) if not re_run_id_output.search(filename)]
+	# If another job creates it first, its legacy lines are kept
+	jsonlog.append(index_file, entries, exclusive=True)
+
+def append(entry):
+	create()
+	jsonlog.append(index_file, [entry])
+
+def started(plan_entry, output):
+	append({'event': 'start', 'run_id': run_id(output), 'hash': plan_entry.hash, 'benchmark': plan_entry.benchmark,
+			'num_nodes': plan_entry.num_nodes, 'output': os.path.relpath(output, index_dir),
+			'manifest': os.path.relpath(manifest.manifest_name(output), index_dir),
+			'jobid': os.environ.get('SLURM_JOBID'), 'date': time.strftime('%Y-%m-%d %H:%M:%S')})
+
+# Write the exit status at the end of the output, then add it to the index
+def finished(plan_entry, output, status, secs):
+	with open(output, 'a') as fp:
+		print(f'{exit_status_prefix}{status}', file=fp)
+	append({'event': 'end', 'run_id': run_id(output), 'hash': plan_entry.hash,
+			'output': os.path.relpath(output, index_dir), 'status': status,
+			'secs': round(secs, 3), 'date': time.strftime('%Y-%m-%d %H:%M:%S')})
+
+def read_index(folder=index_dir):
+	return jsonlog.read(os.path.join(folder, index_name))
+
+def last_line(filename):
+	with open(filename, 'rb') as fp:
+		size = os.fstat(fp.fileno()).st_size
+		fp.seek(max(0, size - 4096))
+		lines = fp.read().rstrip(b'\n').split(b'\n')
+	return lines[-1].decode(errors='replace')
+
+# Whether the job output is of a command that completed: exit status 0,
+# and, from its manifest, every result up to the final iteration that the
+# command wrote. Outputs without this in their manifest only need one
+# result.
+def output_complete(filename):
+	if not os.path.exists(filename):
+		return False
+	if last_line(filename) != f'{exit_status_prefix}0':
+		return False
+	progress = logscan.file_progress(filename)
+	run = manifest.read(filename)
+	if run is None or not 'complete' in run:
+		return progress.results > 0
+	return (run['complete'] and progress.results == run['results']
+			and progress.last_iteration == run['last_iteration'])
+
+# Whether the run that ended with status 0 in the index completed, from
+# its manifest alone, without reading the job output (for status). Runs
+# without this in their manifest are taken as complete.
+def manifest_complete(filename):
+	run = manifest.read(filename)
+	if run is None or not 'complete' in run:
+		return True
+	return run['complete']
+
+# The hashes of the commands in the index with a run that completed: with
+# check_outputs (for --resume), each job output is also read to check that
+# it still has every result (see output_complete)
+def completed_hashes(index, check_outputs=True):
+	complete = output_complete if check_outputs else manifest_complete
+	ended = {}
+	for entry in index:
+		if entry.get('event') == 'end' and entry.get('status') == 0:
+			ended.setdefault(entry['hash'], []).append(os.path.join(index_dir, entry['output']))
+	return set([h for h, outputs in ended.items() if any([complete(output) for output in outputs])])
+
+# The number of series of results written by the last run of the command
+# with that hash that ran to its end without being stopped early, or None
+# if there is none (see steadystate.Monitor)
+def expected_series(h):
+	num_series = None
+	for entry in read_index():
+		if entry.get('event') == 'end' and entry['hash'] == h and entry.get('status') == 0:
+			data = manifest.read(os.path.join(index_dir, entry['output']))
+			if not data is None and data.get('complete') and not data.get('steady_stop') and 'series' in data:
+				num_series = data['series']
+	return num_series
+
+# Split the plan into the commands still to run and the number that
+# already completed. Also returns the number of commands to run again
+# because their earlier run failed or did not finish.
+def remaining(plan):
+	index = read_index()
+	started_hashes = set([entry['hash'] for entry in index if entry.get('event') == 'start'])
+	done = completed_hashes(index)
+	todo = []
+	num_done = 0
+	num_rerun = 0
+	for plan_entry in plan:
+		if plan_entry.hash in done:
+			num_done += 1
+		else:
+			todo.append(plan_entry)
+			if plan_entry.hash in started_hashes:
+				num_rerun += 1
+	return todo, num_done, num_rerun
+
+# The job outputs in a folder, in the order they were started. Returns
+# None if the folder has no index (e.g. archived before there was one).
+def runs(folder):
+	if not os.path.exists(os.path.join(folder, index_name)):
+		return None
+	outputs = []
+	seen = set([])
+	for entry in read_index(folder):
+		if entry.get('event') in ['start', 'legacy'] and not entry['output'] in seen:
+			seen.add(entry['output'])
+			fullname = os.path.join(folder, entry['output'])
+			# Runs deleted by hand are skipped
+			if os.path.exists(fullname):
+				outputs.append(fullname)
+	return outputs
@@ -0,0 +1,95 @@
+#! /usr/bin/env python
+import re
+import hashlib
+
+# The run plan: every command that interactive or batch will run, in
+# order, each only once. It is built from the selected benchmarks before
+# anything runs, so --dry-run shows exactly what will be run. Commands
+# still contain $hybrid_directory, which is only filled in when run.
+#
+# Each entry has a hash of its content (number of nodes and command
+# line), which is the same whenever and wherever the plan is built, so it
+# identifies the experiment across runs.
+
+class PlanEntry:
+	def __init__(self, benchmark, num_nodes, command, est_secs=0, est_known=False, params=None):
+		self.benchmark = benchmark
+		self.num_nodes = num_nodes
+		self.command = command
+		self.est_secs = est_secs
+		self.est_known = est_known
+		self.params = params
+		self.hash = command_hash(num_nodes, command)
+
+def command_hash(num_nodes, command):
+	return hashlib.sha1(f'{num_nodes} {command}'.encode()).hexdigest()[:12]
+
+# Build the plan from the arguments of PlanEntry for each command, e.g.
+# (benchmark, num_nodes, command, est_secs, est_known, params), in the order to
+# run them. Returns the plan and the number of duplicate commands dropped.
+def make_plan(commands):
+	plan = []
+	seen = set([])
+	duplicates = 0
+	for args in commands:
+		entry = PlanEntry(*args)
+		if entry.hash in seen:
+			duplicates += 1
+			continue
+		seen.add(entry.hash)
+		plan.append(entry)
+	return plan, duplicates
+
+# Hash of the whole plan, to check two plans are the same
+def plan_hash(plan):
+	return hashlib.sha1(' '.join([entry.hash for entry in plan]).encode()).hexdigest()[:12]
+
+def print_plan(plan, duplicates=0, file=None):
+	print(f'Run plan {plan_hash(plan)}: {len(plan)} commands', file=file)
+	for entry in plan:
+		print(f'[{entry.hash}] {entry.benchmark} on {entry.num_nodes} nodes: {entry.command}', file=file)
+	if duplicates > 0:
+		print(f'Dropped {duplicates} duplicate commands', file=file)
+
+# A plan file is the printed plan, from which only the hashes are read
+def write_plan_file(filename, plan):
+	with open(filename, 'w') as fp:
+		print_plan(plan, file=fp)
+
+def read_plan_file(filename):
+	re_entry = re.compile(r'\[([0-9a-f]+)\] ')
+	hashes = []
+	with open(filename) as fp:
+		for line in fp:
+			m = re_entry.match(line)
+			if m:
+				hashes.append(m.group(1))
+	return hashes
+
+# The entries of the plan whose hashes are given, and the hashes that
+# were not found in the plan
+def select_plan(plan, hashes):
+	wanted = set(hashes)
+	selected = [entry for entry in plan if entry.hash in wanted]
+	found = set([entry.hash for entry in selected])
+	missing = [h for h in hashes if not h in found]
+	return selected, missing
+
+# Split the plan into as few bins as possible whose estimated times add up
+# to at most max_secs (first fit decreasing). A command longer than
+# max_secs gets a bin to itself.
+def pack_bins(plan, max_secs):
+	bins = []
+	bin_secs = []
+	for entry in sorted(plan, key = lambda entry: -entry.est_secs):
+		for k in range(len(bins)):
+			if bin_secs[k] + entry.est_secs <= max_secs:
+				bins[k].append(entry)
+				bin_secs[k] += entry.est_secs
+				break
+		else:
+			bins.append([entry])
+			bin_secs.append(entry.est_secs)
+	# Run each bin in plan order
+	order = dict([(entry.hash, k) for k, entry in enumerate(plan)])
+	return [sorted(b, key = lambda entry: order[entry.hash]) for b in bins]
@@ -0,0 +1,149 @@
+#! /usr/bin/env python
+import re
+import math
+import time
+import jsonlog
+
+# History of the wall time of every command run by interactive and batch,
+# used to predict the time of each command in the run plan, so submit can
+# ask for walltimes that fit. Each line of the history file is a JSON
+# record of one run: the number of nodes, the command (without its hybrid
+# directory), the executable, vranks, degree, policy and arguments parsed
+# from it, the wall time and the exit status. Lines are appended, so
+# several jobs can write to it at the same time (see jsonlog.py).
+#
+# The time of a command is predicted from earlier runs of the same command
+# on the same number of nodes if there are any. Otherwise it is fitted as
+# a * num_nodes^b to the runs of the same command on other numbers of
+# nodes (with any --vranks or --nodes, and any of the problem sizes that
+# the benchmarks scale with the number of nodes, see node_scaled_args).
+# Both predictions include a margin to make it unlikely that the command
+# takes longer. A problem size that scales with the number of nodes in a
+# way not listed in node_scaled_args keeps the commands apart, so they are
+# only predicted from runs on the same number of nodes.
+
+history_file = 'runtime_history.jsonl'
+
+# Margin in standard deviations, and extra factor for every prediction
+margin_sigmas = 2.0
+margin_factor = 1.1
+
+# Factor for a command run only once, so the spread is unknown
+single_run_factor = 1.5
+
+# Spread (in log time) assumed for a fit to too few points to measure it
+default_log_sigma = 0.25
+
+# Arguments of the benchmarks' executables that scale with the number of
+# nodes (weak scaling): the number of Gauss points of micropp (nodes*2400)
+# and the number of bodies of nbodyslownord (nodes*20000). They are taken
+# out of the shape key, and the fit over the number of nodes accounts for
+# the larger problem.
+node_scaled_args = [r'(build/mpi-load-balance [0-9]+) [0-9]+',
+					r'(build/n_body) -N [0-9]+']
+
+history = None
+
+# The command without its hybrid directory, which is different every run
+def command_key(command):
+	command = re.sub(r'--hybrid-directory \S+', '', command)
+	return ' '.join(command.split())
+
+# The command with the number of vranks and nodes, and the arguments that
+# scale with them, taken out, to match the same experiment on another
+# number of nodes
+def shape_key(command):
+	command = re.sub(r'--(vranks|nodes) [0-9]+', '', command_key(command))
+	for pattern in node_scaled_args:
+		command = re.sub(pattern, r'\1', command)
+	return ' '.join(command.split())
+
+def parse_command(command):
+	fields = {'executable': None, 'vranks': None, 'degree': None, 'policy': None, 'args': ''}
+	for name in ['vranks', 'degree']:
+		m = re.search(f'--{name} ([0-9]+)', command)
+		if m:
+			fields[name] = int(m.group(1))
+	m = re.search(r'--(local|global)\b', command)
+	if m:
+		fields['policy'] = m.group(1)
+	tokens = command_key(command).split()
+	for k, token in enumerate(tokens[1:]):
+		if '/' in token and not token.startswith('-'):
+			fields['executable'] = token
+			fields['args'] = ' '.join(tokens[k+2:])
+			break
+	return fields
+
+# Append the time of one run of the command to the history
+def record(num_nodes, command, secs, status):
+	entry = {'num_nodes': num_nodes, 'command': command_key(command), 'secs': round(secs, 3), 'status': status,
+			 'date': time.strftime('%Y-%m-%d %H:%M:%S')}
+	entry.update(parse_command(command))
+	jsonlog.append(history_file, [entry])
+	if not history is None:
+		add_to_history(entry)
+
+def add_to_history(entry):
+	if entry.get('status') != 0:
+		return
+	key = (entry['num_nodes'], entry['command'])
+	history['exact'].setdefault(key, []).append(entry['secs'])
+	history['shape'].setdefault(shape_key(entry['command']), []).append((entry['num_nodes'], entry['secs']))
+
+# Successful runs: (num_nodes, command) -> times and shape key -> (num_nodes, time)
+def load_history():
+	global history
+	if not history is None:
+		return history
+	history = {'exact': {}, 'shape': {}}
+	for entry in jsonlog.read(history_file):
+		add_to_history(entry)
+	return history
+
+def mean_std(values):
+	mean = sum(values) / len(values)
+	if len(values) < 2:
+		return mean, None
+	var = sum([(v - mean) ** 2 for v in values]) / (len(values) - 1)
+	return mean, math.sqrt(var)
+
+# Time that a new run is unlikely to exceed, given earlier runs
+def upper_bound(times):
+	mean, std = mean_std(times)
+	if std is None:
+		return times[0] * single_run_factor
+	bound = mean + margin_sigmas * std * math.sqrt(1 + 1.0/len(times))
+	return max(bound, max(times)) * margin_factor
+
+# Least squares fit of log t = log a + b log n, evaluated at num_nodes
+def fit_nodes(points, num_nodes):
+	xs = [math.log(n) for n, t in points]
+	ys = [math.log(t) for n, t in points]
+	mean_x = sum(xs) / len(xs)
+	mean_y = sum(ys) / len(ys)
+	sxx = sum([(x - mean_x) ** 2 for x in xs])
+	b = sum([(x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)]) / sxx
+	log_a = mean_y - b * mean_x
+	if len(points) > 2:
+		residuals = [y - (log_a + b * x) for x, y in zip(xs, ys)]
+		sigma = math.sqrt(sum([r * r for r in residuals]) / (len(points) - 2))
+	else:
+		sigma = default_log_sigma
+	sigma = max(sigma, default_log_sigma)
+	return math.exp(log_a + b * math.log(num_nodes) + margin_sigmas * sigma) * margin_factor
+
+# Predicted time of the command on num_nodes nodes, or None if it has
+# never been run
+def predict(num_nodes, command):
+	h = load_history()
+	times = h['exact'].get((num_nodes, command_key(command)))
+	if not times is None:
+		return upper_bound(times)
+	points = [(n, t) for n, t in h['shape'].get(shape_key(command), []) if t > 0]
+	if len(points) == 0:
+		return None
+	if len(set([n for n, t in points])) < 2:
+		# Only run on one other number of nodes: assume the same time
+		return upper_bound([t for n, t in points])
+	return fit_nodes(points, num_nodes)
@@ -0,0 +1,155 @@
+#! /usr/bin/env python
+# Micro-benchmark for the job output parser in logscan.py. Writes a
+# synthetic job output of the requested size, mostly runtime chatter with
+# a result line every so often, then parses it with the previous parser
+# (readlines() and all three regexes on every line) and with
+# logscan.iter_file_results, checks that both give the same results and
+# reports the speed-up.
+import os
+import sys
+import time
+import getopt
+import io
+import contextlib
+import logscan
+
+def Usage():
+	print('scan_benchmark.py <options>')
+	print('where:')
+	print(' -h                      Show this help')
+	print(' --size s                Size of the synthetic job output (default 2G)')
+	print(' --file f                Job output to write (default /tmp/scan_benchmark.txt)')
+	print(' --keep                  Keep the job output afterwards (and reuse it if present)')
+	print(' --chatter n             Lines of chatter per result line (default 20)')
+	print(' --no-reference          Only time logscan, not the previous parser')
+	return 1
+
+# Convert size descriptor such as 500M or 2G to number of bytes
+def from_size(s):
+	suffixes = {'k': 1024, 'M' : 1024 * 1024, 'G' : 1024 * 1024 * 1024 }
+	if s[-1] in suffixes:
+		return int(float(s[:-1]) * suffixes[s[-1]])
+	else:
+		return int(s)
+
+command_line = 'runhybrid.py --hybrid-directory x.hybrid --debug false --vranks 32 --global --degree 3 --local-period 10 --monitor 20 --config-override dlb.enable_drom=true,dlb.enable_lewi=true build/bestdegree\n'
+
+def write_job_output(filename, size, chatter):
+	block = []
+	for k in range(chatter):
+		if k % 4 == 0:
+			block.append('Rank %d gets 12345 (imb=1.500000)\n' % k)
+		elif k % 4 == 1:
+			block.append('Work per rank (ms): \n')
+		elif k % 4 == 2:
+			block.append('target_imbalance = 1.500000\n')
+		else:
+			block.append('1200 1300 1250 1400 1100 1350 1200 1275 \n')
+	chatter_block = ''.join(block)
+	with open(filename, 'w') as fp:
+		fp.write(command_line)
+		fp.write('Experiment vranks: 32 nodes: 32 deg: 3\n')
+		written = 0
+		it = 0
+		while written < size:
+			s = chatter_block + '# build/bestdegree appranks=32 deg=3 : iter=%d imb=1.500 time=%.2f sec\n' % (it, 5.0 + (it % 100) / 100.0)
+			fp.write(s)
+			written += len(s)
+			it += 1
+		fp.write('mv TRACE.mpits trace\n')
+
+# The parser before logscan.py, kept here as the reference
+def reference_file_results(fullname):
+	results = []
+	with open(fullname) as fp:
+		command = fp.readline()
+		drom = logscan.get_from_command('dlb.enable_drom=(true|false)', 'dlb.enable_drom', command, fullname)
+		lewi = logscan.get_from_command('dlb.enable_lewi=(true|false)', 'dlb.enable_lewi', command, fullname)
+		policy = logscan.get_from_command(' --(local|global)', 'policy', command, fullname)
+		numnodes = None
+		for line in fp.readlines():
+			m = logscan.re_experiment.match(line)
+			if m:
+				numnodes = int(m.group(2))
+			m = logscan.re_result.match(line)
+			if m:
+				r = {}
+				r['executable'] = m.group(1)
+				r['appranks'] = int(m.group(2))
+				r['degree'] = int(m.group(3))
+				params = tuple(m.group(4).split())
+				for p in params:
+					if '=' in p:
+						p2 = p.split('=')
+						r[p2[0]] = p2[1]
+				r['params'] = params
+				r['lewi'] = lewi
+				r['drom'] = drom
+				r['policy'] = policy
+				r['fullname'] = fullname
+				r['numnodes'] = numnodes
+				results.append((r, float(m.group(5))))
+			m = logscan.re_trace.match(line)
+			if m:
+				print(' --> trace: ', m.group(1))
+	return results
+
+def timed(desc, func, size):
+	output = io.StringIO()
+	start = time.time()
+	with contextlib.redirect_stdout(output):
+		results = func()
+	secs = time.time() - start
+	print('%-10s %8.2f secs %8.1f MB/s %d results' % (desc, secs, size / secs / 1e6, len(results)))
+	return results, secs
+
+def main(argv):
+	size = from_size('2G')
+	filename = '/tmp/scan_benchmark.txt'
+	keep = False
+	chatter = 20
+	reference = True
+	try:
+		opts, args = getopt.getopt( argv[1:],
+									'h', ['help', 'size=', 'file=', 'keep', 'chatter=', 'no-reference'])
+
+	except getopt.error as msg:
+		print(msg)
+		print("for help use --help")
+		sys.exit(2)
+	for o, a in opts:
+		if o in ('-h', '--help'):
+			return Usage()
+		elif o == '--size':
+			size = from_size(a)
+		elif o == '--file':
+			filename = a
+		elif o == '--keep':
+			keep = True
+		elif o == '--chatter':
+			chatter = int(a)
+		elif o == '--no-reference':
+			reference = False
+
+	if not (keep and os.path.exists(filename)):
+		print(f'Writing {filename}')
+		write_job_output(filename, size, chatter)
+	size = os.path.getsize(filename)
+	print('Job output of %.1f MB, %s' % (size / 1e6, 'memory mapped' if size >= logscan.mmap_threshold else 'read at once'))
+
+	try:
+		results, secs = timed('logscan', lambda: list(logscan.iter_file_results(filename)), size)
+		if reference:
+			ref_results, ref_secs = timed('reference', lambda: reference_file_results(filename), size)
+			if ref_results != results:
+				print('Error: logscan and reference results differ')
+				return 1
+			print('Speed-up: %.1fx' % (ref_secs / secs))
+	finally:
+		if not keep:
+			os.unlink(filename)
+	return 0
+
+
+if __name__ == '__main__':
+	sys.exit(main(sys.argv))
@@ -0,0 +1,75 @@
+#! /usr/bin/env python
+# Startup time of run-benchmarks.py. Every Slurm job runs
+# "run-benchmarks.py ... batch", and --dry-run and submit are run by hand,
+# so none of these should pay for importing NumPy or matplotlib, which
+# only the process command needs. This times "run-benchmarks.py -h" (all
+# the imports, then exit) against an empty Python, and fails if any of
+# the slow modules get imported.
+import os
+import sys
+import time
+import getopt
+import subprocess
+
+# Modules that must not be imported at startup
+slow_modules = ['numpy', 'matplotlib', 'resulttable']
+
+def Usage():
+	print('startup_benchmark.py <options>')
+	print('where:')
+	print(' -h                      Show this help')
+	print(' --runs n                Number of runs of each command (default 10)')
+	return 1
+
+def time_command(cmd, runs):
+	times = []
+	for k in range(runs):
+		start = time.time()
+		subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+		times.append(time.time() - start)
+	times.sort()
+	return times[0], times[len(times)//2]
+
+# Top-level modules imported by the command, from python -X importtime
+def imported_modules(cmd):
+	s = subprocess.run([cmd[0], '-X', 'importtime'] + cmd[1:], stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, universal_newlines=True)
+	modules = set([])
+	for line in s.stderr.splitlines():
+		if line.startswith('import time:'):
+			name = line.split('|')[-1].strip()
+			modules.add(name.split('.')[0])
+	return modules
+
+def main(argv):
+	runs = 10
+	try:
+		opts, args = getopt.getopt( argv[1:], 'h', ['help', 'runs='])
+	except getopt.error as msg:
+		print(msg)
+		print("for help use --help")
+		sys.exit(2)
+	for o, a in opts:
+		if o in ('-h', '--help'):
+			return Usage()
+		elif o == '--runs':
+			runs = int(a)
+
+	script = os.path.join(os.path.dirname(os.path.abspath(argv[0])), 'run-benchmarks.py')
+	empty_cmd = [sys.executable, '-c', 'pass']
+	help_cmd = [sys.executable, script, '-h']
+
+	empty_min, empty_median = time_command(empty_cmd, runs)
+	help_min, help_median = time_command(help_cmd, runs)
+	print('%-26s min %6.3f secs median %6.3f secs' % ('python -c pass', empty_min, empty_median))
+	print('%-26s min %6.3f secs median %6.3f secs' % ('run-benchmarks.py -h', help_min, help_median))
+	print('Startup overhead: %.3f secs' % (help_median - empty_median))
+
+	imported = [m for m in slow_modules if m in imported_modules(help_cmd)]
+	if len(imported) > 0:
+		print('Error: run-benchmarks.py imports ' + ', '.join(imported) + ' at startup')
+		return 1
+	return 0
+
+
+if __name__ == '__main__':
+	sys.exit(main(sys.argv))
@@ -0,0 +1,143 @@
+#! /usr/bin/env python
+import math
+import logscan
+
+# Steady-state detection for the per-iteration times of a benchmark. The
+# first iterations are slower (warm-up, and DLB moving cores and work
+# around), so they are left out of the averages. Rather than a fixed
+# fraction of the iterations, the warm-up is found with MSER-5: the times
+# are grouped in batches of 5 and the warm-up is the number of batches d
+# that minimises the standard error of the mean of the rest,
+#
+#   sum((y[i] - mean(y[d:]))^2 for i >= d) / (m - d)^2
+#
+# for d up to half of the m batches. With too few times for this, a fixed
+# fraction of them is left out as before (the first 67%, or 25% for
+# nbodyslownord). The confidence interval of the steady-state mean is from
+# the batch means of the rest (Student's t).
+#
+# The plots use steady_values() on the times of each configuration, and
+# with --steady-stop the runner uses Monitor to stop a command once the
+# confidence interval of each of its series of times is narrow enough.
+# A command may write its series one after the other (e.g. bestdegree
+# sweeps the imbalance in one process), so it is only stopped once as
+# many series as an earlier complete run of it wrote have all converged
+# (see runindex.expected_series). Its first run is never stopped.
+
+batch_size = 5
+
+# With fewer values than this (too few to find the warm-up), the first
+# warmup_fraction of them are the warm-up
+min_values = 10
+warmup_fraction = 0.67
+
+# Batches of batch_size are only used with at least min_batches of them
+# for MSER, otherwise each value is a batch
+min_batches = 10
+
+# Stop once the half-width of the 95% confidence interval is at most this
+# fraction of the mean, with at least min_steady values after the warm-up.
+# The benchmarks run 10 iterations of each configuration, and MSER keeps
+# at least half of them.
+rel_halfwidth = 0.02
+min_steady = 5
+
+# Two-sided 95% quantiles of Student's t for 1 to 30 degrees of freedom
+t_975 = [12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+		 2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+		 2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042]
+
+def t_quantile(df):
+	if df <= len(t_975):
+		return t_975[df - 1]
+	return 1.96
+
+def batch_means(values, size):
+	m = len(values) // size
+	return [sum(values[k*size : (k+1)*size]) / size for k in range(m)]
+
+# Number of batches in the warm-up of the batch means y (MSER)
+def mser(y):
+	m = len(y)
+	best_d = 0
+	best = None
+	# Sums of y and y^2 from d to the end
+	total = sum(y)
+	total_sq = sum([v * v for v in y])
+	for d in range(0, m // 2 + 1):
+		n = m - d
+		mean = total / n
+		stat = max(0.0, total_sq - n * mean * mean) / (n * n)
+		if best is None or stat < best:
+			best = stat
+			best_d = d
+		total -= y[d]
+		total_sq -= y[d] * y[d]
+	return best_d
+
+# Size of the batches for n values
+def batch_size_for(n):
+	return batch_size if n >= 2 * batch_size * min_batches else 1
+
+# Number of values in the warm-up
+def truncation_point(values, fallback_fraction=warmup_fraction):
+	if len(values) < min_values:
+		# At least one value is kept
+		return max(0, min(len(values) - 1, int(math.ceil(len(values) * fallback_fraction))))
+	size = batch_size_for(len(values))
+	return mser(batch_means(values, size)) * size
+
+# The values after the warm-up
+def steady_values(values, fallback_fraction=warmup_fraction):
+	return values[truncation_point(values, fallback_fraction):]
+
+# Mean of the values after the warm-up and the half-width of its 95%
+# confidence interval (None if too few batches)
+def steady_mean(values):
+	steady = steady_values(values)
+	if len(steady) == 0:
+		return None, None
+	mean = sum(steady) / len(steady)
+	y = batch_means(steady, batch_size_for(len(values)))
+	if len(y) < 2:
+		return mean, None
+	ymean = sum(y) / len(y)
+	var = sum([(v - ymean) ** 2 for v in y]) / (len(y) - 1)
+	return mean, t_quantile(len(y) - 1) * math.sqrt(var / len(y))
+
+def converged(values):
+	steady = steady_values(values)
+	if len(steady) < min_steady:
+		return False
+	mean, halfwidth = steady_mean(values)
+	return not halfwidth is None and mean > 0 and halfwidth <= rel_halfwidth * mean
+
+# Times of one command as they are written, in series (e.g. one per rank
+# or imbalance, see logscan.series_key). add() and line() return True once
+# num_series series have converged, or never if num_series is None.
+class Monitor:
+	def __init__(self, num_series=None):
+		self.num_series = num_series
+		self.series = {}
+		self.done = set([])
+		self.stopped = False
+
+	def add(self, key, value):
+		values = self.series.setdefault(key, [])
+		values.append(value)
+		# Checking every batch is enough
+		if len(values) % batch_size == 0 and converged(values):
+			self.done.add(key)
+		if not self.num_series is None and len(self.done) >= self.num_series:
+			self.stopped = True
+		return self.stopped
+
+	# Add the time on a line of the command's output (see
+	# asyncrunner.run_command), if it is a result line
+	def line(self, line, elapsed):
+		if not line.startswith(b'# '):
+			return self.stopped
+		m = logscan.re_result.match(logscan.decode_line(line))
+		if not m:
+			return self.stopped
+		return self.add(logscan.series_key(logscan.result_fields(m)), float(m.group(5)))
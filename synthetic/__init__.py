@@ -0,0 +1,5 @@
+# Declaration of this benchmark for run-benchmarks.py (see benchmarks.py)
+name = 'synthetic'
+description = 'synthetic benchmarks'
+module = 'unbalanced_sweep'
+needs_cmake = True
@@ -3,15 +3,17 @@ import sys
 import os
 from string import Template
 import re
+import plotpool
+import steadystate
 
-# Workaround for python/3.6.6_gdb doesn't support numpy
-# See run-benchmarks.py
-try:
+# NumPy and matplotlib are slow to import, so they are only imported when
+# plotting. See run-benchmarks.py for the python/3.6.6_gdb workaround.
+def import_plotting():
+	global np, PdfPages, plt
 	import numpy as np
 	from matplotlib.backends.backend_pdf import PdfPages
 	import matplotlib.pyplot as plt
-except ImportError:
-	pass
+	plotpool.setup_matplotlib()
 
 # Template to create the command to run the benchmark
 command_template = ' '.join(['runhybrid.py --hybrid-directory $$hybrid_directory $hybrid_params --debug false --vranks $vranks --$policy --degree $degree --local-period 120 --monitor 200',
@@ -40,7 +42,7 @@ def vranks_to_costs(num_vranks):
 
 est_time_secs = 0
 
-# Return the list of all commands to run
+# Generate all commands to run, each with the parameters of its template
 def commands(num_nodes, hybrid_params):
 	global est_time_secs
 	est_time_secs = 0
@@ -60,9 +62,10 @@ def commands(num_nodes, hybrid_params):
 				for drom in ['true']: # ['true','false'] if degree != 1
 					for lewi in ['true']: # ['true','false'] if degree != 1
 						for memsize in ['1', '1k', '10k', '100k', '1M', '10M', '20M']:
-							cmd = t.substitute(vranks=vranks, degree=degree, drom=drom, lewi=lewi, policy=policy, memsize=memsize, noflush=noflush, costs=costs, hybrid_params=hybrid_params)
+							params = dict(vranks=vranks, degree=degree, drom=drom, lewi=lewi, policy=policy, memsize=memsize, noflush=noflush, costs=costs, hybrid_params=hybrid_params)
+							cmd = t.substitute(params)
 							est_time_secs += 5 * 60 # Guess!
-							yield cmd
+							yield cmd, params
 
 def get_est_time_secs():
 	global est_time_secs
@@ -90,10 +93,7 @@ def format_mem(x):
 
 # Get all values of a field 
 def get_values(results, field):
-	values = set([])
-	for r, times in results:
-		values.add(r[field])
-	return sorted(values)
+	return results.values(field)
 
 def average(l):
 	return 1.0 * sum(l) / len(l)
@@ -101,21 +101,70 @@ def average(l):
 noflush_str = ['flush', 'noflush']
 
 
+# Execution time per iteration, one line per memory size
+def plot_time_series(filename, lines, policy, degree):
+	import_plotting()
+	with PdfPages(filename) as pdf:
+		maxy = 0
+		for xx, yy, label in lines:
+			plt.plot(xx, yy, label = label)
+			maxy = max(maxy,max(yy))
+		plt.title('%s degree %d: Execution time per iteration' % (policy, degree))
+		plt.xlabel('Iteration number')
+		plt.ylabel('Execution time (s)')
+		plt.ylim(0,maxy)
+		plt.legend()
+		pdf.savefig()
+		plt.close()
+
+def plot_barchart(filename, bars, labels):
+	import_plotting()
+	with PdfPages(filename) as pdf:
+		width = 0.2
+		for k, avgs, stdev, label in bars:
+			ind = np.arange(len(avgs))
+			plt.bar(ind + k * width, avgs, width, yerr=stdev, label=label)
+		plt.xticks(ind + 2*width, labels, rotation=20, wrap=True)
+		plt.legend(loc='best')
+		pdf.savefig()
+		plt.close()
+
+# Execution time as a function of memory footprint
+def plot_memory_sweep(filename, lines):
+	import_plotting()
+	with PdfPages(filename) as pdf:
+		for xx, yy, label in lines:
+			plt.plot(xx, yy, label = label)
+		plt.xlabel('Memory footprint')
+		plt.ylabel('Execution time (s)')
+		plt.ylim(0,1)
+		plt.legend(loc='best')
+		pdf.savefig()
+		plt.close()
+
 def generate_plots(results, output_prefix_str):
+	import_plotting()
 
 	# Keep only results for correct executable
-	results = [ (r,times) for (r,times) in results if r['executable'] == 'build/synthetic_unbalanced']
+	results = results.select(executable='build/synthetic_unbalanced')
+
+	# Fields taken from the command-line parameters: 10 480 <memsize> <noflush> <costs> : iter=<iter>
+	results = results.derive('mem', 'params', lambda params: from_mem(params[2]))
+	results = results.derive('noflush', 'params', lambda params: int(params[3]))
+	results = results.derive('iter_num', 'iter', int)
 
 	policies = get_values(results, 'policy')
 	degrees = get_values(results, 'degree')
 	apprankss = get_values(results, 'appranks')
 
-	all_iters = [int(x) for x in get_values(results, 'iter')]
+	all_iters = get_values(results, 'iter_num')
 	if len(all_iters) == 0:
 		# No synthetic results collected
 		return
 	niters = 1 + max(all_iters)
 
+	index = results.index(['appranks', 'degree', 'noflush', 'lewi', 'drom', 'policy'])
+
 	# Generate time series plots
 	for appranks in apprankss:
 		for policy in policies:
@@ -135,130 +184,93 @@ def generate_plots(results, output_prefix_str):
 									dlb_str = 'nodlb'
 							title = 'unbalanced-sweep-appranks%d-%s-deg%d-%s-%s.pdf' % (appranks, policy, degree, noflush_str[noflush], dlb_str)
 
-							res = [ (r,times) for (r,times) in results \
-										if r['appranks'] == appranks \
-										   and r['degree'] == degree \
-										   and int(r['params'][3]) == noflush \
-										   and r['lewi'] == lewi \
-										   and r['drom'] == drom \
-										   and r['policy'] == policy]
+							res = index.get(appranks=appranks, degree=degree, noflush=noflush, lewi=lewi, drom=drom, policy=policy)
 
 							# Index in the output for the time value
 							idx_iter = 5 + appranks
-							for r,times in res:
-								assert r['params'][idx_iter-1] == ':'
-								assert r['params'][idx_iter][0:5] == 'iter='
-								assert len(r['params']) == idx_iter+1
+							for params in get_values(res, 'params'):
+								assert params[idx_iter-1] == ':'
+								assert params[idx_iter][0:5] == 'iter='
+								assert len(params) == idx_iter+1
 
-							mems = sorted(set([from_mem(r['params'][2]) for r,times in res]))
+							mems = get_values(res, 'mem')
 							if len(mems) > 0:
-								iters = sorted(set([int(r['params'][idx_iter][5:]) for r,times in res]))
+								iters = get_values(res, 'iter_num')
+								res_index = res.index(['mem', 'iter_num'])
 															
-								with PdfPages('output/%s%s' % (output_prefix_str,title)) as pdf:
-									maxy = 0
-									for mem in mems:
-										xx = []
-										yy = []
-										for iter_num in iters:
-											t = [times for r,times in res \
-												if from_mem(r['params'][2]) == mem \
-													and int(r['params'][idx_iter][5:]) == iter_num]
-											if len(t) == 1:
-												xx.append(iter_num)
-												yy.append(average(t[0]))
-											else:
-												assert len(t) == 0
-										plt.plot(xx, yy, label = format_mem(mem))
-										maxy = max(maxy,max(yy))
-									plt.title('%s degree %d: Execution time per iteration' % (policy, degree))
-									plt.xlabel('Iteration number')
-									plt.ylabel('Execution time (s)')
-									plt.ylim(0,maxy)
-									plt.legend()
-									pdf.savefig()
-									plt.close()
+								lines = []
+								for mem in mems:
+									xx = []
+									yy = []
+									for iter_num in iters:
+										t = res_index.get(mem=mem, iter_num=iter_num)
+										if len(t) == 1:
+											xx.append(iter_num)
+											yy.append(t.means()[0])
+										else:
+											assert len(t) == 0
+									lines.append((xx, yy, format_mem(mem)))
+								plotpool.figure('output/%s%s' % (output_prefix_str,title), plot_time_series, lines, policy, degree)
+
+	index = results.index(['appranks', 'degree', 'noflush', 'lewi', 'drom', 'policy', 'mem', 'iter_num'])
 
 	# Generate barcharts
-	mems = sorted(set([from_mem(r['params'][2]) for r,times in results]))
+	mems = get_values(results, 'mem')
 	for mem in mems:
-		with PdfPages('output/%sunbalanced-%s-barcharts.pdf' % (output_prefix_str, format_mem(mem))) as pdf:
-			lewi = 'true'
-			drom = 'true'
-			groups = [ (nf,a,p) for nf in [0,1] for a in [4,8] for p in ['local','global']]
-			for k,degree in enumerate(degrees):
-				avgs = []
-				stdevs = []
-				for (noflush, appranks, policy) in groups:
-					curr = [ (r,times) for (r,times) in results \
-								if r['appranks'] == appranks \
-								   and r['degree'] == degree \
-								   and int(r['params'][3]) == noflush \
-								   and r['lewi'] == lewi \
-								   and r['drom'] == drom \
-								   and r['policy'] == policy \
-								   and from_mem(r['params'][2]) == mem \
-								   and int(r['iter']) >= niters * 0.67 ]
-					#print(f'mem={mem} curr={curr}')
-					vals = []
-					for i in range(0,niters):
-						curr2 = [average(times) for r,times in curr if int(r['iter']) == i]
-						if len(curr2) > 0:
-							vals.append(average(curr2))
+		lewi = 'true'
+		drom = 'true'
+		groups = [ (nf,a,p) for nf in [0,1] for a in [4,8] for p in ['local','global']]
+		bars = []
+		for k,degree in enumerate(degrees):
+			avgs = []
+			stdevs = []
+			for (noflush, appranks, policy) in groups:
+				vals = []
+				for i in range(0,niters):
+					curr2 = index.get(appranks=appranks, degree=degree, noflush=noflush, lewi=lewi, drom=drom,
+									  policy=policy, mem=mem, iter_num=i).means().tolist()
+					if len(curr2) > 0:
+						vals.append(average(curr2))
+				# Only the iterations after the warm-up are used for the averages
+				vals = steadystate.steady_values(vals)
 
-					if len(vals) > 0:
-						avg = average(vals)
-						stdev = np.std(vals)
-					else:
-						avg = 0
-						stdev = 0
-					avgs.append(avg)
-					stdevs.append(stdev)
-				ind = np.arange(len(avgs))
-				width = 0.2
-				plt.bar(ind + k * width, avgs, width, yerr=stdev, label='degree %d' % degree)
-			plt.xticks(ind + 2*width, ['%s %d %s' % (noflush_str[nf],a,p) for (nf,a,p) in groups], rotation=20, wrap=True)
-			plt.legend(loc='best')
-			pdf.savefig()
-			plt.close()
+				if len(vals) > 0:
+					avg = average(vals)
+					stdev = np.std(vals)
+				else:
+					avg = 0
+					stdev = 0
+				avgs.append(avg)
+				stdevs.append(stdev)
+			bars.append((k, avgs, stdev, 'degree %d' % degree))
+		labels = ['%s %d %s' % (noflush_str[nf],a,p) for (nf,a,p) in groups]
+		plotpool.figure('output/%sunbalanced-%s-barcharts.pdf' % (output_prefix_str, format_mem(mem)), plot_barchart, bars, labels)
 
 	# Generate plot as function of memory
-	mems = sorted(set([from_mem(r['params'][2]) for r,times in results]))
+	mems = get_values(results, 'mem')
 	for appranks in [4,8]:
 		groups = [ (nf,p) for nf in [0,1] for p in ['local','global']]
-		with PdfPages('output/%sunbalanced-sweep-appranks-%d.pdf' % (output_prefix_str,appranks)) as pdf:
-			for (noflush, policy) in groups:
-				for degree in degrees:
-					lewi = 'true'
-					drom = 'true'
-					curr = [ (r,times) for (r,times) in results \
-								if r['appranks'] == appranks \
-								   and r['degree'] == degree \
-								   and int(r['params'][3]) == noflush \
-								   and r['lewi'] == lewi \
-								   and r['drom'] == drom \
-								   and r['policy'] == policy \
-								   and int(r['iter']) >= niters * 0.67 ]
-					#print(f'mem={mem} curr={curr}')
-					xx = [] # memory
-					yy = [] # time
-					for mem in mems:
-						vals = [] # All iterations for this amount of memory
-						for i in range(0,niters):
-							curr2 = [average(times) for r,times in curr if int(r['iter']) == i and from_mem(r['params'][2]) == mem]
-							if len(curr2) > 0:
-								vals.append(max(curr2))
-						#print(f'nf={noflush} a={appranks} p={policy} deg={degree} mem={mem} vals={vals}')
-						if len(vals) > 0:
-							yy.append(average(vals))
-							xx.append(mem)
-					plt.plot(xx, yy, label = '%s appranks=%d %s deg=%d' % (noflush_str[noflush], appranks, policy, degree))
-
-			plt.xlabel('Memory footprint')
-			plt.ylabel('Execution time (s)')
-			plt.ylim(0,1)
-			plt.legend(loc='best')
-			pdf.savefig()
-			plt.close()
+		lines = []
+		for (noflush, policy) in groups:
+			for degree in degrees:
+				lewi = 'true'
+				drom = 'true'
+				xx = [] # memory
+				yy = [] # time
+				for mem in mems:
+					vals = [] # All iterations for this amount of memory
+					for i in range(0,niters):
+						curr2 = index.get(appranks=appranks, degree=degree, noflush=noflush, lewi=lewi, drom=drom,
+										  policy=policy, mem=mem, iter_num=i).means().tolist()
+						if len(curr2) > 0:
+							vals.append(max(curr2))
+					vals = steadystate.steady_values(vals)
+					#print(f'nf={noflush} a={appranks} p={policy} deg={degree} mem={mem} vals={vals}')
+					if len(vals) > 0:
+						yy.append(average(vals))
+						xx.append(mem)
+				lines.append((xx, yy, '%s appranks=%d %s deg=%d' % (noflush_str[noflush], appranks, policy, degree)))
+		plotpool.figure('output/%sunbalanced-sweep-appranks-%d.pdf' % (output_prefix_str,appranks), plot_memory_sweep, lines)
 
 
 
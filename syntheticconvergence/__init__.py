@@ -0,0 +1,5 @@
+# Declaration of this benchmark for run-benchmarks.py (see benchmarks.py)
+name = 'convergence'
+description = 'convergence benchmark'
+module = 'syntheticconvergence'
+needs_cmake = True
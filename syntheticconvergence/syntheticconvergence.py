@@ -3,15 +3,17 @@ import sys
 import os
 from string import Template
 import re
+import plotpool
+import manifest
 
-# Workaround for python/3.6.6_gdb doesn't support numpy
-# See run-benchmarks.py
-try:
+# NumPy and matplotlib are slow to import, so they are only imported when
+# plotting. See run-benchmarks.py for the python/3.6.6_gdb workaround.
+def import_plotting():
+	global np, PdfPages, plt
 	import numpy as np
 	from matplotlib.backends.backend_pdf import PdfPages
 	import matplotlib.pyplot as plt
-except ImportError:
-	pass
+	plotpool.setup_matplotlib()
 
 
 def allowed_policies(degree):
@@ -61,7 +63,7 @@ def imbalances(vranks):
 		return [1.0, float(vranks)]
 
 
-# Return the list of all commands to run
+# Generate all commands to run, each with the parameters of its template
 def commands(num_nodes, hybrid_params):
 	global est_time_secs
 	est_time_secs = 0
@@ -82,9 +84,10 @@ def commands(num_nodes, hybrid_params):
 		for policy in policies:
 			for drom,lewi in drom_lewis:
 				for imb in imbalances(vranks):
-					cmd = t.substitute(vranks=vranks, degree=degree, drom=drom, lewi=lewi, policy=policy, hybrid_params=hybrid_params, imbalance=imb)
+					params = dict(vranks=vranks, degree=degree, drom=drom, lewi=lewi, policy=policy, hybrid_params=hybrid_params, imbalance=imb)
+					cmd = t.substitute(params)
 					est_time_secs += imb * 60
-					yield cmd
+					yield cmd, params
 
 
 def get_est_time_secs():
@@ -93,10 +96,7 @@ def get_est_time_secs():
 
 # Get all values of a field 
 def get_values(results, field):
-	values = set([])
-	for r, times in results:
-		values.add(r[field])
-	return sorted(values)
+	return results.values(field)
 
 def average(l):
 	return 1.0 * sum(l) / len(l)
@@ -109,25 +109,43 @@ def read_map_entry(label, line):
 		return None
 	return int(s[1])
 
-def busy_generator(hybriddir, extrank):
-	with open(f'{hybriddir}/utilization{extrank}') as f:
-		busy = 0
-		curr_time = 0.95
-		while True:
-			s = f.readline().strip().split()
+# Load the (time, busy) columns of a utilization file, up to the first
+# incomplete line
+def load_utilization(hybriddir, extrank):
+	filename = f'{hybriddir}/utilization{extrank}'
+	if os.path.getsize(filename) == 0:
+		return np.zeros(0), np.zeros(0)
+	try:
+		# Fast path when every line is complete
+		data = np.loadtxt(filename, usecols=(0,3), ndmin=2)
+		return data[:,0], data[:,1]
+	except (ValueError, IndexError):
+		pass
+	times = []
+	busies = []
+	with open(filename) as f:
+		for line in f:
+			s = line.split()
 			if len(s) < 4:
-				return
-			time = float(s[0])
-			#print(f'Wait for time {time}')
-
-			while curr_time < time:
-				yield busy
-				curr_time += 0.5 # Generate point every half second
-			busy = float(s[3]) # busy time
-			#print(f'Now busy {busy}')
-
-		#float(s[3]) # busy time
-
+				break
+			times.append(float(s[0]))
+			busies.append(float(s[3])) # busy time
+	return np.array(times), np.array(busies)
+
+# Resample a utilization file onto the grid 0.95, 1.45, 1.95, ... (every
+# half second), up to its last time. The value at each point is the busy
+# time of the last line at or before it (zero before the first line).
+def resample_busy(times, busies):
+	if len(times) == 0:
+		return np.zeros(0)
+	# Running maximum, in case a time ever goes backwards
+	times = np.maximum.accumulate(times)
+	n = max(0, int(np.ceil((times[-1] - 0.95) / 0.5))) + 2
+	# Accumulate the same way as adding 0.5 at every step
+	grid = np.cumsum(np.concatenate([[0.95], np.full(n, 0.5)]))
+	grid = grid[grid < times[-1]]
+	pos = np.searchsorted(times, grid, side='right')
+	return np.where(pos > 0, busies[np.maximum(pos - 1, 0)], 0.0)
 
 
 def process(hybriddir):
@@ -152,31 +170,28 @@ def process(hybriddir):
 	nodes = list(nodes)
 	extranks = sorted(extranks)
 	
-	gens = [ busy_generator(hybriddir, extrank) for extrank in extranks ]
-
-	curr_time = 0.0
-	xx = []
-	yy = []
-	while True:
-		try:
-			busies = [ next(gen) for gen in gens ]
-			work_on_node = dict([ (node,0) for node in nodes ])
-			for extrank, busy in enumerate(busies):
-				work_on_node[ extrank_to_node[extrank] ] += busy
-			values = work_on_node.values()
-			assert len(values) > 0
-			if max(values) > 0:
-				imbalance = max(values) / average(values)
-				xx.append(curr_time)
-				yy.append(imbalance)
-				
-			curr_time += 0.5
-		except StopIteration:
-			break
-	return xx,yy
+	busy = [ resample_busy(*load_utilization(hybriddir, extrank)) for extrank in extranks ]
+	n = min([len(b) for b in busy])
+
+	# Total busy time on each node at each point
+	node_col = dict([ (node, j) for j, node in enumerate(nodes) ])
+	work_on_node = np.zeros((n, len(nodes)))
+	for extrank, b in zip(extranks, busy):
+		work_on_node[:, node_col[ extrank_to_node[extrank] ]] += b[:n]
+
+	maxes = work_on_node.max(axis=1)
+	keep = maxes > 0
+	xx = (0.5 * np.arange(n))[keep]
+	yy = maxes[keep] / work_on_node[keep].mean(axis=1)
+	return xx.tolist(), yy.tolist()
 
 
+# The hybrid directory of a job output, from its manifest (or its name, for
+# older job outputs)
 def fullname_to_hybriddir(txtfilename):
+	run = manifest.read(txtfilename)
+	if not run is None:
+		return run['hybrid_directory']
 	m = re.match('(.*convergence.*)\.txt', txtfilename)
 	if not m:
 		print(f'Bad convergence filename {txtfilename}')
@@ -184,23 +199,80 @@ def fullname_to_hybriddir(txtfilename):
 	return m.group(1) + '.hybrid'
 
 
+# Name, size and modification time of the map and utilization files of a
+# job output, so that the plot cache sees when they change
+def utilization_stamps(fullname):
+	hybriddir = fullname_to_hybriddir(fullname)
+	stamps = []
+	for filename in sorted(os.listdir(hybriddir)):
+		if filename.startswith('map') or filename.startswith('utilization'):
+			st = os.stat(f'{hybriddir}/{filename}')
+			stamps.append((filename, st.st_size, st.st_mtime_ns))
+	return stamps
+
+
+# Order of the lines in the convergence plots
+def sortkey(r):
+	if int(r['degree']) == 1:
+		return 1 # Baseline
+	elif r['lewi'] == 'true' and r['drom'] == 'false' and r['policy'] == 'global':
+		return 2
+	elif r['lewi'] == 'true' and r['drom'] == 'false' and r['policy'] == 'local':
+		return 3
+	elif r['lewi'] == 'false' and r['drom'] == 'true' and r['policy'] == 'global':
+		return 4
+	elif r['lewi'] == 'false' and r['drom'] == 'true' and r['policy'] == 'local':
+		return 5
+	elif r['policy'] == 'global':
+		return 6
+	elif r['policy'] == 'local':
+		return 7
+
+# Imbalance over time, one line per result. The utilization files are
+# processed here, so that it is done in the worker processes. The stamps
+# are not used, but they are part of the figure's hash for the plot cache.
+def plot_convergence(filename, curves, appranks, stamps):
+	import_plotting()
+	with PdfPages(filename) as pdf:
+		plt.figure(figsize=(0.8*8,0.8*4))
+		for fullname, label, linestyle, linewidth, color in curves:
+			hybriddir = fullname_to_hybriddir(fullname)
+			xx, yy = process(hybriddir)
+
+			avg_y = average(yy)
+			print(fullname, label, 'avg: %.2f' % avg_y)
+
+			plt.plot(xx, yy, label = label, linestyle = linestyle, linewidth = linewidth, color=color)
+
+		if int(appranks) == 2:
+			plt.xlim(0,20)
+
+
+		plt.xlabel('Time (secs)')
+		plt.ylabel('Imbalance')
+		plt.legend(loc='best')
+		pdf.savefig()
+		plt.close()
+
+
 def generate_plots(results, output_prefix_str):
+	import_plotting()
 
 	## Keep only results for correct executable
-	results = [ (r,times) for (r,times) in results \
-					if r['executable'] == 'build/syntheticconvergence'
-					and int(r['iter']) == 0]
+	results = results.select(executable='build/syntheticconvergence')
+	results = results.derive('iter_num', 'iter', int)
+	results = results.select(iter_num=0)
 
 	imbalances = get_values(results, 'imb')
 	apprankss = get_values(results, 'appranks')
 	#print(f'imbalances {imbalances}')
 	#print(f'appranks {apprankss}')
 
+	index = results.index(['appranks', 'imb'])
+
 	for appranks in apprankss:
 		for imbalance in imbalances:
-			curr = [(r,times) for r,times in results \
-						if r['appranks'] == appranks \
-						and r['imb'] == imbalance ]
+			curr = list(index.get(appranks=appranks, imb=imbalance).rows())
 			lcurr = len(curr)
 
 			showdegree = True
@@ -211,81 +283,49 @@ def generate_plots(results, output_prefix_str):
 				showdegree = False
 				degrees = [1, 4]
 			else:
-				degrees = sorted(set([int(r['degree']) for r,times in curr]))
+				degrees = sorted(set([int(r['degree']) for r in curr]))
 
 			print(f'appranks {appranks} imb {imbalance}: len {lcurr}')
 			if float(imbalance) > 1.0 and len(curr) > 0:
-				with PdfPages('output/%ssynthetic-convergence-%s-%s.pdf' % (output_prefix_str,appranks, imbalance)) as pdf:
-					plt.figure(figsize=(0.8*8,0.8*4))
-
-					def sortkey(entry):
-						r, times = entry
+				sorted_results = sorted(curr, key = sortkey)
+
+				curves = []
+
+				for r in sorted_results:
+					if int(r['degree']) in degrees:
+						vranks = int(appranks)
+						degree = int(r['degree'])
+						if degree == 1:
+							dlb = 'Baseline '
+							linestyle = '-'
+							linewidth = 1.5
+						elif r['lewi'] == 'true' and r['drom'] == 'true':
+							dlb = ''
+							linestyle = '-'
+							linewidth = 2.0
+						elif r['lewi'] == 'true' :
+							dlb = 'LeWI-only '
+							linestyle = '--'
+							linewidth = 0.7
+						else:
+							assert r['drom'] == 'true'
+							dlb = 'DROM-only '
+							linestyle = '-.'
+							linewidth = 1.0
+						imb = r['imb']
+						policy = r['policy'] if int(r['degree']) > 1 else ''
 						if int(r['degree']) == 1:
-							return 1 # Baseline
-						elif r['lewi'] == 'true' and r['drom'] == 'false' and r['policy'] == 'global':
-							return 2
-						elif r['lewi'] == 'true' and r['drom'] == 'false' and r['policy'] == 'local':
-							return 3
-						elif r['lewi'] == 'false' and r['drom'] == 'true' and r['policy'] == 'global':
-							return 4
-						elif r['lewi'] == 'false' and r['drom'] == 'true' and r['policy'] == 'local':
-							return 5
-						elif r['policy'] == 'global':
-							return 6
-						elif r['policy'] == 'local':
-							return 7
-
-					sorted_results = sorted(results, key = sortkey)
-
-					for r,times in sorted_results:
-						if r['appranks'] == appranks and r['imb'] == imbalance and int(r['degree']) in degrees:
-							vranks = int(appranks)
-							degree = int(r['degree'])
-							if degree == 1:
-								dlb = 'Baseline '
-								linestyle = '-'
-								linewidth = 1.5
-							elif r['lewi'] == 'true' and r['drom'] == 'true':
-								dlb = ''
-								linestyle = '-'
-								linewidth = 2.0
-							elif r['lewi'] == 'true' :
-								dlb = 'LeWI-only '
-								linestyle = '--'
-								linewidth = 0.7
-							else:
-								assert r['drom'] == 'true'
-								dlb = 'DROM-only '
-								linestyle = '-.'
-								linewidth = 1.0
-							imb = r['imb']
-							policy = r['policy'] if int(r['degree']) > 1 else ''
-							if int(r['degree']) == 1:
-								color = '#1f77b4'
-							elif policy == 'local':
-								color = '#ff7f0e'
-							else:
-								assert policy == 'global'
-								color = '#2ca02c'
-							label = f'{dlb}{policy}'
-							if showdegree:
-								label = label + f' deg {degree}'
-
-							hybriddir = fullname_to_hybriddir(r['fullname'])
-							xx, yy = process(hybriddir)
-
-							avg_y = average(yy)
-							print(r['fullname'], label, 'avg: %.2f' % avg_y)
-
-							plt.plot(xx, yy, label = label, linestyle = linestyle, linewidth = linewidth, color=color)
-
-					if int(appranks) == 2:
-						plt.xlim(0,20)
-
-
-					plt.xlabel('Time (secs)')
-					plt.ylabel('Imbalance')
-					plt.legend(loc='best')
-					pdf.savefig()
-					plt.close()
-
+							color = '#1f77b4'
+						elif policy == 'local':
+							color = '#ff7f0e'
+						else:
+							assert policy == 'global'
+							color = '#2ca02c'
+						label = f'{dlb}{policy}'
+						if showdegree:
+							label = label + f' deg {degree}'
+
+						curves.append((r['fullname'], label, linestyle, linewidth, color))
+
+				plotpool.figure('output/%ssynthetic-convergence-%s-%s.pdf' % (output_prefix_str,appranks, imbalance), plot_convergence,
+								curves, appranks, [utilization_stamps(curve[0]) for curve in curves])
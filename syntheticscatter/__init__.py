@@ -0,0 +1,5 @@
+# Declaration of this benchmark for run-benchmarks.py (see benchmarks.py)
+name = 'scatter'
+description = 'synthetic scatter benchmark'
+module = 'syntheticscatter'
+needs_cmake = True
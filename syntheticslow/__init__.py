@@ -0,0 +1,5 @@
+# Declaration of this benchmark for run-benchmarks.py (see benchmarks.py)
+name = 'slow'
+description = 'test with slow node'
+module = 'syntheticslow'
+needs_cmake = True
@@ -3,17 +3,16 @@ import sys
 import os
 from string import Template
 import re
+import plotpool
 
-# Workaround for python/3.6.6_gdb doesn't support numpy
-# See run-benchmarks.py
-try:
+# NumPy and matplotlib are slow to import, so they are only imported when
+# plotting. See run-benchmarks.py for the python/3.6.6_gdb workaround.
+def import_plotting():
+	global np, PdfPages, plt
 	import numpy as np
 	from matplotlib.backends.backend_pdf import PdfPages
-	from matplotlib import rcParams
 	import matplotlib.pyplot as plt
-	rcParams.update({'figure.autolayout': True})
-except ImportError:
-	pass
+	plotpool.setup_matplotlib()
 
 
 def split_by_times(xx, yy):
@@ -48,7 +47,7 @@ def make():
 
 est_time_secs = 0
 
-# Return the list of all commands to run
+# Generate all commands to run, each with the parameters of its template
 def commands(num_nodes, hybrid_params):
 	global est_time_secs
 	est_time_secs = 0
@@ -67,9 +66,10 @@ def commands(num_nodes, hybrid_params):
 		for policy in policies:
 			for drom in ['true']: # ['true','false'] if degree != 1
 				for lewi in ['true']: # ['true','false'] if degree != 1
-					cmd = t.substitute(vranks=vranks, degree=degree, drom=drom, lewi=lewi, policy=policy, hybrid_params=hybrid_params)
+					params = dict(vranks=vranks, degree=degree, drom=drom, lewi=lewi, policy=policy, hybrid_params=hybrid_params)
+					cmd = t.substitute(params)
 					est_time_secs += 15 * vranks * 60 * 2 # 2 for slow_worst =0 and 1
-					yield cmd
+					yield cmd, params
 
 def get_est_time_secs():
 	global est_time_secs
@@ -77,10 +77,7 @@ def get_est_time_secs():
 
 # Get all values of a field 
 def get_values(results, field):
-	values = set([])
-	for r, times in results:
-		values.add(r[field])
-	return sorted(values)
+	return results.values(field)
 
 def average(l):
 	return 1.0 * sum(l) / len(l)
@@ -88,10 +85,44 @@ def average(l):
 noflush_str = ['flush', 'noflush']
 
 
+def plot_slow(filename, lines, appranks, policy, slow_worst, min_imb, max_imb, baseline_time, maxyy):
+	import_plotting()
+	with PdfPages(filename) as pdf:
+		fig = plt.figure(figsize=(0.8*4,0.8*4))
+		ax = fig.add_subplot(111)
+
+		plt.plot([min_imb, max_imb], [baseline_time, baseline_time], color='silver', label='Perfect balance') #, marker='o')
+		for xx, yy, label in lines:
+			plt.plot(xx, yy, label = label, marker='o')
+
+		plt.title(f'Appranks {appranks} policy {policy}')
+		if slow_worst == 0:
+			plt.xlabel('Imbalance (slow node has least work)')
+			plt.xlim(max_imb, 1.0)
+			plt.ylabel('Execution time (s)')
+		else:
+			plt.xlabel('Imbalance (slow node has most work)')
+			plt.xlim(1.0, max_imb)
+			ax.yaxis.tick_right()
+		plt.ylim(0,maxyy)
+
+		# Order legend to put the perfect balance (which was plotted first, so has index 0) last
+		handles, labels = plt.gca().get_legend_handles_labels()
+		n = len(handles)
+		order = list(range(1,n)) + [0] # List of indices according to original order
+		plt.legend([handles[idx] for idx in order], [labels[idx] for idx in order], loc='best')
+		plt.tight_layout(pad=0.1, w_pad=0.1, h_pad=0.1)
+		pdf.savefig()
+		plt.close()
+
+
 def generate_plots(results, output_prefix_str):
+	import_plotting()
 
 	# Keep only results for correct executable
-	results = [ (r,times) for (r,times) in results if r['executable'] == 'build/syntheticslow']
+	results = results.select(executable='build/syntheticslow')
+	results = results.derive('iter_num', 'iter', int)
+	results = results.derive('slow_worst_num', 'slow_worst', int)
 	# print(results)
 
 	policies = get_values(results, 'policy')
@@ -101,12 +132,14 @@ def generate_plots(results, output_prefix_str):
 	print(f'degrees {degrees}')
 	print(f'apprankss {apprankss}')
 
-	all_iters = [int(x) for x in get_values(results, 'iter')]
+	all_iters = get_values(results, 'iter_num')
 	if len(all_iters) == 0:
 		# No synthetic results collected
 		return
 	niters = 1 + max(all_iters)
 
+	by_appranks = results.index(['appranks'])
+	last_iter_index = results.index(['appranks', 'lewi', 'drom', 'iter_num'])
 
 	# Generate plot as function of memory
 	maxyy = 1
@@ -124,15 +157,11 @@ def generate_plots(results, output_prefix_str):
 			drom = 'true'
 
 			# Get scale
-			curr2 = [ (r,times) for (r,times) in results \
-						if r['appranks'] == appranks \
-						   and r['lewi'] == lewi \
-						   and r['drom'] == drom \
-						   and int(r['iter']) == niters-1 ]
+			curr2 = last_iter_index.get(appranks=appranks, lewi=lewi, drom=drom, iter_num=niters-1)
 			# ymax = max([times for (r,times) in curr])
 			# xmax = max([float(r['imb']) for (r,times) in curr])
 
-			maxyy = max([max(times) for (r,times) in curr2])
+			maxyy = max(curr2.maxes().tolist())
 
 			for slow_worst in [0,1]:
 		
@@ -142,59 +171,35 @@ def generate_plots(results, output_prefix_str):
 					whichslow = 'slowmost'
 
 				filename = 'output/%ssynthetic-slow-%d-%s-%s.pdf' % (output_prefix_str,appranks,whichslow, policy)
-				with PdfPages(filename) as pdf:
-
-					# Draw perfect balance line
-					min_imb = min([float(r['imb']) for (r,times) in results if r['appranks'] == appranks])
-					max_imb = max([float(r['imb']) for (r,times) in results if r['appranks'] == appranks])
-					print(min_imb, max_imb, baseline_time)
-					fig = plt.figure(figsize=(0.8*4,0.8*4))
-					ax = fig.add_subplot(111)
-
-					plt.plot([min_imb, max_imb], [baseline_time, baseline_time], color='silver', label='Perfect balance') #, marker='o')
-
-					for degree in degrees:
-						if degree == 1:
-							lcl_policies = ['local', 'global'] # Combine both, if happen to have been run
-						else:
-							lcl_policies = [policy]
-						curr = [ (r,times) for (r,times) in curr2 \
-								   if r['degree'] == degree \
-								   and r['policy'] in lcl_policies \
-								   and int(r['slow_worst']) == slow_worst]
-
-						xx = [float(r['imb']) for (r,times) in curr] # x is imbalance
-						yy = [times for (r,times) in curr]
-							
-						yy = [average(times) for times in yy] # To average each datapoint
-						# xx,yy = split_by_times(xx, yy) # To keep all datapoints
-
-						if len(xx) > 0:
-
-							print(filename)
-							print(f'appranks {appranks} policy {policy} degree {degree}')
-							print('xx =', xx)
-							print('yy =', yy)
-							plt.plot(xx, yy, label = f'degree {degree}', marker='o')
-
-					plt.title(f'Appranks {appranks} policy {policy}')
-					if slow_worst == 0:
-						plt.xlabel('Imbalance (slow node has least work)')
-						plt.xlim(max_imb, 1.0)
-						plt.ylabel('Execution time (s)')
+
+				# Draw perfect balance line
+				imbs = [float(imb) for imb in by_appranks.get(appranks=appranks).column('imb')]
+				min_imb = min(imbs)
+				max_imb = max(imbs)
+				print(min_imb, max_imb, baseline_time)
+
+				lines = []
+				for degree in degrees:
+					if degree == 1:
+						lcl_policies = ['local', 'global'] # Combine both, if happen to have been run
 					else:
-						plt.xlabel('Imbalance (slow node has most work)')
-						plt.xlim(1.0, max_imb)
-						ax.yaxis.tick_right()
-					plt.ylim(0,maxyy)
-
-					# Order legend to put the perfect balance (which was plotted first, so has index 0) last
-					handles, labels = plt.gca().get_legend_handles_labels()
-					n = len(handles)
-					order = list(range(1,n)) + [0] # List of indices according to original order
-					plt.legend([handles[idx] for idx in order], [labels[idx] for idx in order], loc='best')
-					plt.tight_layout(pad=0.1, w_pad=0.1, h_pad=0.1)
-					pdf.savefig()
+						lcl_policies = [policy]
+					curr = curr2.select(degree=degree, policy=lcl_policies, slow_worst_num=slow_worst)
+
+					xx = [float(imb) for imb in curr.column('imb')] # x is imbalance
+					yy = curr.means().tolist() # To average each datapoint
+					# xx,yy = split_by_times(xx, yy) # To keep all datapoints
+
+					if len(xx) > 0:
+
+						print(filename)
+						print(f'appranks {appranks} policy {policy} degree {degree}')
+						print('xx =', xx)
+						print('yy =', yy)
+						lines.append((xx, yy, f'degree {degree}'))
+
+				plotpool.figure(filename, plot_slow, lines, appranks, policy, slow_worst, min_imb, max_imb, baseline_time, maxyy)
+
 
 
 
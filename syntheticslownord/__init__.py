@@ -0,0 +1,5 @@
+# Declaration of this benchmark for run-benchmarks.py (see benchmarks.py)
+name = 'slownord'
+description = 'broken: slow node on Nord3'
+module = 'syntheticslownord'
+needs_cmake = True
@@ -3,15 +3,16 @@ import sys
 import os
 from string import Template
 import re
+import plotpool
 
-# Workaround for python/3.6.6_gdb doesn't support numpy
-# See run-benchmarks.py
-try:
+# NumPy and matplotlib are slow to import, so they are only imported when
+# plotting. See run-benchmarks.py for the python/3.6.6_gdb workaround.
+def import_plotting():
+	global np, PdfPages, plt
 	import numpy as np
 	from matplotlib.backends.backend_pdf import PdfPages
 	import matplotlib.pyplot as plt
-except ImportError:
-	pass
+	plotpool.setup_matplotlib()
 
 
 def split_by_times(xx, yy):
@@ -31,6 +32,10 @@ command_template = ' '.join(['runhybrid.py --hybrid-directory $$hybrid_directory
 					         '--config-override dlb.enable_drom=$drom,dlb.enable_lewi=$lewi',
 				             'build/syntheticslownord'])
 
+# The plots show every time, so cannot be drawn from the running
+# statistics kept by run-benchmarks.py --stream
+needs_raw_times = True
+
 # For which numbers of nodes is this benchmark valid
 def num_nodes():
 	return [2,4,8,16]
@@ -44,7 +49,7 @@ def make():
 	else:
 		return True
 	
-# Return the list of all commands to run
+# Generate all commands to run, each with the parameters of its template
 def commands(num_nodes, hybrid_params):
 	if num_nodes == 1:
 		# No commands if running on single node
@@ -61,15 +66,13 @@ def commands(num_nodes, hybrid_params):
 		for policy in policies:
 			for drom in ['true']: # ['true','false'] if degree != 1
 				for lewi in ['true']: # ['true','false'] if degree != 1
-					cmd = t.substitute(vranks=vranks, degree=degree, drom=drom, lewi=lewi, policy=policy, hybrid_params=hybrid_params)
-					yield cmd
+					params = dict(vranks=vranks, degree=degree, drom=drom, lewi=lewi, policy=policy, hybrid_params=hybrid_params)
+					cmd = t.substitute(params)
+					yield cmd, params
 
 # Get all values of a field 
 def get_values(results, field):
-	values = set([])
-	for r, times in results:
-		values.add(r[field])
-	return sorted(values)
+	return results.values(field)
 
 def average(l):
 	return 1.0 * sum(l) / len(l)
@@ -77,10 +80,35 @@ def average(l):
 noflush_str = ['flush', 'noflush']
 
 
+def plot_scatter(filename, points, appranks, policy, min_imb, max_imb, baseline_time, maxyy):
+	import_plotting()
+	with PdfPages(filename) as pdf:
+		plt.plot([min_imb, max_imb], [baseline_time, baseline_time], color='silver', label='Perfect balance') #, marker='o')
+		for xx, yy, label in points:
+			plt.scatter(xx, yy, label = label)
+
+		plt.title(f'Appranks {appranks} policy {policy}')
+		plt.xlabel('Imbalance')
+		plt.ylabel('Execution time (s)')
+		plt.xlim(min_imb, max_imb)
+		plt.ylim(0,maxyy)
+
+		# Order legend to put the perfect balance (which was plotted first, so has index 0) last
+		handles, labels = plt.gca().get_legend_handles_labels()
+		n = len(handles)
+		order = list(range(1,n)) + [0] # List of indices according to original order
+		plt.legend([handles[idx] for idx in order], [labels[idx] for idx in order], loc='best')
+
+		pdf.savefig()
+		plt.close()
+
+
 def generate_plots(results, output_prefix_str):
+	import_plotting()
 
 	# Keep only results for correct executable
-	results = [ (r,times) for (r,times) in results if r['executable'] == 'build/syntheticslownord']
+	results = results.select(executable='build/syntheticslownord')
+	results = results.derive('iter_num', 'iter', int)
 	# print(results)
 
 	policies = get_values(results, 'policy')
@@ -90,7 +118,7 @@ def generate_plots(results, output_prefix_str):
 	print(f'degrees {degrees}')
 	print(f'apprankss {apprankss}')
 
-	all_iters = [int(x) for x in get_values(results, 'iter')]
+	all_iters = get_values(results, 'iter_num')
 	if len(all_iters) == 0:
 		# No synthetic results collected
 		return
@@ -98,58 +126,45 @@ def generate_plots(results, output_prefix_str):
 
 	baseline_time = 5
 
+	by_appranks = results.index(['appranks'])
+	last_iter_index = results.index(['appranks', 'degree', 'lewi', 'drom', 'policy', 'iter_num'])
+
 	# Generate plot as function of memory
 	maxyy = 1
 	for appranks in apprankss:
 		for policy in policies:
 		
-			with PdfPages('output/%ssynthetic-slownord-%d-%s.pdf' % (output_prefix_str,appranks,policy)) as pdf:
-
-				# Draw perfect balance line
-				min_imb = min([float(r['imb']) for (r,times) in results if r['appranks'] == appranks])
-				max_imb = max([float(r['imb']) for (r,times) in results if r['appranks'] == appranks])
-				print(min_imb, max_imb, baseline_time)
-				plt.plot([min_imb, max_imb], [baseline_time, baseline_time], color='silver', label='Perfect balance') #, marker='o')
-
-				for degree in degrees:
-					lewi = 'true'
-					drom = 'true'
-					if degree == 1:
-						lcl_policies = ['local', 'global'] # Combine both, if happen to have been run
-					else:
-						lcl_policies = [policy]
-					curr = [ (r,times) for (r,times) in results \
-								if r['appranks'] == appranks \
-								   and r['degree'] == degree \
-								   and r['lewi'] == lewi \
-								   and r['drom'] == drom \
-								   and r['policy'] in lcl_policies \
-								   and int(r['iter']) == niters-1]
-					xx = [float(r['imb']) for (r,times) in curr] # x is imbalance
-					yy = [times for (r,times) in curr]
-					xx,yy = split_by_times(xx, yy)
-					if len(xx) > 0:
-						maxyy = max(maxyy, max(yy))
-
-						print(f'appranks {appranks} policy {policy} degree {degree}')
-						print('xx =', xx)
-						print('yy =', yy)
-						plt.scatter(xx, yy, label = f'degree {degree}')
-
-				plt.title(f'Appranks {appranks} policy {policy}')
-				plt.xlabel('Imbalance')
-				plt.ylabel('Execution time (s)')
-				plt.xlim(min_imb, max_imb)
-				plt.ylim(0,maxyy)
-
-				# Order legend to put the perfect balance (which was plotted first, so has index 0) last
-				handles, labels = plt.gca().get_legend_handles_labels()
-				n = len(handles)
-				order = list(range(1,n)) + [0] # List of indices according to original order
-				plt.legend([handles[idx] for idx in order], [labels[idx] for idx in order], loc='best')
-
-				pdf.savefig()
-				plt.close()
+			# Draw perfect balance line
+			imbs = [float(imb) for imb in by_appranks.get(appranks=appranks).column('imb')]
+			min_imb = min(imbs)
+			max_imb = max(imbs)
+			print(min_imb, max_imb, baseline_time)
+
+			points = []
+			for degree in degrees:
+				lewi = 'true'
+				drom = 'true'
+				if degree == 1:
+					lcl_policies = ['local', 'global'] # Combine both, if happen to have been run
+				else:
+					lcl_policies = [policy]
+				curr = last_iter_index.get(appranks=appranks, degree=degree, lewi=lewi, drom=drom,
+										   policy=lcl_policies, iter_num=niters-1)
+				xx = [float(imb) for imb in curr.column('imb')] # x is imbalance
+				yy = curr.time_lists()
+				xx,yy = split_by_times(xx, yy)
+				if len(xx) > 0:
+					maxyy = max(maxyy, max(yy))
+
+					print(f'appranks {appranks} policy {policy} degree {degree}')
+					print('xx =', xx)
+					print('yy =', yy)
+					points.append((xx, yy, f'degree {degree}'))
+
+			# The y limit covers all the figures so far
+			plotpool.figure('output/%ssynthetic-slownord-%d-%s.pdf' % (output_prefix_str,appranks,policy), plot_scatter,
+							points, appranks, policy, min_imb, max_imb, baseline_time, maxyy)
+
 
 
 
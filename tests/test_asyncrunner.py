@@ -0,0 +1,71 @@
+#! /usr/bin/env python
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import asyncrunner
+
+class RunCommandTest(unittest.TestCase):
+	def setUp(self):
+		self.folder = tempfile.mkdtemp()
+		self.output = os.path.join(self.folder, 'x.txt')
+
+	def tearDown(self):
+		shutil.rmtree(self.folder)
+
+	def read(self, filename):
+		with open(filename) as fp:
+			return fp.read()
+
+	def test_output_and_log(self):
+		status, secs, rusage, timed_out = asyncrunner.run('sh -c "echo one; echo two >&2; echo three"', self.output)
+		self.assertEqual((status, timed_out), (0, False))
+		self.assertEqual(self.read(self.output), 'one\nthree\n')
+		log = self.read(asyncrunner.log_name(self.output)).split('\n')
+		self.assertEqual(sorted([line.split(None, 1)[1] for line in log if line != '']),
+						 ['err two', 'out one', 'out three'])
+		self.assertIn('maxrss_kb', rusage)
+
+	def test_exit_status(self):
+		status, secs, rusage, timed_out = asyncrunner.run('sh -c "exit 3"', self.output)
+		self.assertEqual((status, timed_out), (3, False))
+
+	def test_signal(self):
+		status, secs, rusage, timed_out = asyncrunner.run('sh -c "kill -9 $$"', self.output)
+		self.assertEqual((status, timed_out), (-9, False))
+
+	def test_not_found(self):
+		status, secs, rusage, timed_out = asyncrunner.run('./no-such-command --flag', self.output)
+		self.assertEqual((status, rusage, timed_out), (asyncrunner.not_found_status, None, False))
+		self.assertIn('Cannot run ./no-such-command', self.read(asyncrunner.log_name(self.output)))
+
+	def test_timeout(self):
+		status, secs, rusage, timed_out = asyncrunner.run('sh -c "echo started; sleep 30"', self.output, timeout=0.5)
+		self.assertEqual((status, timed_out), (asyncrunner.timeout_status, True))
+		self.assertLess(secs, 10)
+		lines = self.read(self.output).split('\n')
+		self.assertEqual(lines[0], 'started')
+		self.assertTrue(lines[1].startswith(asyncrunner.timed_out_prefix))
+
+	def test_exit_124_is_not_a_timeout(self):
+		status, secs, rusage, timed_out = asyncrunner.run('sh -c "exit 124"', self.output, timeout=30)
+		self.assertEqual((status, timed_out), (124, False))
+		self.assertNotIn(asyncrunner.timed_out_prefix, self.read(self.output))
+
+	def test_on_line_stops(self):
+		seen = []
+		def on_line(line, secs):
+			seen.append(line)
+			return line == b'3'
+		status, secs, rusage, timed_out = asyncrunner.run('sh -c "for i in 1 2 3 4 5; do echo $i; sleep 0.2; done; sleep 30"',
+														  self.output, on_line=on_line)
+		self.assertEqual((status, timed_out), (0, False))
+		self.assertEqual(seen, [b'1', b'2', b'3'])
+		self.assertLess(secs, 10)
+		self.assertTrue(self.read(self.output).split('\n')[3].startswith(asyncrunner.stopped_prefix))
+
+if __name__ == '__main__':
+	unittest.main()
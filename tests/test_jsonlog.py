@@ -0,0 +1,37 @@
+#! /usr/bin/env python
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import jsonlog
+
+class JsonLogTest(unittest.TestCase):
+	def setUp(self):
+		self.folder = tempfile.mkdtemp()
+		self.filename = os.path.join(self.folder, 'x.jsonl')
+
+	def tearDown(self):
+		shutil.rmtree(self.folder)
+
+	def test_append_and_read(self):
+		self.assertEqual(jsonlog.read(self.filename), [])
+		jsonlog.append(self.filename, [{'a': 1}])
+		jsonlog.append(self.filename, [{'b': [2, 3]}, {'c': None}])
+		self.assertEqual(jsonlog.read(self.filename), [{'a': 1}, {'b': [2, 3]}, {'c': None}])
+
+	def test_partly_written_line(self):
+		jsonlog.append(self.filename, [{'a': 1}])
+		with open(self.filename, 'a') as fp:
+			fp.write('{"b": ')
+		self.assertEqual(jsonlog.read(self.filename), [{'a': 1}])
+
+	def test_exclusive(self):
+		self.assertTrue(jsonlog.append(self.filename, [{'a': 1}], exclusive=True))
+		self.assertFalse(jsonlog.append(self.filename, [{'b': 2}], exclusive=True))
+		self.assertEqual(jsonlog.read(self.filename), [{'a': 1}])
+
+if __name__ == '__main__':
+	unittest.main()
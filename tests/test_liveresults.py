@@ -0,0 +1,65 @@
+#! /usr/bin/env python
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import runplan
+import runindex
+import manifest
+import liveresults
+from test_runindex import fake_run, result_lines
+
+class PlanStatesTest(unittest.TestCase):
+	def setUp(self):
+		self.cwd = os.getcwd()
+		self.folder = tempfile.mkdtemp()
+		os.chdir(self.folder)
+		os.makedirs(runindex.index_dir)
+		self.plan = [runplan.PlanEntry('bestdegree', 2, f'runhybrid.py --local build/bestdegree {k}') for k in range(5)]
+
+	def tearDown(self):
+		os.chdir(self.cwd)
+		shutil.rmtree(self.folder)
+
+	def test_agrees_with_resume(self):
+		done, failed, running, no_results, never_run = self.plan
+		fake_run(done, result_lines(12), 0)
+		fake_run(failed, result_lines(12), 1)
+		fake_run(running, result_lines(5), None)
+		fake_run(no_results, ['Error: no results'], 0)
+		states = liveresults.plan_states(self.plan)
+		self.assertEqual([states[entry.hash] for entry in self.plan], ['done', 'failed', 'running', 'failed', 'to run'])
+		todo, num_done, num_rerun = runindex.remaining(self.plan)
+		self.assertEqual(set([entry.hash for entry in todo]),
+						 set([h for h, state in states.items() if state != 'done']))
+
+	def test_reads_no_job_output(self):
+		done, failed = self.plan[:2]
+		outputs = [fake_run(done, result_lines(12), 0), fake_run(failed, result_lines(12), 1)]
+		# Only the index and the manifests are read
+		for output in outputs:
+			os.remove(output)
+		states = liveresults.plan_states(self.plan)
+		self.assertEqual([states[entry.hash] for entry in self.plan[:2]], ['done', 'failed'])
+
+	def test_ingester(self):
+		entry = runplan.PlanEntry('bestdegree', 2, 'runhybrid.py --local build/bestdegree',
+								  params={'policy': 'local', 'drom': 'true', 'lewi': 'true'})
+		output = os.path.join(runindex.index_dir, f'interactive_bestdegree_2_{runindex.new_run_id()}.txt')
+		data = manifest.started(output, entry, entry.command, 'node[1-2]', '.hybrid/x')
+		ingester = liveresults.Ingester(output, data)
+		ingester.line(b'Rank 0 gets 12 cores', 0.5)
+		ingester.line(b'# build/bestdegree appranks=4 deg=2 : iter=3 imb=1.500 time=0.54 sec', 1.25)
+		results = liveresults.read_results()
+		self.assertEqual(len(results), 1)
+		r = results[0]
+		self.assertEqual((r['hash'], r['run_id'], r['policy'], r['appranks'], r['degree']),
+						 (entry.hash, runindex.run_id(output), 'local', 4, 2))
+		self.assertEqual((r['args'], r['time'], r['unit'], r['elapsed']),
+						 ({'iter': '3', 'imb': '1.500'}, 0.54, 'sec', 1.25))
+
+if __name__ == '__main__':
+	unittest.main()
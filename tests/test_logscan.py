@@ -0,0 +1,96 @@
+#! /usr/bin/env python
+import os
+import sys
+import io
+import re
+import shutil
+import tempfile
+import contextlib
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import logscan
+
+# The job output parser as it was before logscan.py: every regex on every
+# line
+def baseline_file_results(fullname):
+	re_result = re.compile('# ([-a-zA-Z0-9./_]*) appranks=([1-9][0-9]*) deg=([1-9][0-9]*) (.*) time=([0-9.]*) (sec|ms)')
+	re_experiment = re.compile('Experiment vranks: ([1-9][0-9]*) nodes: ([1-9][0-9]*) deg: ([1-9][0-9]*)')
+	results = []
+	with open(fullname) as fp:
+		command = fp.readline()
+		drom = re.search('dlb.enable_drom=(true|false)', command).group(1)
+		lewi = re.search('dlb.enable_lewi=(true|false)', command).group(1)
+		policy = re.search(' --(local|global)', command).group(1)
+		numnodes = None
+		for line in fp.readlines():
+			m = re_experiment.match(line)
+			if m:
+				numnodes = int(m.group(2))
+			m = re_result.match(line)
+			if m:
+				r = {}
+				r['executable'] = m.group(1)
+				r['appranks'] = int(m.group(2))
+				r['degree'] = int(m.group(3))
+				params = tuple(m.group(4).split())
+				for p in params:
+					if '=' in p:
+						p2 = p.split('=')
+						r[p2[0]] = p2[1]
+				r['params'] = params
+				r['lewi'] = lewi
+				r['drom'] = drom
+				r['policy'] = policy
+				r['fullname'] = fullname
+				r['numnodes'] = numnodes
+				results.append((r, float(m.group(5))))
+	return results
+
+command = ('runhybrid.py --hybrid-directory .hybrid/x --debug false --vranks 4 --local --degree 2 --monitor 20 '
+		   '--config-override dlb.enable_drom=true,dlb.enable_lewi=true build/bestdegree\n')
+
+# A job output with the runtime's chatter around the lines that matter
+def job_output(num_iters):
+	lines = [command, 'Experiment vranks: 4 nodes: 2 deg: 2\n']
+	for it in range(num_iters):
+		lines.append('Rank 0 gets 12 cores\n')
+		lines.append('# not a result line\n')
+		lines.append('Work per rank: 1 2 3 4\n')
+		for rank in range(2):
+			end = '\r\n' if it % 7 == 3 else '\n'
+			lines.append(f'# build/bestdegree appranks=4 deg=2 rank={rank} : iter={it} imb=1.500 time={1 + it % 10 / 10.0:.2f} sec{end}')
+		if it % 5 == 0:
+			lines.append('mv TRACE.mpits trace/x\n')
+	lines.append('Exit status: 0\n')
+	return ''.join(lines)
+
+class ScannerTest(unittest.TestCase):
+	def setUp(self):
+		self.folder = tempfile.mkdtemp()
+		self.fullname = os.path.join(self.folder, 'interactive2_20240101_10-00-00_0123abcd.txt')
+		with open(self.fullname, 'w', newline='') as fp:
+			fp.write(job_output(200))
+		self.saved = (logscan.mmap_threshold, logscan.chunk_size)
+
+	def tearDown(self):
+		logscan.mmap_threshold, logscan.chunk_size = self.saved
+		shutil.rmtree(self.folder)
+
+	def scan(self):
+		with contextlib.redirect_stdout(io.StringIO()):
+			return list(logscan.iter_file_results(self.fullname))
+
+	def test_matches_regex_parser(self):
+		expected = baseline_file_results(self.fullname)
+		self.assertEqual(len(expected), 400)
+		self.assertEqual(self.scan(), expected)
+
+	def test_memory_mapped_chunks(self):
+		# Chunks that split lines anywhere
+		logscan.mmap_threshold = 0
+		logscan.chunk_size = 97
+		self.assertEqual(self.scan(), baseline_file_results(self.fullname))
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,77 @@
+#! /usr/bin/env python
+import os
+import sys
+import random
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import runplan
+import runindex
+import repeatplan
+from test_runindex import fake_run
+
+def result_lines(time, num_iters=12):
+	return [f'# build/bestdegree appranks=4 deg=1 : iter={it} time={time:.3f} sec' for it in range(num_iters)]
+
+class NeedsRepeatTest(unittest.TestCase):
+	def test_min_repeats(self):
+		self.assertTrue(repeatplan.needs_repeat([], 0))
+		self.assertTrue(repeatplan.needs_repeat([1.0, 1.0], 2))
+		self.assertFalse(repeatplan.needs_repeat([1.0, 1.0, 1.0], 3))
+
+	def test_precise_enough(self):
+		self.assertFalse(repeatplan.needs_repeat([1.00, 1.01, 0.99], 3))
+		self.assertTrue(repeatplan.needs_repeat([1.0, 1.5, 0.6], 3))
+
+	def test_max_repeats(self):
+		# Failed runs count towards the limit too
+		noisy = [1.0, 1.5, 0.6]
+		self.assertTrue(repeatplan.needs_repeat(noisy, repeatplan.max_repeats - 1))
+		self.assertFalse(repeatplan.needs_repeat(noisy, repeatplan.max_repeats))
+		self.assertFalse(repeatplan.needs_repeat([], repeatplan.max_repeats))
+
+	def test_rel_halfwidth(self):
+		self.assertIsNone(repeatplan.rel_halfwidth([1.0]))
+		self.assertEqual(repeatplan.rel_halfwidth([2.0, 2.0, 2.0]), 0.0)
+		# t(1) * std / sqrt(2) / mean with std = sqrt(2)
+		self.assertAlmostEqual(repeatplan.rel_halfwidth([1.0, 3.0]), 12.706 / 2.0)
+
+class NextRoundTest(unittest.TestCase):
+	def setUp(self):
+		self.cwd = os.getcwd()
+		self.folder = tempfile.mkdtemp()
+		os.chdir(self.folder)
+		os.makedirs(runindex.index_dir)
+		repeatplan.samples_cache.clear()
+		self.plan = [runplan.PlanEntry('bestdegree', 2, f'runhybrid.py --local build/bestdegree {k}') for k in range(4)]
+
+	def tearDown(self):
+		os.chdir(self.cwd)
+		shutil.rmtree(self.folder)
+
+	def test_rounds(self):
+		precise, noisy, failing, few = self.plan
+		for time in [1.00, 1.01, 0.99]:
+			fake_run(precise, result_lines(time), 0)
+		for time in [1.0, 1.5, 0.6]:
+			fake_run(noisy, result_lines(time), 0)
+		for k in range(repeatplan.max_repeats):
+			fake_run(failing, ['Error'], 1)
+		fake_run(few, result_lines(1.0), 0)
+		samples, num_runs = repeatplan.read_samples()
+		self.assertEqual(len(samples[precise.hash]), 3)
+		self.assertNotIn(failing.hash, samples)
+		self.assertEqual(num_runs[failing.hash], repeatplan.max_repeats)
+		repeats = repeatplan.next_round(self.plan, random.Random(1))
+		self.assertEqual(sorted([entry.hash for entry in repeats]), sorted([noisy.hash, few.hash]))
+		# Once every run is precise enough or at the limit, the rounds stop
+		for k in range(2):
+			fake_run(few, result_lines(1.0), 0)
+		for k in range(repeatplan.max_repeats - 3):
+			fake_run(noisy, result_lines(1.0 + 0.5 * (k % 2)), 0)
+		self.assertEqual(repeatplan.next_round(self.plan, random.Random(1)), [])
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,92 @@
+#! /usr/bin/env python
+import os
+import sys
+import copy
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from resulttable import ResultTable, StreamingAggregator, group_by
+
+# averaged_results as it was before the ResultTable: the results that
+# differ only in fullname are averaged, with the fullname of the first
+def baseline_averaged_results(results):
+	times = {}
+	seen_excl_fullname = {}
+	for r,time in results:
+		r2 = copy.deepcopy(r)
+		del r2['fullname']
+		key_seen = tuple(sorted(r2.items()))
+		if key_seen in seen_excl_fullname:
+			r2['fullname'] = seen_excl_fullname[key_seen]
+		else:
+			r2['fullname'] = r['fullname']
+			seen_excl_fullname[key_seen] = r['fullname']
+		key = tuple(sorted(r2.items()))
+		if not key in times:
+			times[key] = []
+		times[key].append(time)
+	avg = []
+	for key,timelist in times.items():
+		avg.append( (dict(key), timelist) )
+	return avg
+
+def make_result(fullname, appranks, degree, policy, it, imb=None):
+	params = ['10', '480', ':', f'iter={it}']
+	r = {'executable': 'build/bestdegree', 'appranks': appranks, 'degree': degree}
+	if not imb is None:
+		params.insert(3, f'imb={imb}')
+		r['imb'] = imb
+	r['iter'] = str(it)
+	r['params'] = tuple(params)
+	r['lewi'] = 'true'
+	r['drom'] = 'true' if degree > 1 else 'false'
+	r['policy'] = policy
+	r['fullname'] = fullname
+	r['numnodes'] = appranks // 2
+	return r
+
+# Results from three job outputs, two of them repeats of the same runs,
+# with a field (imb) that only some results have
+def make_results():
+	results = []
+	k = 0
+	for fullname in ['jobs/a.txt', 'jobs/b.txt', 'jobs/c.txt']:
+		for appranks in [4, 8]:
+			for degree in [1, 2]:
+				for policy in ['local', 'global']:
+					if fullname == 'jobs/c.txt' and policy == 'global':
+						continue
+					for it in range(3):
+						imb = '1.500' if degree == 2 else None
+						results.append((make_result(fullname, appranks, degree, policy, it, imb), 0.5 + 0.01 * k))
+						k += 1
+	return results
+
+class GroupByTest(unittest.TestCase):
+	def test_matches_baseline(self):
+		results = make_results()
+		expected = baseline_averaged_results(results)
+		grouped = group_by(ResultTable.from_records(results), exclude=('fullname',))
+		self.assertEqual(len(grouped), len(expected))
+		for i, (r, times) in enumerate(expected):
+			self.assertEqual(grouped.row(i), r)
+			self.assertEqual(grouped.times_of(i), times)
+
+	def test_streaming_matches_group_by(self):
+		results = make_results()
+		grouped = group_by(ResultTable.from_records(results), exclude=('fullname',))
+		aggregator = StreamingAggregator(exclude=('fullname',))
+		aggregator.extend(results)
+		streamed = aggregator.table()
+		self.assertEqual(len(streamed), len(grouped))
+		for i in range(len(grouped)):
+			self.assertEqual(streamed.row(i), grouped.row(i))
+		self.assertEqual(streamed.counts().tolist(), grouped.counts().tolist())
+		for a, b in zip(streamed.means().tolist(), grouped.means().tolist()):
+			self.assertAlmostEqual(a, b)
+
+	def test_empty(self):
+		self.assertEqual(len(group_by(ResultTable.from_records([]))), 0)
+
+if __name__ == '__main__':
+	unittest.main()
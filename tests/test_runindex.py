@@ -0,0 +1,130 @@
+#! /usr/bin/env python
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import runplan
+import runindex
+import manifest
+import logscan
+
+def result_lines(num_iters):
+	return [f'# build/bestdegree appranks=4 deg=1 : iter={it} time=1.00 sec' for it in range(num_iters)]
+
+# Run a plan entry the way the runner does, with a fake command that
+# writes lines and ends with status. If status is None, the run is cut
+# short (no end in the index).
+def fake_run(entry, lines, status):
+	output = os.path.join(runindex.index_dir, f'interactive_bestdegree_2_{runindex.new_run_id()}.txt')
+	runindex.create()
+	with open(output, 'w') as fp:
+		print(entry.command, file=fp)
+	data = manifest.started(output, entry, entry.command, 'node[1-2]', '.hybrid/x')
+	runindex.started(entry, output)
+	progress = logscan.Progress()
+	with open(output, 'a') as fp:
+		for line in lines:
+			print(line, file=fp)
+			progress.line(line.encode(), 0.0)
+	if not status is None:
+		manifest.finished(output, data, status, progress=progress)
+		runindex.finished(entry, output, status, 1.0)
+	return output
+
+class ResumeTest(unittest.TestCase):
+	def setUp(self):
+		self.cwd = os.getcwd()
+		self.folder = tempfile.mkdtemp()
+		os.chdir(self.folder)
+		os.makedirs(runindex.index_dir)
+		self.plan = [runplan.PlanEntry('bestdegree', 2, f'runhybrid.py --local build/bestdegree {k}') for k in range(6)]
+
+	def tearDown(self):
+		os.chdir(self.cwd)
+		shutil.rmtree(self.folder)
+
+	def test_skips_completed(self):
+		done, failed, cut_short, no_results, truncated, never_run = self.plan
+		fake_run(done, result_lines(12), 0)
+		fake_run(failed, result_lines(12), 1)
+		fake_run(cut_short, result_lines(5), None)
+		fake_run(no_results, ['Error: no results'], 0)
+		output = fake_run(truncated, result_lines(12), 0)
+		# The output lost its final iteration after the command ended
+		with open(output) as fp:
+			lines = fp.read().split('\n')
+		with open(output, 'w') as fp:
+			fp.write('\n'.join([line for line in lines if not 'iter=11 ' in line]))
+		todo, num_done, num_rerun = runindex.remaining(self.plan)
+		self.assertEqual([entry.hash for entry in todo],
+						 [entry.hash for entry in [failed, cut_short, no_results, truncated, never_run]])
+		self.assertEqual(num_done, 1)
+		self.assertEqual(num_rerun, 4)
+
+	def test_later_run_completes(self):
+		entry = self.plan[0]
+		fake_run(entry, result_lines(12), 1)
+		fake_run(entry, result_lines(12), 0)
+		todo, num_done, num_rerun = runindex.remaining([entry])
+		self.assertEqual((todo, num_done, num_rerun), ([], 1, 0))
+
+	def test_output_without_progress(self):
+		# Manifests written before the progress was recorded only need a
+		# result and exit status 0
+		entry = self.plan[0]
+		output = fake_run(entry, result_lines(3), 0)
+		data = manifest.read(output)
+		for name in ['results', 'last_iteration', 'complete']:
+			del data[name]
+		manifest.write(output, data)
+		self.assertTrue(runindex.output_complete(output))
+
+	def test_manifest_progress(self):
+		output = fake_run(self.plan[0], result_lines(12), 0)
+		data = manifest.read(output)
+		self.assertEqual((data['results'], data['last_iteration'], data['complete'], data['series']), (12, 11, True, 1))
+		self.assertTrue(runindex.output_complete(output))
+
+	def test_expected_series(self):
+		entry = self.plan[0]
+		self.assertIsNone(runindex.expected_series(entry.hash))
+		fake_run(entry, result_lines(5), 1)
+		self.assertIsNone(runindex.expected_series(entry.hash))
+		lines = [line.replace(' :', f' imb={imb} :') for imb in ['1.0', '1.5'] for line in result_lines(10)]
+		fake_run(entry, lines, 0)
+		self.assertEqual(runindex.expected_series(entry.hash), 2)
+
+class LegacyTest(unittest.TestCase):
+	def setUp(self):
+		self.cwd = os.getcwd()
+		self.folder = tempfile.mkdtemp()
+		os.chdir(self.folder)
+		os.makedirs(runindex.index_dir)
+
+	def tearDown(self):
+		os.chdir(self.cwd)
+		shutil.rmtree(self.folder)
+
+	def test_first_run_not_legacy(self):
+		legacy = 'interactive_bestdegree_2_20200101_10-00-00.txt'
+		open(os.path.join(runindex.index_dir, legacy), 'w').close()
+		# The first run in the folder creates the index
+		entry = runplan.PlanEntry('bestdegree', 2, 'runhybrid.py --local build/bestdegree')
+		output = fake_run(entry, result_lines(3), 0)
+		events = [(e['event'], e['output']) for e in runindex.read_index()]
+		self.assertEqual(events, [('legacy', legacy), ('start', os.path.basename(output)), ('end', os.path.basename(output))])
+		self.assertEqual(runindex.runs(runindex.index_dir),
+						 [os.path.join(runindex.index_dir, legacy), output])
+
+	def test_claimed_output_not_legacy(self):
+		# An output claimed by another job before the index was created
+		claimed = f'interactive_bestdegree_2_{runindex.new_run_id()}.txt'
+		open(os.path.join(runindex.index_dir, claimed), 'w').close()
+		runindex.create()
+		self.assertEqual(runindex.read_index(), [])
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,58 @@
+#! /usr/bin/env python
+import os
+import sys
+import random
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import runplan
+
+def make_plan(times):
+	return [runplan.PlanEntry('synthetic', 2, f'build/synthetic {k}', est_secs) for k, est_secs in enumerate(times)]
+
+def bin_secs(b):
+	return sum([entry.est_secs for entry in b])
+
+class PackBinsTest(unittest.TestCase):
+	def check_bins(self, plan, bins, max_secs):
+		# Every command once, each bin in plan order and within max_secs
+		# unless it is a single longer command
+		packed = [entry.hash for b in bins for entry in b]
+		self.assertEqual(sorted(packed), sorted([entry.hash for entry in plan]))
+		order = [entry.hash for entry in plan]
+		for b in bins:
+			hashes = [entry.hash for entry in b]
+			self.assertEqual(hashes, [h for h in order if h in hashes])
+			if len(b) > 1:
+				self.assertLessEqual(bin_secs(b), max_secs)
+
+	def test_first_fit_decreasing(self):
+		plan = make_plan([300, 700, 200, 500, 400, 100])
+		bins = runplan.pack_bins(plan, 1000)
+		self.check_bins(plan, bins, 1000)
+		# 700+300, 500+400+100, 200
+		self.assertEqual(sorted([bin_secs(b) for b in bins]), [200, 1000, 1000])
+
+	def test_long_command(self):
+		plan = make_plan([5000, 100, 200])
+		bins = runplan.pack_bins(plan, 1000)
+		self.check_bins(plan, bins, 1000)
+		self.assertEqual(len(bins), 2)
+		self.assertIn([plan[0]], bins)
+
+	def test_random(self):
+		rng = random.Random(1)
+		for trial in range(50):
+			plan = make_plan([rng.randint(1, 900) for k in range(rng.randint(0, 40))])
+			bins = runplan.pack_bins(plan, 1000)
+			self.check_bins(plan, bins, 1000)
+			# First fit leaves no two bins that would fit in one
+			totals = sorted([bin_secs(b) for b in bins])
+			if len(totals) >= 2:
+				self.assertGreater(totals[0] + totals[1], 1000)
+
+	def test_empty(self):
+		self.assertEqual(runplan.pack_bins([], 1000), [])
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,108 @@
+#! /usr/bin/env python
+import os
+import sys
+import random
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import steadystate
+
+# num_warmup slow times, then num_steady times around 1.0
+def warmup_series(num_warmup, num_steady, seed=1, noise=0.01):
+	rng = random.Random(seed)
+	warmup = [3.0 - 2.0 * k / num_warmup for k in range(num_warmup)]
+	return warmup + [1.0 + rng.uniform(-noise, noise) for k in range(num_steady)]
+
+class MserTest(unittest.TestCase):
+	def test_no_warmup(self):
+		self.assertEqual(steadystate.mser([1.0] * 20), 0)
+
+	def test_step(self):
+		self.assertEqual(steadystate.mser([5.0] * 4 + [1.0] * 16), 4)
+
+	def test_at_most_half(self):
+		# All decreasing: the warm-up is never more than half of the batches
+		self.assertLessEqual(steadystate.mser([float(20 - k) for k in range(20)]), 10)
+
+class TruncationPointTest(unittest.TestCase):
+	def test_short_series_fallback(self):
+		# Too few values to find the warm-up: the first 67%, as the plots
+		# did before, but always leaving a value
+		self.assertEqual([steadystate.truncation_point([1.0] * n) for n in range(10)],
+						 [0, 0, 1, 2, 3, 4, 5, 5, 6, 7])
+		self.assertEqual(steadystate.truncation_point([1.0] * 9, 0.25), 3)
+		self.assertEqual(steadystate.steady_values([4.0, 3.0, 2.0, 1.0], 0.25), [3.0, 2.0, 1.0])
+
+	def test_single_values(self):
+		# Below 2 * batch_size * min_batches values, batches of one
+		values = warmup_series(6, 30)
+		self.assertEqual(steadystate.truncation_point(values), 6)
+
+	def test_batches(self):
+		values = warmup_series(25, 200)
+		point = steadystate.truncation_point(values)
+		self.assertEqual(point % steadystate.batch_size, 0)
+		self.assertTrue(25 <= point <= 30)
+		self.assertTrue(all([v < 1.02 for v in steadystate.steady_values(values)]))
+
+class ConvergedTest(unittest.TestCase):
+	def test_converged(self):
+		self.assertTrue(steadystate.converged(warmup_series(10, 100)))
+		# The 10 iterations that the benchmarks run are enough
+		self.assertTrue(steadystate.converged(warmup_series(2, 8)))
+		self.assertFalse(steadystate.converged(warmup_series(2, 3)))
+		self.assertFalse(steadystate.converged(warmup_series(10, 100, noise=0.5)))
+
+	def test_steady_mean(self):
+		mean, halfwidth = steadystate.steady_mean(warmup_series(10, 100))
+		self.assertAlmostEqual(mean, 1.0, places=2)
+		self.assertLess(halfwidth, 0.01)
+
+	def monitor_stop(self, a, b, num_series=2):
+		monitor = steadystate.Monitor(num_series)
+		for k in range(len(a)):
+			monitor.add('a', a[k])
+			if monitor.add('b', b[k]):
+				self.assertTrue(monitor.stopped)
+				return k
+		return None
+
+	def test_monitor_stops_once_every_series_converged(self):
+		fast = warmup_series(10, 200, seed=2)
+		self.assertIsNotNone(self.monitor_stop(fast, warmup_series(10, 200, seed=3)))
+		# A noisy series keeps the monitor going
+		self.assertIsNone(self.monitor_stop(fast, warmup_series(10, 200, seed=3, noise=0.5)))
+		# Without the number of series, it never stops
+		self.assertIsNone(self.monitor_stop(fast, warmup_series(10, 200, seed=3), None))
+
+	def sweep_lines(self, imbalances):
+		# One process that runs 10 iterations of each imbalance in turn, as
+		# bestdegree does
+		for imb in imbalances:
+			for k, v in enumerate(warmup_series(2, 8, seed=int(imb * 10))):
+				yield f'# build/bestdegree appranks=4 deg=2 : iter={k} imb={imb:.3f} time={v:.4f} sec'.encode()
+
+	def test_monitor_sweep(self):
+		imbalances = [1.0, 1.5, 2.0]
+		lines = list(self.sweep_lines(imbalances))
+		# First run: the number of series is not known, so it is not stopped
+		monitor = steadystate.Monitor()
+		self.assertFalse(any([monitor.line(line, 0.0) for line in lines]))
+		# A later run stops only once the last imbalance has converged too
+		monitor = steadystate.Monitor(len(imbalances))
+		stops = [monitor.line(line, 0.0) for line in lines]
+		self.assertEqual(stops.index(True), len(lines) - 1)
+
+	def test_monitor_lines(self):
+		monitor = steadystate.Monitor(2)
+		values = warmup_series(10, 100)
+		for k, v in enumerate(values):
+			for rank in range(2):
+				line = f'# build/bestdegree appranks=4 deg=1 rank={rank} : iter={k} time={v:.4f} sec'.encode()
+				stop = monitor.line(line, 0.0)
+		self.assertEqual(len(monitor.series), 2)
+		self.assertTrue(stop)
+		self.assertFalse(steadystate.Monitor(2).line(b'Rank 0 gets 12 cores', 0.0))
+
+if __name__ == '__main__':
+	unittest.main()
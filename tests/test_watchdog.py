@@ -0,0 +1,55 @@
+#! /usr/bin/env python
+import os
+import sys
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import runplan
+import watchdog
+
+def make_entry(est_secs, est_known):
+	return runplan.PlanEntry('synthetic', 2, 'build/synthetic', est_secs, est_known)
+
+class DeadlineTest(unittest.TestCase):
+	def setUp(self):
+		self.saved = (watchdog.timeout_factor, os.environ.get('SLURM_JOB_END_TIME'))
+		os.environ.pop('SLURM_JOB_END_TIME', None)
+
+	def tearDown(self):
+		watchdog.timeout_factor, end = self.saved
+		if not end is None:
+			os.environ['SLURM_JOB_END_TIME'] = end
+
+	def test_no_estimate(self):
+		# Never run and no guess: no deadline and no retry
+		entry = make_entry(0, False)
+		self.assertIsNone(watchdog.deadline_secs(entry))
+		self.assertFalse(watchdog.can_retry(entry, 0, 0))
+
+	def test_history(self):
+		self.assertEqual(watchdog.deadline_secs(make_entry(1000, True)), 2000)
+		self.assertEqual(watchdog.deadline_secs(make_entry(10, True)), watchdog.min_timeout_secs)
+
+	def test_guess(self):
+		# A small guess such as nbody's 60 secs is not enough to kill a run
+		self.assertEqual(watchdog.deadline_secs(make_entry(60, False)), watchdog.min_guess_timeout_secs)
+		self.assertEqual(watchdog.deadline_secs(make_entry(4 * 3600, False)), 4 * 3600 * 6)
+
+	def test_disabled(self):
+		watchdog.timeout_factor = 0
+		self.assertIsNone(watchdog.deadline_secs(make_entry(1000, True)))
+
+	def test_can_retry(self):
+		entry = make_entry(1000, True)
+		self.assertTrue(watchdog.can_retry(entry, 0, 0))
+		self.assertFalse(watchdog.can_retry(entry, watchdog.max_retries, 0))
+		os.environ['SLURM_JOB_END_TIME'] = str(int(time.time()) + 1000)
+		self.assertFalse(watchdog.can_retry(entry, 0, 0))
+		os.environ['SLURM_JOB_END_TIME'] = str(int(time.time()) + 10000)
+		self.assertTrue(watchdog.can_retry(entry, 0, 0))
+		self.assertFalse(watchdog.can_retry(entry, 0, 8000))
+		del os.environ['SLURM_JOB_END_TIME']
+
+if __name__ == '__main__':
+	unittest.main()
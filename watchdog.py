@@ -0,0 +1,58 @@
+#! /usr/bin/env python
+import os
+import time
+
+# Watchdog for the commands of the run plan, so that one hung command
+# (e.g. deadlocked offloading or a dead node) does not use up the rest of
+# the allocation. Each command gets a deadline from its estimated time
+# (from the runtime history, see runtimes.py, or else the benchmark's own
+# guess). A command with neither has no deadline. A command still running at its deadline has its process group
+# killed, its output is tagged as timed out, and it is run again after a
+# back-off, up to max_retries times. A command is only run again if the
+# retry and the estimated time of the commands still to run fit in the
+# time left in the job (if Slurm gives the end time of the job).
+
+# Deadline as a multiple of the estimate, or 0 for no deadline. The
+# benchmarks' own guesses are rougher than predictions from the history
+# (e.g. nbody guesses 60 secs per command), so they get a further factor
+# and a longer minimum.
+timeout_factor = 2.0
+unknown_factor = 3.0
+min_timeout_secs = 300
+min_guess_timeout_secs = 3600
+
+# Retries after a timeout, and the wait before the first (which doubles
+# for each further retry)
+max_retries = 2
+backoff_secs = 60
+
+# Deadline of the entry in seconds, or None if it has none
+def deadline_secs(entry):
+	if timeout_factor <= 0:
+		return None
+	if entry.est_known:
+		return max(min_timeout_secs, entry.est_secs * timeout_factor)
+	if entry.est_secs <= 0:
+		# No history and no guess (e.g. syntheticslownord)
+		return None
+	return max(min_guess_timeout_secs, entry.est_secs * timeout_factor * unknown_factor)
+
+def backoff(attempt):
+	return backoff_secs * (2 ** attempt)
+
+# End of the Slurm job in seconds since the epoch, or None if not known
+def job_end_time():
+	end = os.environ.get('SLURM_JOB_END_TIME')
+	if end is None or not end.isdigit():
+		return None
+	return int(end)
+
+# Whether to run the entry again after attempt (0 for the first run) timed
+# out, leaving remaining_secs of estimated time for the other commands
+def can_retry(entry, attempt, remaining_secs):
+	if attempt >= max_retries or deadline_secs(entry) is None:
+		return False
+	end = job_end_time()
+	if end is None:
+		return True
+	return time.time() + backoff(attempt) + deadline_secs(entry) + remaining_secs <= end